@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+#
+# Megladon Ability Cache
+#
+# ----------------------
+
+NO_ABILITIES = frozenset()
+
+
+class AbilityCache(object):
+
+    """
+
+    Available abilities of a group of units, fetched with one batched query per game loop.
+
+    Every routine that used to call get_available_abilities once per unit reads from here instead. The
+    cache only answers for the game loop it was refreshed on, anything older counts as no abilities.
+
+    """
+
+    def __init__(self):
+
+        self.game_loop = None
+        self.queries = 0
+        self._abilities = {}
+
+    async def refresh(self, bot, units, game_loop):
+
+        """
+
+        Query the abilities of all 'units' in a single request to the client.
+
+        Arguments:
+            bot (SC2 BotAI): bot whose client is queried
+            units (List): every unit whose abilities are needed this step
+            game_loop (int): game loop the result is valid for
+
+        """
+
+        if game_loop == self.game_loop:
+            return
+
+        self._abilities = {}
+        self.game_loop = game_loop
+
+        units = list(units)
+        if not units:
+            return
+
+        self.queries += 1
+        results = await bot.get_available_abilities(units)
+        for unit, abilities in zip(units, results):
+            self._abilities[unit.tag] = frozenset(abilities)
+
+    def get(self, unit, game_loop):
+
+        """
+
+        Abilities of 'unit' for 'game_loop', empty if the unit was not queried or the cache is stale.
+
+        """
+
+        if game_loop != self.game_loop:
+            return NO_ABILITIES
+        return self._abilities.get(unit.tag, NO_ABILITIES)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# Megladon Action Collector
+#
+# -------------------------
+
+# Main Modules
+# ------------
+import collections
+
+
+class ActionCollector(object):
+
+    """
+
+    Collects the commands routines issue during a step and sends them to the client in one request.
+
+    A later plain (non-queued) order for a unit replaces anything the unit was told earlier in the same
+    step, the same way the game would, so only the final order per unit is sent. Queued orders are kept
+    behind the unit's plain order. Structure commands (training, research, chronoboost) stack up in the
+    game instead of replacing each other, so they are all kept.
+
+    What a command was charged is kept with it, so the bank can be paid back when a later order replaces it.
+
+    """
+
+    def __init__(self):
+
+        self.routine = None
+        self.issued = collections.Counter()
+        self.step_issued = collections.Counter()
+        self.replaced = 0
+        self.flushes = 0
+
+        self._orders = collections.OrderedDict()
+        self._queued = []
+        self._charged = {}
+
+    def add(self, command, cost=None):
+
+        """
+
+        Add a command on behalf of the current routine.
+
+        Arguments:
+            command (SC2 UnitCommand): command to send at the end of the step
+            cost (Tuple): (minerals, vespene) taken off the bank for it, None when it was free
+
+        Returns:
+            refund (Tuple): (minerals, vespene) charged for the commands it replaced, to go back into the bank
+
+        """
+
+        self.issued[self.routine] += 1
+        self.step_issued[self.routine] += 1
+
+        if cost is not None:
+            self._charged[id(command)] = cost
+
+        if command.queue or command.unit.is_structure:
+            self._queued.append(command)
+            return 0, 0
+
+        dropped = []
+        tag = command.unit.tag
+        if tag in self._orders:
+            self.replaced += 1
+            dropped.append(self._orders.pop(tag))
+
+        if self._queued:
+            kept = [queued for queued in self._queued if queued.unit.tag != tag]
+            dropped.extend(queued for queued in self._queued if queued.unit.tag == tag)
+            self.replaced += len(self._queued) - len(kept)
+            self._queued = kept
+
+        self._orders[tag] = command
+
+        minerals = vespene = 0
+        for replaced in dropped:
+            charged = self._charged.pop(id(replaced), None)
+            if charged is not None:
+                minerals += charged[0]
+                vespene += charged[1]
+        return minerals, vespene
+
+    def pending(self):
+
+        """
+
+        Commands that would be sent by the next flush, plain orders first.
+
+        """
+
+        return list(self._orders.values()) + self._queued
+
+    def __len__(self):
+
+        return len(self._orders) + len(self._queued)
+
+    async def flush(self, send):
+
+        """
+
+        Send every collected command in one request and start a new step.
+
+        Arguments:
+            send (Coroutine Function): sends a list of commands to the client
+
+        Returns:
+            commands (List): the commands that were sent
+
+        """
+
+        commands = self.pending()
+
+        self._orders = collections.OrderedDict()
+        self._queued = []
+        self._charged = {}
+        self.step_issued = collections.Counter()
+
+        if commands:
+            self.flushes += 1
+            await send(commands)
+
+        return commands
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+#
+# Megladon Routine Benchmark
+#
+# --------------------------
+
+# Main Modules
+# ------------
+import io
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import argparse
+import contextlib
+
+# Megladon Submodules
+# -------------------
+import megladon
+from profiler import StepProfiler, CSV_FIELDS, STEP
+from episode_writer import EpisodeWriter
+from synthetic import SyntheticGame, PHASES
+from observation_trace import ReplayGame
+
+# Benchmark Constants
+# -------------------
+STEPS = 2000
+TOLERANCE = 0.25  # allowed p95 slowdown against a baseline before the run fails
+
+
+def run_benchmark(phase='mid', steps=STEPS, seed=0, isolated=False, counts=None, enemy_counts=None, trace=None):
+
+    """
+
+    Play 'steps' synthetic steps of one game phase and profile on_step and every routine.
+
+    With a trace the steps are the recorded observations of a real game instead, up to its length.
+
+    Arguments:
+        phase (String): 'early', 'mid' or 'late'
+        steps (int): number of on_step calls
+        seed (int): seed for the synthetic game
+        isolated (bool): run every routine on every step with no step budget, instead of the bot's own schedule
+        counts (Dict): own unit type -> amount, overrides the phase defaults
+        enemy_counts (Dict): enemy unit type -> amount, overrides the phase defaults
+        trace (String): directory of a trace recorded with MEGLADON_TRACE
+
+    Returns:
+        rows (List): profiler summary rows, slowest (p95) first
+
+    """
+
+    # No window to draw into on a CI box
+    megladon.HEADLESS = True
+
+    bot = megladon.Megladon()
+    # Replaying must not record the replay as another trace
+    bot.trace_dir = None
+    bot.profiler = StepProfiler(enabled=True, window=steps)
+    bot.scheduler.profiler = bot.profiler
+
+    if isolated:
+        bot.scheduler.step_budget = float('inf')
+        for routine in bot.scheduler.routines:
+            routine.cadence = 1
+
+    if trace is None:
+        game = SyntheticGame(bot, phase, counts, enemy_counts, seed)
+    else:
+        game = ReplayGame(bot, trace)
+        # The first recorded step is handed to the bot when the replay starts
+        steps = min(steps, len(game) - 1)
+
+    async def play():
+        for step in range(steps):
+            await game.step()
+
+    # The routines print their decisions, keep them out of the report
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        bot.episode = EpisodeWriter(directory)
+        asyncio.run(play())
+        bot.episode.discard()
+
+    return bot.profiler.summary()
+
+
+def regressions(rows, baseline, tolerance=TOLERANCE):
+
+    """
+
+    Routines whose p95 got slower than the baseline allows.
+
+    Arguments:
+        rows (List): summary rows of this run
+        baseline (List): summary rows of a previous run
+        tolerance (float): allowed relative slowdown
+
+    Returns:
+        slower (List): (routine, baseline p95 ms, current p95 ms) for every regression
+
+    """
+
+    previous = {row['routine']: row['p95_ms'] for row in baseline}
+    slower = []
+    for row in rows:
+        before = previous.get(row['routine'])
+        if before and row['p95_ms'] > before * (1.0 + tolerance):
+            slower.append((row['routine'], before, row['p95_ms']))
+    return slower
+
+
+def print_rows(phase, rows):
+
+    print('--- {} game ---'.format(phase))
+    print('{:36} {:>7} {:>9} {:>9} {:>9} {:>9}'.format('routine', 'calls', 'p50_ms', 'p95_ms', 'max_ms', 'actions'))
+    for row in rows:
+        print('{routine:36} {calls:7d} {p50_ms:9.3f} {p95_ms:9.3f} {max_ms:9.3f} {actions:9d}'.format(**row))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Time Megladon routines on synthetic game states or recorded traces.')
+    parser.add_argument('--phase', nargs='+', default=sorted(PHASES), choices=sorted(PHASES))
+    parser.add_argument('--steps', type=int, default=STEPS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--isolated', action='store_true', help='run every routine on every step')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--trace', nargs='+', help='replay recorded traces instead of the synthetic phases')
+    args = parser.parse_args()
+
+    results = {}
+    for phase in args.trace or args.phase:
+        start = time.perf_counter()
+        if args.trace:
+            results[phase] = run_benchmark(steps=args.steps, isolated=args.isolated, trace=phase)
+        else:
+            results[phase] = run_benchmark(phase, args.steps, args.seed, args.isolated)
+        print_rows(phase, results[phase])
+        steps = {row['routine']: row['calls'] for row in results[phase]}.get(STEP, 0)
+        print('{} steps in {:.1f}s\n'.format(steps, time.perf_counter() - start))
+
+    if args.json:
+        with open(args.json, 'w') as report:
+            json.dump({'steps': args.steps, 'seed': args.seed, 'isolated': args.isolated, 'fields': CSV_FIELDS,
+                       'phases': results}, report, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as report:
+            baseline = json.load(report)['phases']
+
+        failed = False
+        for phase, rows in results.items():
+            for routine, before, after in regressions(rows, baseline.get(phase, [])):
+                print('REGRESSION {} {}: p95 {:.3f}ms -> {:.3f}ms'.format(phase, routine, before, after))
+                failed = True
+
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+#
+# Megladon Build Order Engine
+#
+# ---------------------------
+
+# Main Modules
+# ------------
+import heapq
+import importlib
+import collections
+
+# Build Order Constants
+# ---------------------
+BUILD = 'standard'      # build module in this package, overridden by MEGLADON_BUILD
+SUPPLY_BUFFER = 5       # build a pylon when fewer supply is left, unless the build says otherwise
+PENDING_LOOPS = 448     # an issued structure counts as on its way for 20 seconds until it shows up
+
+# Placements
+NEAR_PYLON = 'pylon'            # next to a random ready pylon
+NEAR_MAIN = 'main'              # base build location of the main nexus
+EXPANSION = 'expansion'         # the next free expansion
+
+
+class BuildItem(object):
+
+    """
+
+    One line of a build: have 'count' of a structure once supply, time and tech allow it.
+
+    """
+
+    __slots__ = ['unit', 'count', 'supply', 'time', 'requires', 'placement', 'index']
+
+    def __init__(self, unit, count, supply=0, time=0, requires=(), placement=NEAR_PYLON, index=0):
+
+        """
+
+        Arguments:
+            unit (UnitTypeId): structure to build
+            count (int): how many of it there should be once this item is done
+            supply (int): supply used at least
+            time (float): game time at least, in seconds
+            requires (List): structure types that have to be ready
+            placement (String): NEAR_PYLON, NEAR_MAIN or EXPANSION
+            index (int): position in the build definition
+
+        """
+
+        self.unit = unit
+        self.count = count
+        self.supply = supply
+        self.time = time
+        self.requires = tuple(requires)
+        self.placement = placement
+        self.index = index
+
+    def __repr__(self):
+
+        return 'BuildItem({}, {}, supply={}, time={}, requires={})'.format(
+            self.unit, self.count, self.supply, self.time, list(self.requires))
+
+
+def load(name=BUILD):
+
+    """
+
+    Compile a build definition of this package.
+
+    A definition module has an ORDER list of (structure, count, supply, time, requires, placement) rows and can
+    set SUPPLY_BUFFER.
+
+    Arguments:
+        name (String): module name in the builds package, e.g. 'standard'
+
+    Returns:
+        build (BuildOrder): compiled, ready to be stepped
+
+    """
+
+    module = importlib.import_module('builds.{}'.format(name))
+    return BuildOrder(name, module.ORDER, getattr(module, 'SUPPLY_BUFFER', SUPPLY_BUFFER))
+
+
+class BuildOrder(object):
+
+    """
+
+    A build compiled into a timeline.
+
+    Rows for the same structure form a track ordered by count, and only the head of every track is live. A head
+    waits on a time heap, then on a supply heap, then on the structures it still needs, and only once all of them
+    were met is it due. Each step pops what the clock and supply made ready and looks up the handful of waited-on
+    structures, so a step costs a few comparisons instead of every routine's guard clauses. Only due heads look at
+    the units, to check whether they are done.
+
+    The last row a track got done stays kept while the head behind it waits (or after the track ran out), so a
+    structure destroyed in the meantime (the only Cybernetics Core, a Nexus) is built again right away.
+
+    """
+
+    def __init__(self, name, order, supply_buffer=SUPPLY_BUFFER, pending_loops=PENDING_LOOPS):
+
+        """
+
+        Arguments:
+            name (String): name of the build
+            order (List): (structure, count, supply, time, requires, placement) rows
+            supply_buffer (int): free supply kept by building pylons
+            pending_loops (int): game loops an issued structure is counted before it has to show up
+
+        """
+
+        self.name = name
+        self.supply_buffer = supply_buffer
+        self.pending_loops = pending_loops
+
+        self.tracks = collections.OrderedDict()
+        for index, row in enumerate(order):
+            item = BuildItem(*row, index=index)
+            self.tracks.setdefault(item.unit, []).append(item)
+        for items in self.tracks.values():
+            items.sort(key=lambda item: item.count)
+
+        self.heads = {unit: 0 for unit in self.tracks}
+        self.kept = {}
+        self.issued_at = collections.defaultdict(list)
+        self._time = []
+        self._supply = []
+        self._tech = collections.defaultdict(list)
+        self._due = []
+
+        for unit in self.tracks:
+            self._stage(unit)
+
+    def head(self, unit):
+
+        items = self.tracks[unit]
+        position = self.heads[unit]
+        return items[position] if position < len(items) else None
+
+    @property
+    def finished(self):
+
+        return all(self.head(unit) is None for unit in self.tracks)
+
+    def _stage(self, unit):
+
+        """
+
+        Put the head of a track on the time heap.
+
+        """
+
+        item = self.head(unit)
+        if item is not None:
+            heapq.heappush(self._time, (item.time, item.index, unit))
+
+    def _require(self, unit, ready):
+
+        """
+
+        Wait on the first structure the head still needs, or make it due.
+
+        """
+
+        for requirement in self.head(unit).requires:
+            if not ready(requirement):
+                self._tech[requirement].append(unit)
+                return
+        self._due.append(unit)
+        self._due.sort(key=lambda unit: self.head(unit).index)
+
+    def in_flight(self, unit, amount, game_loop):
+
+        """
+
+        Structures of a type that were issued but have not shown up yet.
+
+        """
+
+        issued = self.issued_at[unit]
+        issued[:] = [(loop, baseline) for loop, baseline in issued if game_loop - loop < self.pending_loops]
+        if not issued:
+            return 0
+        return max(0, len(issued) - (amount - min(baseline for loop, baseline in issued)))
+
+    def issued(self, item, amount, game_loop):
+
+        """
+
+        Remember that a structure was ordered.
+
+        Arguments:
+            item (BuildItem): the item it was ordered for
+            amount (int): structures of that type before the order
+            game_loop (int): game loop of the order
+
+        """
+
+        self.issued_at[item.unit].append((game_loop, amount))
+
+    def due(self, time, supply_used, game_loop, amount, ready):
+
+        """
+
+        Advance the timeline and return the items to build now, in build order.
+
+        Arguments:
+            time (float): game time in seconds
+            supply_used (int): supply in use
+            game_loop (int): current game loop
+            amount (Function): structure type -> how many there are (under construction included)
+            ready (Function): structure type -> whether one is ready
+
+        Returns:
+            items (List): BuildItems that are due and not done yet
+
+        """
+
+        while self._time and self._time[0][0] <= time:
+            _, index, unit = heapq.heappop(self._time)
+            heapq.heappush(self._supply, (self.head(unit).supply, index, unit))
+
+        while self._supply and self._supply[0][0] <= supply_used:
+            _, index, unit = heapq.heappop(self._supply)
+            self._require(unit, ready)
+
+        for requirement in [requirement for requirement in self._tech if ready(requirement)]:
+            for unit in self._tech.pop(requirement):
+                self._require(unit, ready)
+
+        items = []
+        for unit in list(self._due):
+            item = self.head(unit)
+            have = amount(unit)
+            if have + self.in_flight(unit, have, game_loop) >= item.count:
+                # Done, the next row of this track starts waiting
+                self._due.remove(unit)
+                self.kept[unit] = item
+                self.heads[unit] += 1
+                self._stage(unit)
+            elif all(ready(requirement) for requirement in item.requires):
+                # A requirement that was destroyed holds the item back until it is rebuilt
+                items.append(item)
+
+        # Rows already done, for tracks whose head is not due (a due head asks for at least as many)
+        for unit, item in self.kept.items():
+            if unit in self._due:
+                continue
+            have = amount(unit)
+            if have + self.in_flight(unit, have, game_loop) < item.count and \
+                    all(ready(requirement) for requirement in item.requires):
+                items.append(item)
+
+        return sorted(items, key=lambda item: item.index)
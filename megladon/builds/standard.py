@@ -4,8 +4,31 @@
 #
 # ---------------------
 
+# SC2 Submodules
+# --------------
+from sc2.constants import NEXUS, PYLON, GATEWAY, CYBERNETICSCORE, ROBOTICSFACILITY, TWILIGHTCOUNCIL
+
+# Megladon Submodules
+# -------------------
+from builds.engine import NEAR_PYLON, NEAR_MAIN, EXPANSION
+
 EARLY_NEXUS_EXPANSION = True
 FIRST_PYLON_WALL = True
 CHRONO_BOOST_NEXUS = True
 FULL_SATURATION_FIRST = True
 FULL_SATURATION_SECOND = True
+
+SUPPLY_BUFFER = 5   # build a pylon when less supply than this is left
+GATEWAYS = 12       # one more gateway every two minutes up to this many
+EXPANSIONS = 4      # nexuses in total
+
+# (structure, count, supply used, game time in seconds, structures that have to be ready, placement)
+ORDER = [
+    (GATEWAY, 1, 0, 0, [PYLON], NEAR_PYLON),
+    (NEXUS, 2, 0, 0, [] if EARLY_NEXUS_EXPANSION else [CYBERNETICSCORE], EXPANSION),
+    (CYBERNETICSCORE, 1, 0, 0, [GATEWAY], NEAR_PYLON),
+    (ROBOTICSFACILITY, 1, 0, 0, [CYBERNETICSCORE], NEAR_PYLON),
+    (TWILIGHTCOUNCIL, 1, 0, 0, [CYBERNETICSCORE], NEAR_MAIN),
+]
+ORDER += [(NEXUS, count, 0, 0, [], EXPANSION) for count in range(3, EXPANSIONS + 1)]
+ORDER += [(GATEWAY, count, 0, 120 * (count - 1), [PYLON], NEAR_PYLON) for count in range(2, GATEWAYS + 1)]
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+#
+# Megladon State Delta
+#
+# --------------------
+
+# State Delta Constants
+# ---------------------
+# Events, each a list of units on StateDelta after update()
+CREATED = 'created'                 # tag not seen the step before
+DESTROYED = 'destroyed'             # tag gone, the unit as it was last seen
+ORDER_CHANGED = 'order_changed'     # orders differ from the step before
+BECAME_IDLE = 'became_idle'         # had orders, has none now
+BUFF_CHANGED = 'buff_changed'       # buffs differ from the step before
+COMPLETED = 'completed'             # construction finished
+EVENTS = [CREATED, DESTROYED, ORDER_CHANGED, BECAME_IDLE, BUFF_CHANGED, COMPLETED]
+
+
+class StateDelta(object):
+
+    """
+
+    What changed between two consecutive observations, by unit tag.
+
+    Every unit leaves a signature read off the raw observation (type, orders without their progress, buffs, done
+    or not), so a step costs one tuple comparison per unit, and only units whose signature differs from the step
+    before are looked at to tell which events they belong to.
+
+    Routines that only care about units in some state register a watch: a predicate over what the events cover
+    (type, orders, buffs, readiness). The set of units a watch holds for is kept up to date from the events, so
+    reading it costs as much as the units in it, and keeping it costs as much as what changed.
+
+    """
+
+    def __init__(self):
+
+        self.units = {}
+        self.signatures = {}
+        self.watches = {}
+        self.game_loop = None
+        for event in EVENTS:
+            setattr(self, event, [])
+
+    def watch(self, name, predicate):
+
+        """
+
+        Keep the units a predicate holds for.
+
+        Arguments:
+            name (String): name to read the units back with watched()
+            predicate (Function): unit -> bool, may only depend on type, orders, buffs and readiness
+
+        """
+
+        self.watches[name] = (predicate, dict.fromkeys(tag for tag, unit in self.units.items() if predicate(unit)))
+
+    def watched(self, name):
+
+        """
+
+        Units of this step a watch holds for, in the order they started to.
+
+        """
+
+        return [self.units[tag] for tag in self.watches[name][1]]
+
+    def update(self, units, game_loop):
+
+        """
+
+        Compare the units of this step with the ones of the step before.
+
+        Arguments:
+            units (SC2 Units): units to track, e.g. self.units
+            game_loop (int): current game loop
+
+        """
+
+        previous, signatures = self.units, self.signatures
+        current, current_signatures = {}, {}
+        created, order_changed, became_idle, buff_changed, completed = [], [], [], [], []
+        # Units a watch has to look at again
+        changed = []
+
+        for unit in units:
+            tag = unit.tag
+            proto = unit._proto
+            orders = proto.orders
+            if orders:
+                orders = tuple([(order.ability_id, order.target_unit_tag, order.target_world_space_pos.x,
+                                 order.target_world_space_pos.y) for order in orders])
+            else:
+                orders = ()
+            buffs = proto.buff_ids
+            signature = (proto.unit_type, orders, tuple(buffs) if buffs else (), proto.build_progress == 1)
+            current[tag] = unit
+            current_signatures[tag] = signature
+
+            last = signatures.get(tag)
+            if last is None:
+                created.append(unit)
+                changed.append(unit)
+            elif last != signature:
+                changed.append(unit)
+                if orders != last[1]:
+                    order_changed.append(unit)
+                    if not orders:
+                        became_idle.append(unit)
+                if signature[2] != last[2]:
+                    buff_changed.append(unit)
+                if signature[3] and not last[3]:
+                    completed.append(unit)
+
+        # Every known tag is still there unless fewer than expected were matched
+        if len(current) - len(created) == len(previous):
+            destroyed = []
+        else:
+            destroyed = [unit for tag, unit in previous.items() if tag not in current]
+
+        self.units, self.signatures = current, current_signatures
+        self.game_loop = game_loop
+        self.created, self.destroyed = created, destroyed
+        self.order_changed, self.became_idle = order_changed, became_idle
+        self.buff_changed, self.completed = buff_changed, completed
+
+        for predicate, tags in self.watches.values():
+            for unit in destroyed:
+                tags.pop(unit.tag, None)
+            for unit in changed:
+                if predicate(unit):
+                    tags.setdefault(unit.tag)
+                else:
+                    tags.pop(unit.tag, None)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+#
+# Megladon Episode Dataset
+#
+# ------------------------
+
+# Main Modules
+# ------------
+import os
+import json
+import queue
+import random
+import argparse
+import threading
+import collections
+import numpy as np
+
+# Megladon Submodules
+# -------------------
+from episode_writer import EpisodeWriter, MANIFEST
+from frame_codec import decode, RAW
+
+# Dataset Constants
+# -----------------
+BATCH_SIZE = 32
+PREFETCH = 4            # batches prepared ahead by the background thread
+OPEN_SHARDS = 256       # memory-mapped shards kept open at once
+UNKNOWN_LOOP = -1       # game loop of samples converted from the old .npy files
+
+# Game phases as [start, end) game loop ranges, the game runs 22.4 loops per second
+PHASES = {
+    'early': (0, 6720),         # first 5 minutes
+    'mid': (6720, 16128),       # 5 to 12 minutes
+    'late': (16128, 2 ** 31),   # after 12 minutes
+}
+
+
+def find_manifests(directory):
+
+    """
+
+    Manifests of every finalized episode below 'directory'.
+
+    """
+
+    manifests = []
+    for root, directories, files in os.walk(directory):
+        if MANIFEST in files:
+            path = os.path.join(root, MANIFEST)
+            with open(path) as handle:
+                manifest = json.load(handle)
+            manifest['path'] = root
+            manifests.append(manifest)
+            directories[:] = []
+    return sorted(manifests, key=lambda manifest: manifest['name'])
+
+
+def phase_mask(loops, phases):
+
+    """
+
+    Which samples fall into one of the given phases.
+
+    Arguments:
+        loops (Numpy Array): game loop of every sample
+        phases (List): phase names from PHASES
+
+    Returns:
+        mask (Numpy Array): boolean mask over the samples
+
+    """
+
+    mask = np.zeros(len(loops), bool)
+    for phase in phases:
+        start, end = PHASES[phase]
+        mask |= (loops >= start) & (loops < end)
+    return mask
+
+
+class EpisodeDataset(object):
+
+    """
+
+    Index over every recorded episode, read through memory maps.
+
+    Building the index only reads the manifests (and the small game loop arrays when filtering by phase). Frames
+    and labels stay on disk: a batch is gathered straight out of the memory-mapped shards, so datasets far larger
+    than RAM can be streamed. Only OPEN_SHARDS shards are mapped at any time. Run-length encoded episodes are
+    decoded while the batch is gathered, so both encodings can be mixed in one dataset.
+
+    """
+
+    def __init__(self, directory, results=None, phases=None, maps=None):
+
+        """
+
+        Arguments:
+            directory (String): directory the episodes were written to
+            results (List): keep episodes with these results only, e.g. ['Result.Victory']
+            phases (List): keep samples from these game phases only ('early', 'mid', 'late')
+            maps (List): keep episodes played on these maps only
+
+        """
+
+        for phase in phases or ():
+            if phase not in PHASES:
+                raise ValueError('Unknown phase {}, expected one of {}'.format(phase, sorted(PHASES)))
+
+        self.directory = directory
+        self.episodes = []
+        self.shards = []
+        self.frame_shape = None
+        self.label_size = None
+        self._open = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        shard_ids = []
+        rows = []
+        for manifest in find_manifests(directory):
+            if results is not None and manifest['result'] not in results:
+                continue
+            if maps is not None and manifest.get('map_name') not in maps:
+                continue
+
+            frame_shape = tuple(manifest['frame_shape'])
+            if self.frame_shape is None:
+                self.frame_shape = frame_shape
+                self.label_size = manifest['label_size']
+            elif frame_shape != self.frame_shape:
+                raise ValueError('Episode {} has frames of shape {}, expected {} (filter by map)'.format(
+                    manifest['name'], frame_shape, self.frame_shape))
+
+            self.episodes.append(manifest)
+            for shard in manifest['shards']:
+                selected = np.arange(shard['count'])
+                if phases is not None:
+                    loops = np.load(os.path.join(manifest['path'], shard['loops']), mmap_mode='r')
+                    selected = selected[phase_mask(np.asarray(loops[:shard['count']]), phases)]
+                if not len(selected):
+                    continue
+
+                shard_ids.append(np.full(len(selected), len(self.shards), np.int32))
+                rows.append(selected.astype(np.int32))
+                self.shards.append((manifest['path'], shard))
+
+        self.shard_ids = np.concatenate(shard_ids) if shard_ids else np.empty(0, np.int32)
+        self.rows = np.concatenate(rows) if rows else np.empty(0, np.int32)
+
+    def __len__(self):
+
+        return len(self.rows)
+
+    def shard(self, shard_id):
+
+        """
+
+        Memory-mapped arrays of one shard keyed like the manifest (frames or runs and offsets, labels, loops),
+        least recently used shards are unmapped.
+
+        """
+
+        with self._lock:
+            arrays = self._open.get(shard_id)
+            if arrays is not None:
+                self._open.move_to_end(shard_id)
+                return arrays
+
+            path, shard = self.shards[shard_id]
+            arrays = {key: np.load(os.path.join(path, shard[key]), mmap_mode='r')
+                      for key in ('frames', 'runs', 'offsets', 'labels', 'loops') if key in shard}
+            self._open[shard_id] = arrays
+            if len(self._open) > OPEN_SHARDS:
+                self._open.popitem(last=False)
+            return arrays
+
+    def batch(self, indices):
+
+        """
+
+        Gather samples into one batch.
+
+        Arguments:
+            indices (Numpy Array): sample indices into the dataset
+
+        Returns:
+            frames (Numpy Array): (B, H, W, 3) uint8 frames
+            labels (Numpy Array): (B, label_size) uint8 labels
+            loops (Numpy Array): (B,) int32 game loops
+
+        """
+
+        indices = np.asarray(indices)
+        frames = np.empty((len(indices),) + self.frame_shape, np.uint8)
+        labels = np.empty((len(indices), self.label_size), np.uint8)
+        loops = np.empty(len(indices), np.int32)
+
+        shard_ids = self.shard_ids[indices]
+        rows = self.rows[indices]
+
+        # One read per shard, rows in file order
+        order = np.lexsort((rows, shard_ids))
+        boundaries = np.flatnonzero(np.diff(shard_ids[order])) + 1
+        for group in np.split(order, boundaries):
+            if not len(group):
+                continue
+            arrays = self.shard(shard_ids[group[0]])
+            if 'frames' in arrays:
+                frames[group] = arrays['frames'][rows[group]]
+            else:
+                runs, offsets = arrays['runs'], arrays['offsets']
+                for index, row in zip(group, rows[group]):
+                    decode(runs[offsets[row]:offsets[row + 1]], self.frame_shape, frames[index])
+            labels[group] = arrays['labels'][rows[group]]
+            loops[group] = arrays['loops'][rows[group]]
+
+        return frames, labels, loops
+
+    def batches(self, batch_size=BATCH_SIZE, shuffle=True, drop_last=False, seed=None, prefetch=PREFETCH):
+
+        """
+
+        Iterate over the dataset in mini-batches, read ahead by a background thread.
+
+        Arguments:
+            batch_size (int): samples per batch
+            shuffle (bool): visit the samples in random order
+            drop_last (bool): skip the final batch when it is smaller than batch_size
+            seed (int): seed for the shuffle
+            prefetch (int): batches read ahead
+
+        Returns:
+            batches (Generator): (frames, labels, loops) tuples, see batch()
+
+        """
+
+        order = np.arange(len(self))
+        if shuffle:
+            np.random.RandomState(seed if seed is not None else random.randrange(2 ** 32)).shuffle(order)
+
+        stop = len(order) - len(order) % batch_size if drop_last else len(order)
+        chunks = [order[start:start + batch_size] for start in range(0, stop, batch_size)]
+
+        ready = queue.Queue(max(prefetch, 1))
+        finished = threading.Event()
+
+        def produce():
+            try:
+                for chunk in chunks:
+                    if finished.is_set():
+                        return
+                    ready.put(self.batch(chunk))
+                ready.put(None)
+            except Exception as error:
+                ready.put(error)
+
+        thread = threading.Thread(target=produce, name='episode-prefetch', daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # The consumer stopped early, let the producer finish its current put and exit
+            finished.set()
+            while thread.is_alive():
+                try:
+                    ready.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    def summary(self):
+
+        """
+
+        Episode, sample and result counts.
+
+        """
+
+        return {
+            'episodes': len(self.episodes),
+            'samples': len(self),
+            'shards': len(self.shards),
+            'frame_shape': self.frame_shape,
+            'encodings': dict(collections.Counter(manifest.get('encoding', RAW) for manifest in self.episodes)),
+            'stored_bytes': sum(manifest.get('stored_bytes', 0) for manifest in self.episodes),
+            'results': dict(collections.Counter(manifest['result'] for manifest in self.episodes)),
+        }
+
+
+def convert_legacy(path, directory, result='Result.Victory', encoding=RAW):
+
+    """
+
+    Convert one of the old pickled '<timestamp>.npy' files into an episode the dataset can read.
+
+    Arguments:
+        path (String): old .npy file of [label, frame] rows
+        directory (String): episode directory to write into
+        result (String): result stored in the manifest, only victories were ever saved
+        encoding (String): frame encoding of the new episode
+
+    Returns:
+        manifest (String): path of the new manifest
+
+    """
+
+    rows = np.load(path, allow_pickle=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    writer = EpisodeWriter(directory, name='legacy-{}'.format(name), encoding=encoding)
+    for label, frame in rows:
+        writer.append(label, frame, UNKNOWN_LOOP)
+    return writer.finalize(result, legacy=os.path.basename(path))
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Inspect recorded Megladon episodes.')
+    parser.add_argument('directory')
+    parser.add_argument('--convert', nargs='*', default=[], help='old .npy files to convert first')
+    parser.add_argument('--result', nargs='*', help='only count episodes with these results')
+    parser.add_argument('--phase', nargs='*', choices=sorted(PHASES), help='only count samples of these phases')
+    args = parser.parse_args()
+
+    for path in args.convert:
+        print('converted {} -> {}'.format(path, convert_legacy(path, args.directory)))
+
+    print(EpisodeDataset(args.directory, args.result, args.phase).summary())
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+#
+# Megladon Episode Writer
+#
+# -----------------------
+
+# Main Modules
+# ------------
+import os
+import json
+import time
+import queue
+import shutil
+import itertools
+import threading
+import numpy as np
+
+# Megladon Submodules
+# -------------------
+from frame_codec import encode, RAW, RLE, ENCODINGS
+
+# Episode Writer Constants
+# ------------------------
+SHARD_FRAMES = 256      # frames per shard file, ~23MB of frames on a 176x172 map
+QUEUE_FRAMES = 64       # frames waiting for the writer thread before append blocks
+LABEL_SIZE = 4
+MANIFEST = 'manifest.json'
+FRAMES = 'frames-{:05d}.npy'
+LABELS = 'labels-{:05d}.npy'
+LOOPS = 'loops-{:05d}.npy'
+RUNS = 'runs-{:05d}.npy'
+OFFSETS = 'offsets-{:05d}.npy'
+
+_episodes = itertools.count()
+
+
+def episode_name():
+
+    """
+
+    Unique name for a new episode: the start time, the process id and a per-process counter, so neither parallel
+    games nor consecutive games of the same process collide.
+
+    """
+
+    return '{}-{}-{}'.format(int(time.time()), os.getpid(), next(_episodes))
+
+
+class EpisodeWriter(object):
+
+    """
+
+    Streams the (label, intel frame) pairs of one game to disk while it is being played.
+
+    Frames and labels are appended to preallocated .npy shards (uint8 frames of shape (SHARD_FRAMES, H, W, 3),
+    uint8 labels of shape (SHARD_FRAMES, LABEL_SIZE) and the int32 game loop of every sample), which a
+    background thread fills through np.memmap. The game thread only copies the frame and queues it.
+
+    With encoding RLE the frames are run-length encoded by frame_codec on the writer thread instead, and every
+    shard stores the runs of all its frames plus the offset of each frame's first run.
+
+    Shards are flushed as soon as they are full, so a crash loses at most the shard in progress. An episode
+    becomes visible to the loader once finalize() writes its manifest; discard() deletes it instead.
+
+    """
+
+    def __init__(self, directory, shard_frames=SHARD_FRAMES, label_size=LABEL_SIZE, name=None, encoding=RAW):
+
+        """
+
+        Arguments:
+            directory (String): directory holding one sub directory per episode
+            shard_frames (int): frames per shard file
+            label_size (int): length of the label vector
+            name (String): episode name, defaults to episode_name()
+            encoding (String): RAW for dense frames, RLE for run-length encoded frames
+
+        """
+
+        if encoding not in ENCODINGS:
+            raise ValueError('Unknown encoding {}, expected one of {}'.format(encoding, ENCODINGS))
+
+        self.directory = directory
+        self.shard_frames = shard_frames
+        self.label_size = label_size
+        self.encoding = encoding
+        self.name = name or episode_name()
+        self.path = os.path.join(directory, self.name)
+
+        self.frames = 0
+        self.frame_shape = None
+        self.shards = []
+        self.stored_bytes = 0
+        self.closed = False
+
+        self._queue = None
+        self._thread = None
+        self._error = None
+        self._shard = None
+
+    def _start(self, frame_shape):
+
+        os.makedirs(self.path, exist_ok=True)
+        self.frame_shape = tuple(frame_shape)
+        self._queue = queue.Queue(QUEUE_FRAMES)
+        self._thread = threading.Thread(target=self._run, name='episode-writer', daemon=True)
+        self._thread.start()
+
+    def append(self, label, frame, game_loop=0):
+
+        """
+
+        Queue one sample for writing.
+
+        Arguments:
+            label (Numpy Array): label vector (one-hot decision), stored as uint8
+            frame (Numpy Array): (H, W, 3) uint8 intel frame, copied here so the caller can reuse its buffer
+            game_loop (int): game loop the decision was made on
+
+        """
+
+        if self.closed:
+            raise RuntimeError('Episode {} is already closed'.format(self.name))
+        self._raise()
+
+        if self._thread is None:
+            self._start(frame.shape)
+        elif frame.shape != self.frame_shape:
+            raise ValueError('Frame shape {} does not match the episode ({})'.format(frame.shape, self.frame_shape))
+
+        item = (np.asarray(label, np.uint8)[:self.label_size], np.array(frame, np.uint8), game_loop)
+        while True:
+            try:
+                self._queue.put(item, timeout=1.0)
+                break
+            except queue.Full:
+                # Still full after a second, make sure the writer thread is alive
+                self._raise()
+        self.frames += 1
+
+    def _run(self):
+
+        """
+
+        Writer thread: fill the current shard, roll over to a new one when it is full.
+
+        """
+
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+
+                if self._shard is None or self._shard[3] == self.shard_frames:
+                    self._close_shard()
+                    self._open_shard()
+
+                frames, labels, loops, count = self._shard
+                label, frame, game_loop = item
+                if self.encoding == RLE:
+                    frames.append(encode(frame))
+                else:
+                    frames[count] = frame
+                labels[count, :len(label)] = label
+                loops[count] = game_loop
+                self._shard[3] = count + 1
+
+            self._close_shard()
+        except Exception as error:
+            self._error = error
+
+    def _open_shard(self):
+
+        index = len(self.shards)
+        shard = {'labels': LABELS.format(index), 'loops': LOOPS.format(index), 'count': 0}
+
+        if self.encoding == RLE:
+            shard.update(runs=RUNS.format(index), offsets=OFFSETS.format(index))
+            frames = []
+        else:
+            shard['frames'] = FRAMES.format(index)
+            frames = np.lib.format.open_memmap(os.path.join(self.path, shard['frames']), mode='w+', dtype=np.uint8,
+                                               shape=(self.shard_frames,) + self.frame_shape)
+
+        labels = np.lib.format.open_memmap(os.path.join(self.path, shard['labels']), mode='w+', dtype=np.uint8,
+                                           shape=(self.shard_frames, self.label_size))
+        loops = np.lib.format.open_memmap(os.path.join(self.path, shard['loops']), mode='w+', dtype=np.int32,
+                                          shape=(self.shard_frames,))
+        self.shards.append(shard)
+        self._shard = [frames, labels, loops, 0]
+
+    def _close_shard(self):
+
+        if self._shard is None:
+            return
+
+        frames, labels, loops, count = self._shard
+        shard = self.shards[-1]
+
+        if self.encoding == RLE:
+            offsets = np.zeros(count + 1, np.int64)
+            offsets[1:] = np.cumsum([len(runs) for runs in frames])
+            runs = np.concatenate(frames)
+            np.save(os.path.join(self.path, shard['runs']), runs)
+            np.save(os.path.join(self.path, shard['offsets']), offsets)
+            self.stored_bytes += runs.nbytes + offsets.nbytes
+        else:
+            frames.flush()
+            self.stored_bytes += frames[:count].nbytes
+
+        labels.flush()
+        loops.flush()
+        shard['count'] = count
+        self._shard = None
+
+    def _raise(self):
+
+        if self._error is not None:
+            raise RuntimeError('Episode writer for {} failed'.format(self.name)) from self._error
+
+    def close(self):
+
+        """
+
+        Wait until every queued frame is on disk.
+
+        """
+
+        if self._thread is not None and not self.closed:
+            if self._thread.is_alive():
+                self._queue.put(None)
+            self._thread.join()
+        self.closed = True
+        self._raise()
+
+    def finalize(self, result, **metadata):
+
+        """
+
+        Flush the episode and write its manifest, which makes it visible to the loader.
+
+        Arguments:
+            result (String): game result, e.g. 'Result.Victory'
+            metadata (Dict): extra JSON-serializable fields stored in the manifest
+
+        Returns:
+            path (String): the manifest path, None when the episode has no frames
+
+        """
+
+        self.close()
+        if not self.frames:
+            return None
+
+        raw_bytes = self.frames * int(np.prod(self.frame_shape))
+        manifest = dict(metadata, name=self.name, result=result, frames=self.frames, frame_shape=self.frame_shape,
+                        label_size=self.label_size, encoding=self.encoding, shards=self.shards,
+                        raw_bytes=raw_bytes, stored_bytes=self.stored_bytes,
+                        compression=raw_bytes / float(max(self.stored_bytes, 1)), created=time.time())
+
+        path = os.path.join(self.path, MANIFEST)
+        partial = path + '.partial'
+        with open(partial, 'w') as handle:
+            json.dump(manifest, handle, indent=2)
+        os.replace(partial, path)
+        return path
+
+    def discard(self):
+
+        """
+
+        Drop the episode and everything written for it so far.
+
+        """
+
+        self.close()
+        shutil.rmtree(self.path, ignore_errors=True)
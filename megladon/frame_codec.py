@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+#
+# Megladon Frame Codec
+#
+# --------------------
+
+# Main Modules
+# ------------
+import time
+import argparse
+import numpy as np
+
+# Frame Codec Constants
+# ---------------------
+# One run of identical non-black pixels in row-major order. Intel frames are black apart from a few dozen
+# discs and five bars, so a frame is a few hundred runs instead of H x W x 3 bytes.
+RUN = np.dtype([('start', '<u4'), ('length', '<u4'), ('color', 'u1', 3)])
+RAW = 'raw'
+RLE = 'rle'
+ENCODINGS = (RAW, RLE)
+PIXEL = np.dtype('V3')
+
+
+def pack(frame):
+
+    """
+
+    (H, W, 3) uint8 frame -> one uint32 per pixel (channel 0 in the low byte), black is 0.
+
+    """
+
+    flat = np.ascontiguousarray(frame, np.uint8).reshape(-1, 3)
+    packed = flat[:, 0].astype(np.uint32)
+    packed |= flat[:, 1].astype(np.uint32) << 8
+    packed |= flat[:, 2].astype(np.uint32) << 16
+    return packed
+
+
+def encode(frame):
+
+    """
+
+    Encode a frame as runs of identical non-black pixels.
+
+    Arguments:
+        frame (Numpy Array): (H, W, 3) uint8 frame
+
+    Returns:
+        runs (Numpy Array): RUN records ordered by start
+    """
+
+    packed = pack(frame)
+    if not len(packed):
+        return np.empty(0, RUN)
+
+    starts = np.flatnonzero(packed[1:] != packed[:-1]) + 1
+    starts = np.concatenate(([0], starts))
+    lengths = np.diff(np.concatenate((starts, [len(packed)])))
+    values = packed[starts]
+
+    keep = values != 0
+    runs = np.empty(int(keep.sum()), RUN)
+    runs['start'] = starts[keep]
+    runs['length'] = lengths[keep]
+    colors = values[keep]
+    runs['color'][:, 0] = colors & 0xFF
+    runs['color'][:, 1] = (colors >> 8) & 0xFF
+    runs['color'][:, 2] = colors >> 16
+    return runs
+
+
+def decode(runs, shape, out=None):
+
+    """
+
+    Rebuild the exact frame from its runs.
+
+    Only the pixels covered by runs are written: the run colors are repeated by their lengths and scattered to
+    their positions in one fancy-indexing write of whole (b, g, r) pixels.
+
+    Arguments:
+        runs (Numpy Array): RUN records from encode()
+        shape (Tuple): (H, W, 3) of the frame
+        out (Numpy Array): C-contiguous (H, W, 3) uint8 buffer to decode into, allocated when None
+
+    Returns:
+        frame (Numpy Array): the decoded frame
+    """
+
+    if out is None:
+        out = np.empty(shape, np.uint8)
+    out.fill(0)
+
+    lengths = runs['length'].astype(np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.arange(int(lengths.sum())) + np.repeat(runs['start'].astype(np.int64) - offsets, lengths)
+    colors = np.ascontiguousarray(runs['color']).view(PIXEL).reshape(-1)
+
+    out.view(PIXEL).reshape(-1)[positions] = np.repeat(colors, lengths)
+    return out
+
+
+def measure(frames, repeat=3):
+
+    """
+
+    Compression ratio and throughput of the codec over a set of frames.
+
+    Arguments:
+        frames (Numpy Array): (N, H, W, 3) uint8 frames
+        repeat (int): decode passes to time
+
+    Returns:
+        stats (Dict): raw and encoded bytes, ratio, encode and decode frames per second and decoded MB/s
+
+    """
+
+    frames = np.asarray(frames)
+    if not len(frames):
+        raise ValueError('No frames to measure')
+
+    start = time.perf_counter()
+    encoded = [encode(frame) for frame in frames]
+    encode_time = time.perf_counter() - start
+
+    out = np.empty(frames.shape[1:], np.uint8)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame, runs in zip(frames, encoded):
+            decode(runs, frame.shape, out)
+    decode_time = (time.perf_counter() - start) / repeat
+
+    for frame, runs in zip(frames, encoded):
+        if not np.array_equal(decode(runs, frame.shape), frame):
+            raise AssertionError('Frame codec round trip is not exact')
+
+    raw_bytes = frames.nbytes
+    encoded_bytes = sum(runs.nbytes for runs in encoded)
+    return {
+        'frames': len(frames),
+        'raw_bytes': raw_bytes,
+        'encoded_bytes': encoded_bytes,
+        'ratio': raw_bytes / float(max(encoded_bytes, 1)),
+        'runs_per_frame': sum(len(runs) for runs in encoded) / float(len(frames)),
+        'encode_fps': len(frames) / encode_time,
+        'decode_fps': len(frames) / decode_time,
+        'decode_mb_s': raw_bytes / decode_time / 1e6,
+    }
+
+
+def main():
+
+    from episode_dataset import EpisodeDataset
+
+    parser = argparse.ArgumentParser(description='Measure the frame codec on recorded episodes.')
+    parser.add_argument('directory')
+    parser.add_argument('--frames', type=int, default=1000, help='frames to sample')
+    args = parser.parse_args()
+
+    dataset = EpisodeDataset(args.directory)
+    indices = np.random.RandomState(0).permutation(len(dataset))[:args.frames]
+    frames, labels, loops = dataset.batch(np.sort(indices))
+    print(measure(frames))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+#
+# Megladon Frame Pipeline
+#
+# -----------------------
+
+# Main Modules
+# ------------
+import numpy as np
+
+# Frame Pipeline Constants
+# ------------------------
+FULL = 'full'
+DELTA = 'delta:'
+NEAREST = 'nearest'
+MAX = 'max'
+KEYFRAME_INTERVAL = 64   # a delta stream restarts from a full keyframe this often
+PIXEL = np.dtype('V3')
+
+
+def pixels(frame):
+
+    """
+
+    (H, W) view of whole pixels of an (H, W, 3) uint8 frame, works on strided views like the renderer's frame.
+
+    """
+
+    return frame.view(PIXEL)[:, :, 0]
+
+
+def parse_size(name):
+
+    """
+
+    'WxH' -> (height, width).
+
+    """
+
+    try:
+        width, height = name.lower().split('x')
+        return int(height), int(width)
+    except ValueError:
+        raise ValueError("Unknown frame representation {}, expected 'full', 'WxH' or 'delta:<...>'".format(name))
+
+
+class Downsampler(object):
+
+    """
+
+    Resamples (H, W, 3) frames to a fixed (height, width).
+
+    NEAREST picks one source pixel per target pixel with precomputed row/column indices, a single gather. MAX takes the
+    per-channel maximum over each source block instead, slower but a 1 pixel probe never disappears.
+
+    """
+
+    def __init__(self, source_shape, size, mode=NEAREST):
+
+        """
+
+        Arguments:
+            source_shape (Tuple): (H, W, 3) of the full frame
+            size (Tuple): target (height, width)
+            mode (String): NEAREST or MAX
+
+        """
+
+        if mode not in (NEAREST, MAX):
+            raise ValueError('Unknown downsampling mode {}'.format(mode))
+
+        self.mode = mode
+        self.shape = (size[0], size[1], 3)
+        height, width = source_shape[:2]
+
+        # Block edges in the source frame for every target row / column
+        self.row_edges = (np.arange(size[0]) * height) // size[0]
+        self.col_edges = (np.arange(size[1]) * width) // size[1]
+
+        self.rows = ((np.arange(size[0]) + 0.5) * height / size[0]).astype(np.intp)[:, None]
+        self.cols = ((np.arange(size[1]) + 0.5) * width / size[1]).astype(np.intp)[None, :]
+
+        self.out = np.empty(self.shape, np.uint8)
+
+    def __call__(self, frame):
+
+        """
+
+        Downsample 'frame' into the reused output buffer.
+
+        """
+
+        if self.mode == NEAREST:
+            pixels(self.out)[:] = pixels(frame)[self.rows, self.cols]
+        else:
+            rows = np.maximum.reduceat(frame, self.row_edges, axis=0)
+            self.out[:] = np.maximum.reduceat(rows, self.col_edges, axis=1)
+        return self.out
+
+
+class FrameDelta(object):
+
+    """
+
+    Pixels of a frame that changed since the previous frame of the same representation.
+
+    A keyframe carries every pixel (indices is None), any other delta only the changed ones, so a consumer keeps
+    one frame and applies deltas to it.
+
+    """
+
+    __slots__ = ['indices', 'pixels', 'shape', 'keyframe', 'game_loop']
+
+    def __init__(self, indices, pixels, shape, keyframe, game_loop):
+
+        self.indices = indices
+        self.pixels = pixels
+        self.shape = shape
+        self.keyframe = keyframe
+        self.game_loop = game_loop
+
+    def __len__(self):
+
+        return len(self.pixels) if self.indices is not None else self.shape[0] * self.shape[1]
+
+    def apply(self, frame=None):
+
+        """
+
+        Update 'frame' (the previous frame of this stream) in place and return it.
+
+        """
+
+        if self.keyframe or frame is None:
+            if not self.keyframe:
+                raise ValueError('A delta stream has to start at a keyframe')
+            frame = np.empty(self.shape, np.uint8) if frame is None else frame
+            frame[:] = self.pixels
+            return frame
+
+        pixels(frame).reshape(-1)[self.indices] = self.pixels.view(PIXEL).reshape(-1)
+        return frame
+
+
+class DeltaEncoder(object):
+
+    """
+
+    Turns a stream of frames into FrameDeltas against the previous frame.
+
+    """
+
+    def __init__(self, shape, keyframe_interval=KEYFRAME_INTERVAL):
+
+        self.shape = tuple(shape)
+        self.keyframe_interval = keyframe_interval
+        self.previous = np.zeros(self.shape, np.uint8)
+        self.count = 0
+
+    def __call__(self, frame, game_loop=0):
+
+        keyframe = self.count % self.keyframe_interval == 0
+        self.count += 1
+
+        if keyframe:
+            self.previous[:] = frame
+            return FrameDelta(None, self.previous.copy(), self.shape, True, game_loop)
+
+        current = pixels(frame)
+        previous = pixels(self.previous)
+        changed = current != previous
+        values = current[changed]
+        previous[changed] = values
+        indices = np.flatnonzero(changed).astype(np.uint32)
+        return FrameDelta(indices, values.view(np.uint8).reshape(-1, 3), self.shape, False, game_loop)
+
+
+class FramePipeline(object):
+
+    """
+
+    Turns every rendered intel frame into the representations its consumers asked for, in one pass.
+
+    Representations are named 'full' (the rendered frame), 'WxH' (downsampled, e.g. '64x64') and 'delta:<name>'
+    (a FrameDelta of one of the others against the previous step). Each one is computed once per step no matter
+    how many consumers read it, and only if somebody asked for it.
+
+    """
+
+    def __init__(self, frame_shape, outputs=(FULL,), mode=NEAREST, keyframe_interval=KEYFRAME_INTERVAL):
+
+        """
+
+        Arguments:
+            frame_shape (Tuple): (H, W, 3) of the rendered frame
+            outputs (List): representation names to produce
+            mode (String): downsampling mode, NEAREST or MAX
+            keyframe_interval (int): frames between two delta keyframes
+
+        """
+
+        self.frame_shape = tuple(frame_shape)
+        self.outputs = list(outputs)
+        self.downsamplers = {}
+        self.encoders = {}
+
+        for name in self.outputs:
+            base = name[len(DELTA):] if name.startswith(DELTA) else name
+            if base != FULL and base not in self.downsamplers:
+                self.downsamplers[base] = Downsampler(self.frame_shape, parse_size(base), mode)
+            if name.startswith(DELTA):
+                shape = self.frame_shape if base == FULL else self.downsamplers[base].shape
+                self.encoders[name] = DeltaEncoder(shape, keyframe_interval)
+
+    def shape(self, name):
+
+        """
+
+        Frame shape of a representation.
+
+        """
+
+        base = name[len(DELTA):] if name.startswith(DELTA) else name
+        return self.frame_shape if base == FULL else self.downsamplers[base].shape
+
+    def process(self, frame, game_loop=0):
+
+        """
+
+        Produce every requested representation of 'frame'.
+
+        Arguments:
+            frame (Numpy Array): the rendered (H, W, 3) frame
+            game_loop (int): game loop of the frame
+
+        Returns:
+            outputs (Dict): representation name -> frame (reused buffer) or FrameDelta
+
+        """
+
+        frames = {FULL: frame}
+        for name, downsample in self.downsamplers.items():
+            frames[name] = downsample(frame)
+
+        outputs = {}
+        for name in self.outputs:
+            if name.startswith(DELTA):
+                outputs[name] = self.encoders[name](frames[name[len(DELTA):]], game_loop)
+            else:
+                outputs[name] = frames[name]
+        return outputs
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+#
+# Megladon Frame Ring
+#
+# -------------------
+
+# Main Modules
+# ------------
+import numpy as np
+from multiprocessing import shared_memory
+
+# Frame Ring Constants
+# --------------------
+SLOTS = 8
+HEADER_FIELDS = 8
+ALIGNMENT = 64
+
+# Header fields
+PUBLISHED = 0   # number of frames published so far
+HEIGHT = 1      # canvas height
+WIDTH = 2       # canvas width
+PADDING = 3     # border around the visible frame
+SLOT_COUNT = 4
+CLOSED = 5      # set by the writer when the game is over
+
+BUSY = -1       # slot sequence while the writer is drawing into it
+
+
+class FrameRing(object):
+
+    """
+
+    Ring of intel canvases in shared memory, written by the bot and read by a viewer process.
+
+    The bot renders straight into the next slot (no copy, no pickling) and publishes it. Every slot carries a
+    sequence number that is BUSY while it is being drawn, so a reader copies a slot and then checks the sequence
+    again to make sure it was not overwritten meanwhile. The writer never waits for a reader.
+
+    Layout: an int64 header, one int64 sequence and one int64 game loop per slot, then the slot canvases.
+
+    """
+
+    def __init__(self, name, canvas_shape=None, padding=0, slots=SLOTS):
+
+        """
+
+        Arguments:
+            name (String): shared memory name, the viewer attaches with the same name
+            canvas_shape (Tuple): (height, width, 3) of a slot to create the ring, None to attach to an existing one
+            padding (int): border around the visible frame inside each canvas
+            slots (int): number of canvases in the ring
+
+        """
+
+        self.name = name
+        self.owner = canvas_shape is not None
+
+        if self.owner:
+            height, width, channels = canvas_shape
+            size = self._offset(slots) + slots * height * width * channels
+            try:
+                self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Left behind by a ring that was never closed (a crashed game), replace it
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._map(slots, height, width)
+            self.header[:] = 0
+            self.header[[HEIGHT, WIDTH, PADDING, SLOT_COUNT]] = height, width, padding, slots
+            self.sequence[:] = 0
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            _untrack(self.memory)
+            header = np.ndarray((HEADER_FIELDS,), np.int64, self.memory.buf)
+            self._map(int(header[SLOT_COUNT]), int(header[HEIGHT]), int(header[WIDTH]))
+
+        self.padding = int(self.header[PADDING])
+        self._writing = None
+
+    @staticmethod
+    def _offset(slots):
+
+        """
+
+        Byte offset of the first canvas, after the header and the per-slot fields.
+
+        """
+
+        size = (HEADER_FIELDS + 2 * slots) * 8
+        return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    def _map(self, slots, height, width):
+
+        buf = self.memory.buf
+        self.slots = slots
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, buf)
+        self.sequence = np.ndarray((slots,), np.int64, buf, HEADER_FIELDS * 8)
+        self.loops = np.ndarray((slots,), np.int64, buf, (HEADER_FIELDS + slots) * 8)
+        self.canvases = np.ndarray((slots, height, width, 3), np.uint8, buf, self._offset(slots))
+
+    @property
+    def published(self):
+
+        return int(self.header[PUBLISHED])
+
+    @property
+    def closed(self):
+
+        return bool(self.header[CLOSED])
+
+    def acquire(self):
+
+        """
+
+        Writer: the canvas of the next slot, marked busy until publish().
+
+        """
+
+        slot = self.published % self.slots
+        self.sequence[slot] = BUSY
+        self._writing = slot
+        return self.canvases[slot]
+
+    def publish(self, game_loop=0):
+
+        """
+
+        Writer: make the slot returned by acquire() the latest frame.
+
+        """
+
+        slot = self._writing
+        published = self.published + 1
+        self.loops[slot] = game_loop
+        self.sequence[slot] = published
+        self.header[PUBLISHED] = published
+        self._writing = None
+
+    def latest(self, out=None):
+
+        """
+
+        Reader: copy of the newest complete frame.
+
+        Arguments:
+            out (Numpy Array): (H, W, 3) buffer to copy into, allocated when None
+
+        Returns:
+            frame (Tuple): (sequence, game loop, visible frame), None when nothing consistent could be read
+
+        """
+
+        published = self.published
+        if not published:
+            return None
+
+        slot = (published - 1) % self.slots
+        sequence = int(self.sequence[slot])
+        if sequence == BUSY:
+            return None
+
+        game_loop = int(self.loops[slot])
+        padding = self.padding
+        height, width = self.canvases.shape[1:3]
+        visible = self.canvases[slot, padding:height - padding, padding:width - padding]
+        if out is None:
+            out = np.empty(visible.shape, np.uint8)
+        out[:] = visible
+
+        # The writer lapped us while copying
+        if int(self.sequence[slot]) != sequence:
+            return None
+        return sequence, game_loop, out
+
+    def close(self):
+
+        """
+
+        Writer: tell readers the game is over and free the shared memory. Reader: detach.
+
+        """
+
+        header = self.header
+        if self.owner:
+            header[CLOSED] = 1
+
+        # Views into the buffer must be gone before it can be closed
+        self.header = self.sequence = self.loops = self.canvases = None
+        del header
+
+        try:
+            self.memory.close()
+        except BufferError:
+            # Someone still holds a view (e.g. the last rendered frame), the mapping goes away with the process
+            pass
+        if self.owner:
+            self.memory.unlink()
+
+
+def _untrack(memory):
+
+    """
+
+    Stop this process' resource tracker from unlinking shared memory it only attached to (it would otherwise
+    delete the bot's ring when the viewer exits).
+
+    """
+
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    except (ImportError, AttributeError, KeyError):
+        pass
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+#
+# Megladon Influence Map
+#
+# ----------------------
+
+# Main Modules
+# ------------
+import math
+import collections
+import numpy as np
+
+# SC2 Submodules
+# --------------
+from sc2.position import Point2
+
+# Influence Map Constants
+# -----------------------
+CELL_SIZE = 4.0         # map units per influence cell
+RANGE_MARGIN = 2.0      # threat reaches this far past a unit's weapon range
+STRENGTH_SCALE = 100.0  # (health + shield) * dps per strength point, a stalker is ~16, a probe ~3
+ALL = 'all'
+GROUND = 'ground'       # threat from units that stand on the ground (what workers can fight back against)
+
+
+class InfluenceMap(object):
+
+    """
+
+    Enemy threat over a coarse grid of the map, kept up to date incrementally.
+
+    Every enemy unit stamps a disc of threat around itself: its strength ((health + shield) * dps) weighted by a
+    falloff that reaches past its weapon range. The stamp of each unit is remembered by tag, so a step only
+    re-stamps units that changed cell, strength or went away; the rest of the army costs a dictionary lookup.
+    Stamps are integers so adding and removing them never drifts.
+
+    Two layers are kept: ALL (every unit) and GROUND (units that are not flying). Point queries are a single grid
+    read, box queries read four entries of an integral image that is rebuilt lazily once per step. Stamped units are
+    indexed by their cell as well, so a hotspot finds the units standing in it without scanning the army.
+
+    """
+
+    def __init__(self, map_size, cell_size=CELL_SIZE):
+
+        """
+
+        Arguments:
+            map_size (Tuple): (width, height) of the map in map units
+            cell_size (float): width of an influence cell in map units
+
+        """
+
+        self.cell_size = float(cell_size)
+        self.shape = (int(math.ceil(map_size[1] / self.cell_size)), int(math.ceil(map_size[0] / self.cell_size)))
+        self.layers = {ALL: np.zeros(self.shape, np.int32), GROUND: np.zeros(self.shape, np.int32)}
+        self.stamps = {}
+        self.units = {}
+        self.cells = collections.defaultdict(set)
+        self.kernels = {}
+        self.weapons = {}
+        self.restamped = 0
+        self._integrals = {}
+        self._hotspots = {}
+
+    def __len__(self):
+
+        return len(self.stamps)
+
+    def cell(self, position):
+
+        """
+
+        (row, column) of the cell a point falls into, clipped to the grid.
+
+        """
+
+        row = min(max(int(position[1] // self.cell_size), 0), self.shape[0] - 1)
+        column = min(max(int(position[0] // self.cell_size), 0), self.shape[1] - 1)
+        return row, column
+
+    def kernel(self, radius):
+
+        """
+
+        Integer falloff disc of 'radius' cells: radius + 1 at the center down to 1 at the rim.
+
+        """
+
+        kernel = self.kernels.get(radius)
+        if kernel is None:
+            offsets = np.arange(-radius, radius + 1)
+            distance = np.rint(np.hypot(offsets[:, None], offsets[None, :])).astype(np.int32)
+            kernel = np.where(distance <= radius, radius + 1 - distance, 0).astype(np.int32)
+            self.kernels[radius] = kernel
+        return kernel
+
+    def weapon(self, unit):
+
+        """
+
+        (dps, range) of a unit type against whatever it hits best, looked up once per type.
+
+        """
+
+        weapon = self.weapons.get(unit.type_id)
+        if weapon is None:
+            weapon = (max(unit.ground_dps, unit.air_dps), max(unit.ground_range, unit.air_range))
+            self.weapons[unit.type_id] = weapon
+        return weapon
+
+    def stamp_of(self, unit):
+
+        """
+
+        (cell, strength, radius, flying) of a unit, None for units that pose no threat (unarmed structures).
+
+        """
+
+        dps, weapon_range = self.weapon(unit)
+        if unit.is_structure and not dps:
+            return None
+
+        strength = max(1, int(round((unit.health + unit.shield) * dps / STRENGTH_SCALE)))
+        radius = int(math.ceil((weapon_range + RANGE_MARGIN) / self.cell_size))
+        return self.cell(unit.position), strength, radius, unit.is_flying
+
+    def _apply(self, stamp, sign):
+
+        (row, column), strength, radius, flying = stamp
+        kernel = self.kernel(radius)
+
+        # Clip the disc to the grid
+        top, bottom = max(row - radius, 0), min(row + radius + 1, self.shape[0])
+        left, right = max(column - radius, 0), min(column + radius + 1, self.shape[1])
+        patch = kernel[top - row + radius:bottom - row + radius, left - column + radius:right - column + radius]
+        patch = patch * (sign * strength)
+
+        self.layers[ALL][top:bottom, left:right] += patch
+        if not flying:
+            self.layers[GROUND][top:bottom, left:right] += patch
+
+    def update(self, units):
+
+        """
+
+        Bring the map up to date with this step's enemy units.
+
+        Arguments:
+            units (SC2 Units): known enemy units (structures included, unarmed ones are skipped)
+
+        """
+
+        stamps = self.stamps
+        cells = self.cells
+        seen = set()
+
+        for unit in units:
+            stamp = self.stamp_of(unit)
+            if stamp is None:
+                continue
+
+            tag = unit.tag
+            seen.add(tag)
+            self.units[tag] = unit
+            previous = stamps.get(tag)
+            if previous != stamp:
+                if previous is not None:
+                    self._apply(previous, -1)
+                    cells[previous[0]].discard(tag)
+                self._apply(stamp, 1)
+                cells[stamp[0]].add(tag)
+                stamps[tag] = stamp
+                self.restamped += 1
+
+        # Dead or out of sight
+        for tag in [tag for tag in stamps if tag not in seen]:
+            stamp = stamps.pop(tag)
+            self._apply(stamp, -1)
+            cells[stamp[0]].discard(tag)
+            del self.units[tag]
+            self.restamped += 1
+
+        self._integrals.clear()
+        self._hotspots.clear()
+
+    def threat_at(self, position, layer=ALL):
+
+        """
+
+        Threat on the cell of a point.
+
+        """
+
+        return int(self.layers[layer][self.cell(position)])
+
+    def threat_within(self, position, distance, layer=ALL):
+
+        """
+
+        Total threat over the cells of the square of half side 'distance' around a point.
+
+        Every unit closer than 'distance' stamps at least its own cell into that square, so a zero answer means no
+        unit of the layer is that close.
+
+        """
+
+        integral = self._integrals.get(layer)
+        if integral is None:
+            integral = np.zeros((self.shape[0] + 1, self.shape[1] + 1), np.int64)
+            integral[1:, 1:] = self.layers[layer].cumsum(0).cumsum(1)
+            self._integrals[layer] = integral
+
+        top, left = self.cell((position[0] - distance, position[1] - distance))
+        bottom, right = self.cell((position[0] + distance, position[1] + distance))
+        bottom += 1
+        right += 1
+        return int(integral[bottom, right] - integral[top, right] - integral[bottom, left] + integral[top, left])
+
+    def hotspots(self, layer=ALL):
+
+        """
+
+        Local maxima of the threat, computed once per step.
+
+        Returns:
+            hotspots (Tuple): (positions, threat) arrays, positions are (N, 2) cell centers in map units
+
+        """
+
+        hotspots = self._hotspots.get(layer)
+        if hotspots is None:
+            grid = self.layers[layer]
+            padded = np.pad(grid, 1)
+            peak = grid > 0
+            for dy in (0, 1, 2):
+                for dx in (0, 1, 2):
+                    peak &= grid >= padded[dy:dy + self.shape[0], dx:dx + self.shape[1]]
+
+            rows, columns = np.nonzero(peak)
+            positions = np.stack(((columns + 0.5) * self.cell_size, (rows + 0.5) * self.cell_size), axis=1)
+            hotspots = (positions, grid[rows, columns])
+            self._hotspots[layer] = hotspots
+        return hotspots
+
+    def unit_in(self, hotspot, position=None, layer=ALL):
+
+        """
+
+        Enemy unit standing in a hotspot's cell.
+
+        Only the units indexed on the cell and its 8 neighbours are looked at: a peak can fall next to the units
+        that make it, then a unit on a neighbouring cell is used.
+
+        Arguments:
+            hotspot (Point2): center of a hotspot cell
+            position (Point2): pick the unit closest to this point, None for the strongest one
+            layer (String): ALL or GROUND, flying units are not part of GROUND
+
+        Returns:
+            unit (SC2 Unit): None when no threatening unit stands that close
+
+        """
+
+        row, column = self.cell(hotspot)
+        best = None
+        best_key = None
+        for cell in ((row + dy, column + dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)):
+            tags = self.cells.get(cell)
+            if not tags:
+                continue
+            offset = max(abs(cell[0] - row), abs(cell[1] - column))
+            for tag in tags:
+                (_, strength, _, flying), unit = self.stamps[tag], self.units[tag]
+                if layer == GROUND and flying:
+                    continue
+                key = (offset, unit.distance_to(position) if position is not None else -strength)
+                if best_key is None or key < best_key:
+                    best, best_key = unit, key
+        return best
+
+    def nearest_hotspot(self, position, layer=ALL):
+
+        """
+
+        Enemy unit in the hotspot closest to a point, the one closest to the point, None when the map is quiet.
+
+        """
+
+        positions, threat = self.hotspots(layer)
+        if not len(positions):
+            return None
+        distances = np.square(positions - (position[0], position[1])).sum(axis=1)
+        hotspot = Point2(tuple(positions[int(np.argmin(distances))].tolist()))
+        return self.unit_in(hotspot, position, layer)
+
+    def strongest_hotspot(self, layer=ALL):
+
+        """
+
+        Strongest enemy unit in the most threatened hotspot, None when the map is quiet.
+
+        """
+
+        positions, threat = self.hotspots(layer)
+        if not len(positions):
+            return None
+        hotspot = Point2(tuple(positions[int(np.argmax(threat))].tolist()))
+        return self.unit_in(hotspot, layer=layer)
+
+    def safest(self, candidates, reference, layer=ALL):
+
+        """
+
+        The candidate standing on the least threat, ties go to the one closest to 'reference'.
+
+        Arguments:
+            candidates (SC2 Units): e.g. ready pylons to rally at
+            reference (Point2): preferred point, e.g. the map center
+
+        Returns:
+            candidate (SC2 Unit): None when there are no candidates
+
+        """
+
+        best = None
+        best_key = None
+        for candidate in candidates:
+            key = (self.threat_at(candidate.position, layer), candidate.distance_to(reference))
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+#
+# Megladon Ladder Entry Point
+#
+# ---------------------------
+
+import time
+
+STARTED = time.perf_counter()
+
+# Main Modules
+# ------------
+import os
+import json
+import asyncio
+import argparse
+
+# Only the standard library is imported up here, the bot and python-sc2 are loaded in main() so the import time
+# can be reported and nothing (environment, SC2PATH, OpenCV) is touched before the arguments are read.
+
+# Ladder Constants
+# ----------------
+LOCAL_MAP = 'AcropolisLE'   # map of a local game when no ladder server is given
+LOCAL_RACE = 'Terran'
+LOCAL_DIFFICULTY = 'Easy'
+CONNECT_TIMEOUT = 120       # seconds to wait for the ladder's game client
+
+
+def arguments():
+
+    """
+
+    Command line of the ladder manager (the same flags every python-sc2 ladder bot takes), plus a local mode.
+
+    """
+
+    parser = argparse.ArgumentParser(description='Run Megladon on a ladder or against the built-in AI.')
+    parser.add_argument('--GamePort', type=int, help='port of the game client to join')
+    parser.add_argument('--StartPort', type=int, help='first of the ports the game uses between players')
+    parser.add_argument('--LadderServer', default='127.0.0.1')
+    parser.add_argument('--OpponentId')
+    parser.add_argument('--RealTime', action='store_true')
+    parser.add_argument('--map', default=LOCAL_MAP, help='local game map')
+    parser.add_argument('--race', default=LOCAL_RACE, help='local game opponent race')
+    parser.add_argument('--difficulty', default=LOCAL_DIFFICULTY, help='local game opponent difficulty')
+    parser.add_argument('--build', help='build from the builds package, defaults to MEGLADON_BUILD or standard')
+    parser.add_argument('--window', action='store_true', help='show the intel window (needs OpenCV)')
+    args, _ = parser.parse_known_args()
+    return args
+
+
+async def join_ladder_game(host, port, player, realtime, portconfig):
+
+    """
+
+    Join a game the ladder manager created, python-sc2 0.11 only hosts games itself.
+
+    Arguments:
+        host (String): address of the game client
+        port (int): its websocket port
+        player (SC2 Bot): the bot
+        realtime (bool): play in real time
+        portconfig (SC2 Portconfig): ports the players talk over
+
+    Returns:
+        result (SC2 Result): outcome of the game, None when the connection dropped
+
+    """
+
+    import aiohttp
+    from sc2.client import Client
+    from sc2.main import _play_game
+    from sc2.protocol import ConnectionAlreadyClosed
+
+    async with aiohttp.ClientSession() as session:
+        ws = await session.ws_connect('ws://{}:{}/sc2api'.format(host, port), timeout=CONNECT_TIMEOUT)
+        client = Client(ws)
+        try:
+            result = await _play_game(player, client, realtime, portconfig)
+            await client.leave()
+            await client.quit()
+        except ConnectionAlreadyClosed:
+            print('connection closed before the game ended')
+            return None
+        finally:
+            await ws.close()
+    return result
+
+
+def main():
+
+    args = arguments()
+
+    import megladon
+    import sc2
+    from sc2 import Race, Difficulty
+    from sc2.player import Bot, Computer
+    from sc2.portconfig import Portconfig
+
+    # Intel renders with NumPy, OpenCV is only imported when a window is asked for
+    megladon.HEADLESS = not args.window
+    os.environ.setdefault('SC2PATH', megladon.SC2PATH)
+
+    bot = megladon.Megladon(build=args.build)
+    bot.started = STARTED
+    print('imports done {:.3f}s after start'.format(time.perf_counter() - STARTED))
+
+    player = Bot(Race.Protoss, bot)
+
+    if args.GamePort is None:
+        result = sc2.run_game(sc2.maps.get(args.map), [player, Computer(Race[args.race], Difficulty[args.difficulty])],
+                              realtime=args.RealTime)
+    else:
+        # The ladder hands out a block of ports after StartPort: shared, two for the server, two for the player
+        ports = [args.StartPort + offset for offset in range(1, 6)]
+        portconfig = Portconfig.from_json(json.dumps({'shared': ports[0], 'server': ports[1:3],
+                                                      'players': [ports[3:5]]}))
+        result = asyncio.get_event_loop().run_until_complete(
+            join_ladder_game(args.LadderServer, args.GamePort, player, args.RealTime, portconfig))
+
+    print('{} against {}'.format(result, args.OpponentId or '{} {}'.format(args.difficulty, args.race)))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+#
+# Megladon Map Cache
+#
+# ------------------
+
+# Main Modules
+# ------------
+import os
+import json
+import hashlib
+import numpy as np
+
+# SC2 Submodules
+# --------------
+from sc2.position import Point2
+from sc2.game_info import Ramp
+from sc2.units import Units
+
+# Map Cache Constants
+# -------------------
+MAPCACHE_DIR = 'mapcache'   # overridden by MEGLADON_MAPCACHE
+VERSION = 1                 # bump when the analysis changes, older cache files are ignored
+ORTHOGONAL = 2              # ground distances are walked in half cells: a straight step is 2, a diagonal one 3
+DIAGONAL = 3
+SEARCH_RADIUS = 6           # how far a base center may be from the closest pathable cell
+MAIN_RAMP_UPPER = ({2, 5}, {4, 9})  # upper point counts of a main ramp, the same rule as BotAI.main_base_ramp
+
+
+def content_hash(game_info):
+
+    """
+
+    Hash of the map layers the analysis is computed from, a map update changes it.
+
+    """
+
+    digest = hashlib.sha1()
+    start_raw = game_info._proto.start_raw
+    for layer in (start_raw.pathing_grid, start_raw.placement_grid, start_raw.terrain_height):
+        digest.update(layer.data)
+    return digest.hexdigest()[:16]
+
+
+def cache_path(directory, map_name, digest):
+
+    name = ''.join(character if character.isalnum() else '_' for character in map_name)
+    return os.path.join(directory, '{}-{}.json'.format(name, digest))
+
+
+def nearest_pathable(pathable, point, radius=SEARCH_RADIUS):
+
+    """
+
+    (row, column) of the pathable cell closest to a point, None when there is none within 'radius'.
+
+    """
+
+    column, row = int(point[0]), int(point[1])
+    top, left = max(row - radius, 0), max(column - radius, 0)
+    window = pathable[top:row + radius + 1, left:column + radius + 1]
+    rows, columns = np.nonzero(window)
+    if not len(rows):
+        return None
+    closest = np.argmin(np.square(rows + top - row) + np.square(columns + left - column))
+    return int(rows[closest] + top), int(columns[closest] + left)
+
+
+def ground_distances(pathable, source):
+
+    """
+
+    Ground distance from a cell to every cell of the map.
+
+    A bucketed breadth first search over the pathing grid in half cells (a diagonal step costs 3, close to
+    2 * sqrt(2)). Every bucket is expanded as an index array, so the cost is a few NumPy operations per distance
+    level instead of a Python loop per cell.
+
+    Arguments:
+        pathable (Numpy Array): pathing grid indexed [row, column]
+        source (Tuple): (row, column) to measure from, has to be pathable
+
+    Returns:
+        distances (Numpy Array): distance in cells per cell, inf where the ground cannot go
+
+    """
+
+    height, width = pathable.shape
+    # One cell of unpathable border so neighbour indices never wrap around a row
+    padded = np.zeros((height + 2, width + 2), bool)
+    padded[1:-1, 1:-1] = pathable
+    walkable = padded.ravel()
+    stride = width + 2
+    steps = [(offset, ORTHOGONAL) for offset in (-1, 1, -stride, stride)]
+    steps += [(offset, DIAGONAL) for offset in (-stride - 1, -stride + 1, stride - 1, stride + 1)]
+
+    unreached = np.iinfo(np.int32).max
+    distance = np.full(walkable.shape, unreached, np.int32)
+    start = (source[0] + 1) * stride + source[1] + 1
+    distance[start] = 0
+    buckets = {0: [np.array([start])]}
+    level = 0
+
+    while buckets:
+        if level not in buckets:
+            level += 1
+            continue
+        cells = np.unique(np.concatenate(buckets.pop(level)))
+        cells = cells[distance[cells] == level]
+        for offset, cost in steps:
+            neighbours = cells + offset
+            neighbours = neighbours[walkable[neighbours] & (distance[neighbours] > level + cost)]
+            if len(neighbours):
+                distance[neighbours] = level + cost
+                buckets.setdefault(level + cost, []).append(neighbours)
+        level += 1
+
+    distance = distance.reshape(padded.shape)[1:-1, 1:-1]
+    return np.where(distance == unreached, np.inf, distance / float(ORTHOGONAL))
+
+
+def descend(distances, source):
+
+    """
+
+    Cells of the shortest ground path from 'source' down a distance field to its origin.
+
+    """
+
+    row, column = source
+    path = [(row, column)]
+    while distances[row, column] > 0:
+        top, left = max(row - 1, 0), max(column - 1, 0)
+        window = distances[top:row + 2, left:column + 2]
+        step = np.unravel_index(np.argmin(window), window.shape)
+        row, column = top + int(step[0]), left + int(step[1])
+        path.append((row, column))
+    return path
+
+
+class MapAnalysis(object):
+
+    """
+
+    Everything the bot derives from a map, computed once per map and kept on disk.
+
+    Ramps and vision blockers (what BotAI._prepare_first_step searches for), the expansion locations with their
+    resources (BotAI.expansion_locations), ground distances between every pair of bases, the wall spot of every
+    ramp and the ramps on the ground path between every pair of start locations. The data is independent of the
+    side the bot spawns on, anything side dependent (main ramp, expansion order) is looked up from it per game.
+
+    """
+
+    def __init__(self, data, game_info):
+
+        """
+
+        Arguments:
+            data (Dict): analysis as stored in the cache file
+            game_info (SC2 GameInfo): game info of the map, ramps are built on its height and placement grids
+
+        """
+
+        self.data = data
+        self.expansions = [Point2(expansion['center']) for expansion in data['expansions']]
+        self.distances = np.array([[np.inf if distance is None else distance for distance in row]
+                                   for row in data['distances']], float).reshape(len(self.expansions), -1)
+        self.ramps = [Ramp({Point2(point) for point in ramp['points']}, game_info) for ramp in data['ramps']]
+        self.vision_blockers = {Point2(point) for point in data['vision_blockers']}
+
+    @classmethod
+    def analyze(cls, game_info, expansion_locations):
+
+        """
+
+        Run the analysis of a map.
+
+        Arguments:
+            game_info (SC2 GameInfo): game info of the map
+            expansion_locations (Dict): BotAI.expansion_locations, expansion center -> resources
+
+        Returns:
+            analysis (MapAnalysis): the analysis of the map
+
+        """
+
+        ramps, vision_blockers = game_info._find_ramps_and_vision_blockers()
+        # Town halls of the start locations are not pathable on the pathing grid but are placeable
+        pathable = np.asarray(game_info.pathing_grid.data_numpy, bool) | np.asarray(
+            game_info.placement_grid.data_numpy, bool)
+
+        centers = list(expansion_locations)
+        sources = [nearest_pathable(pathable, center) for center in centers]
+        fields = [ground_distances(pathable, source) if source is not None else None for source in sources]
+        distances = [[None if field is None or target is None or not np.isfinite(field[target])
+                      else round(float(field[target]), 1) for target in sources] for field in fields]
+
+        walls = []
+        for ramp in ramps:
+            try:
+                wall = ramp.depot_in_middle
+            except Exception:
+                # Only two point ramp tops have a wall spot
+                wall = None
+            walls.append(None if wall is None else [wall.x, wall.y])
+
+        # Ramps the ground path between two start locations goes through
+        ramp_of = {(int(point.y), int(point.x)): index for index, ramp in enumerate(ramps) for point in ramp.points}
+        starts = sorted({int(np.argmin([center.distance_to(start) for center in centers]))
+                         for start in game_info.start_locations + [game_info.player_start_location]
+                         if start is not None})
+        chokes = {}
+        for first in starts:
+            for second in starts:
+                if first < second and fields[first] is not None and sources[second] is not None and \
+                        np.isfinite(fields[first][sources[second]]):
+                    crossed = []
+                    for cell in descend(fields[first], sources[second]):
+                        index = ramp_of.get(cell)
+                        if index is not None and index not in crossed:
+                            crossed.append(index)
+                    chokes['{},{}'.format(first, second)] = crossed
+
+        data = {
+            'version': VERSION,
+            'map_name': game_info.map_name,
+            'expansions': [{'center': [center.x, center.y],
+                            'resources': [[resource.position.x, resource.position.y]
+                                          for resource in expansion_locations[center]]} for center in centers],
+            'distances': distances,
+            'ramps': [{'points': sorted([int(point.x), int(point.y)] for point in ramp.points), 'wall': wall}
+                      for ramp, wall in zip(ramps, walls)],
+            'vision_blockers': sorted([int(point.x), int(point.y)] for point in vision_blockers),
+            'chokes': chokes,
+        }
+        return cls(data, game_info)
+
+    def expansion_locations(self, resources):
+
+        """
+
+        BotAI.expansion_locations rebuilt from the cached grouping and the resources of the current game.
+
+        Arguments:
+            resources (SC2 Units): mineral fields and vespene geysers at the start of the game
+
+        Returns:
+            expansion_locations (Dict): expansion center -> resources
+
+        """
+
+        by_position = {(resource.position.x, resource.position.y): resource for resource in resources}
+        locations = {}
+        for center, expansion in zip(self.expansions, self.data['expansions']):
+            group = [by_position[tuple(point)] for point in expansion['resources'] if tuple(point) in by_position]
+            locations[center] = Units(group)
+        return locations
+
+    def closest_expansion(self, position):
+
+        return int(np.argmin([center.distance_to(position) for center in self.expansions]))
+
+    def expansion_order(self, start):
+
+        """
+
+        Expansion centers reachable from a start location, closest by ground first.
+
+        """
+
+        distances = self.distances[self.closest_expansion(start)]
+        return [self.expansions[index] for index in np.argsort(distances, kind='stable')
+                if np.isfinite(distances[index])]
+
+    def ground_distance(self, first, second):
+
+        """
+
+        Ground distance between the bases closest to two positions, inf when there is no ground path.
+
+        """
+
+        return float(self.distances[self.closest_expansion(first), self.closest_expansion(second)])
+
+    def main_ramp(self, start):
+
+        """
+
+        Ramp of the main base at a start location, picked like BotAI.main_base_ramp, None on maps without one.
+
+        """
+
+        for upper in MAIN_RAMP_UPPER:
+            ramps = [ramp for ramp in self.ramps if len(ramp.upper) in upper]
+            if ramps:
+                return min(ramps, key=lambda ramp: start.distance_to(ramp.top_center))
+        return None
+
+    def wall(self, ramp):
+
+        """
+
+        Spot at the top of a ramp that a 2x2 structure (a pylon) closes, None when the ramp has none.
+
+        """
+
+        wall = self.data['ramps'][self.ramps.index(ramp)]['wall']
+        return None if wall is None else Point2(wall)
+
+    def chokes(self, start, enemy_start):
+
+        """
+
+        Ramps on the ground path between two start locations, in walking order from 'start'.
+
+        """
+
+        first, second = self.closest_expansion(start), self.closest_expansion(enemy_start)
+        crossed = self.data['chokes'].get('{},{}'.format(min(first, second), max(first, second)), [])
+        if first > second:
+            crossed = crossed[::-1]
+        return [self.ramps[index] for index in crossed]
+
+    def save(self, path):
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.data, handle)
+        os.replace(temporary, path)
+
+
+def load(bot, directory=MAPCACHE_DIR):
+
+    """
+
+    Analysis of the map of the current game, from the cache when the map was analyzed before.
+
+    Arguments:
+        bot (SC2 BotAI): bot after its first _prepare_step, the analysis reads its game info and resources
+        directory (String): cache directory
+
+    Returns:
+        analysis (MapAnalysis): analysis of the map
+        cached (bool): whether it came from the cache
+
+    """
+
+    game_info = bot._game_info
+    path = cache_path(directory, game_info.map_name, content_hash(game_info))
+
+    if os.path.exists(path):
+        try:
+            with open(path) as handle:
+                data = json.load(handle)
+            if data.get('version') == VERSION:
+                return MapAnalysis(data, game_info), True
+        except (ValueError, KeyError, OSError):
+            # Unreadable or from an older layout, analyze again and overwrite it
+            pass
+
+    analysis = MapAnalysis.analyze(game_info, bot.expansion_locations)
+    try:
+        analysis.save(path)
+    except OSError as error:
+        print('map analysis not cached: {}'.format(error))
+    return analysis, False
@@ -7,27 +7,97 @@
 # Main Modules
 # ------------
 import sc2
-import reload
 import random
-import cv2
 import numpy as np
 import time
 import os
+import functools
 
 # SC2 Submodules
 # ----------------------
 from sc2.player import Bot, Computer
 from sc2 import Race, Difficulty, Result
+from sc2.data import ActionResult
 
 
 # SC2 Building Constants
 # ----------------------
 from sc2.constants import *
 
+# Megladon Submodules
+# -------------------
+from renderer import IntelRenderer, PADDING
+from unit_index import UnitIndex
+from abilities import AbilityCache
+from actions import ActionCollector
+from production import ProductionAllocator, PRODUCTION
+from scheduler import RoutineScheduler, CRITICAL, HIGH, NORMAL, LOW
+from profiler import StepProfiler, STEP
+from spatial import SpatialGrid
+from influence import InfluenceMap, GROUND
+from micro import FocusFire
+from placement import PlacementGrid
+from mapcache import MAPCACHE_DIR, load as load_map
+from policy import PolicyService, load_policy, random_decision
+from delta import StateDelta
+from observation_trace import TraceWriter
+from builds.engine import load, BUILD, NEAR_MAIN, EXPANSION
+from episode_writer import EpisodeWriter
+from frame_pipeline import FramePipeline, FULL, DELTA
+
 # SC2 File training data
 # ----------------------
-os.environ["SC2PATH"] = '/Applications/StarCraft II/'
-HEADLESS = False
+SC2PATH = '/Applications/StarCraft II/'  # used by main() and selfplay.py unless SC2PATH is set
+HEADLESS = False                    # MEGLADON_VIEWER=<name> publishes frames to viewer.py instead of a window
+EPISODE_DIR = 'episodes'            # overridden by MEGLADON_EPISODES
+KEEP_RESULTS = ['Result.Victory']   # episodes with any other result are discarded at the end of the game
+ENCODING = 'raw'                    # frames stay memory-mappable, MEGLADON_ENCODING=rle trades that for size
+FRAME_OUTPUTS = [FULL]              # intel representations, e.g. MEGLADON_FRAMES=full,64x64,delta:128x128
+RECORD_FRAME = FULL                 # representation recorded in episodes, overridden by MEGLADON_RECORD_FRAME
+# attack decisions come from MEGLADON_POLICY=<module>:<function> when set, run on the recorded representation
+# map analyses (ramps, expansions, ground distances) are cached under MAPCACHE_DIR, overridden by MEGLADON_MAPCACHE
+# MEGLADON_TRACE=<directory> records every step's raw observation, replayed and re-rendered by observation_trace.py
+
+# Intel Drawing Constants
+# -----------------------
+DRAW_DICT = {
+    NEXUS: [15, (0, 255, 0)],
+    PYLON: [3, (20, 235, 0)],
+    PROBE: [1, (55, 200, 0)],
+    ASSIMILATOR: [2, (55, 200, 0)],
+    GATEWAY: [3, (200, 100, 0)],
+    CYBERNETICSCORE: [3, (150, 150, 0)],
+    STALKER: [5, (255, 0, 0)],
+    ROBOTICSFACILITY: [5, (215, 155, 0)],
+    OBSERVER: [2, (255, 0, 0)]
+}
+MAIN_BASE_NAMES = ["nexus", "commandcenter", "hatchery"]
+ENEMY_STRUCTURE = 'enemy_structure'
+ENEMY_BASE = 'enemy_base'
+ENEMY_DRAW_DICT = {
+    ENEMY_STRUCTURE: [5, (200, 50, 212)],
+    ENEMY_BASE: [15, (0, 0, 255)]
+}
+
+# Routines run by on_step, in order
+# (routine, priority, cadence in game loops, expected wall time in seconds or None to use the last run)
+ROUTINES = [
+    ('distribute_workers', NORMAL, 80, None),
+    ('chronoboost_nexus', HIGH, 1, None),
+    ('scout', LOW, 22, None),
+    ('build_workers', CRITICAL, 1, None),
+    ('gather_minerals', HIGH, 1, None),
+    ('gather_vespene_gas', NORMAL, 8, None),
+    ('build_pylons', CRITICAL, 1, None),
+    ('build_assimilators', NORMAL, 22, None),
+    ('research_twilight_research', NORMAL, 22, None),
+    ('research_warpgate', NORMAL, 22, None),
+    ('follow_build_order', HIGH, 1, None),
+    ('build_stalkers', HIGH, 1, None),
+    ('intel', LOW, 1, 0.005),
+    ('attack_with_stalkers', HIGH, 1, None),
+    ('focus_fire', HIGH, 1, None),              # after attack_with_stalkers so fight orders replace its orders
+]
 
 
 class Megladon(sc2.BotAI):
@@ -35,8 +105,18 @@ class Megladon(sc2.BotAI):
     __version__ = '0.0.1'
     __slots__ = []
 
-    def __init__(self):
+    def __init__(self, build=None):
+
+        """
+
+        Arguments:
+            build (String): build from the builds package, defaults to MEGLADON_BUILD or the standard build
+
+        """
+
         sc2.BotAI.__init__(self)
+        self.build_name = build or os.environ.get('MEGLADON_BUILD', BUILD)
+        self.build_order = load(self.build_name)
         self.ITERATIONS_PER_MINUTE = 165
         self.MAX_WORKERS = 80
         self.proxy_built = False
@@ -45,16 +125,155 @@ class Megladon(sc2.BotAI):
         self.iteration = 0
         self.max_worker_count = 70
         self.do_something_after = 0
-        self.train_data = []
+        self.episode = None                 # one EpisodeWriter per game, created in on_start
         self.flipped = 0
+        self.frame_outputs = {}
+        self.record_frame = os.environ.get('MEGLADON_RECORD_FRAME', RECORD_FRAME)
+        if self.record_frame.startswith(DELTA):
+            raise ValueError('Episodes store whole frames, MEGLADON_RECORD_FRAME cannot be a delta')
+        self.frames = None
+        self.renderer = None
+        self.viewer = os.environ.get('MEGLADON_VIEWER')
+        self.ring = None
+        self.index = None
+        self.worker_grid = SpatialGrid()
+        self.mineral_grid = SpatialGrid()
+        self.influence = None
+        self.micro = FocusFire()
+        self.delta = None                   # one StateDelta per game, created in on_start
+        policy = os.environ.get('MEGLADON_POLICY')
+        self.policy_function = load_policy(policy) if policy else None
+        self.policy = None                  # one PolicyService per game, on_end shuts its workers down
+        self.trace_dir = os.environ.get('MEGLADON_TRACE')
+        self.trace = None                   # one TraceWriter per game when MEGLADON_TRACE is set
+        self.placement = None
+        self.placement_loop = None
+        self.map_analysis = None
+        self.started = None                 # perf_counter() at process start, set by ladder.py to report startup
+        self.abilities = AbilityCache()
+        self.actions = ActionCollector()
+        self.production = ProductionAllocator(self.actions)
+        self.profiler = StepProfiler()
+        self.scheduler = RoutineScheduler()
+        self.scheduler.profiler = self.profiler
+        for routine, priority, cadence, budget in ROUTINES:
+            self.scheduler.register(routine, priority, cadence, budget)
+
+    def on_start(self):
+
+        """
+
+        Set up what belongs to one game. main() hosts game after game with the same bot, so nothing a game leaves
+        behind may carry over: every game gets its own episode and a freshly compiled build, and the game loop
+        starts at 0 again.
+
+        """
+        self.build_order = load(self.build_name)
+        self.iteration = 0
+        self.do_something_after = 0
+        self.episode = EpisodeWriter(os.environ.get('MEGLADON_EPISODES', EPISODE_DIR),
+                                     encoding=os.environ.get('MEGLADON_ENCODING', ENCODING))
+        self.scheduler.reset()
+        self.profiler.reset()
+        # Tags and watched units of the last game would show up as destroyed on the first step
+        self.delta = StateDelta()
+        self.delta.watch('attacking_workers', lambda unit: unit.type_id == PROBE and len(unit.orders) == 1 and
+                         unit.orders[0].ability.id == ATTACK)
+        self.delta.watch('idle_workers', lambda unit: unit.type_id == PROBE and unit.is_idle)
+        self.delta.watch('chrono_gateways', lambda unit: unit.type_id in (GATEWAY, WARPGATE) and unit.is_ready and
+                         not unit.has_buff(BuffId.CHRONOBOOSTENERGYCOST))
+        # Footprints and reservations are of the last game's map and game loops
+        self.placement = None
+        self.placement_loop = None
+        # Sized to the last game's map, its stamps are of the last game's units
+        self.influence = None
+        if self.policy_function is not None:
+            self.policy = PolicyService(self.policy_function)
+        if self.trace_dir:
+            self.trace = TraceWriter(self.trace_dir)
 
     def on_end(self, game_result):
 
         print('--- on_end called ---')
         print(game_result)
 
-        if str(game_result) == 'Result.Victory':
-            np.save("{}.npy".format(str(int(time.time()))), np.array(self.train_data))
+        if self.renderer is not None:
+            print('intel render time: {}'.format(self.renderer.timing_summary()))
+
+        # The renderer and the frames may draw into the ring's shared memory, they go before it is closed
+        self.renderer = None
+        self.frames = None
+        self.frame_outputs = {}
+        self.flipped = 0
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+        print('actions issued per routine: {}'.format(dict(self.actions.issued)))
+        print('routines postponed: {}'.format(dict(self.scheduler.postponed)))
+        print('production granted: {}, deferred: {}'.format(dict(self.production.granted),
+                                                            dict(self.production.deferred)))
+
+        if self.policy is not None:
+            print('attack decisions: {}'.format(self.policy.summary()))
+            self.policy.close()
+            self.policy = None
+
+        if self.trace is not None:
+            print('trace written to {}'.format(self.trace.finalize(str(game_result))))
+            self.trace = None
+
+        # Next to the episodes (not in whatever directory the game was started from), named after the game's episode
+        name = self.episode.name if self.episode is not None else str(int(time.time()))
+        prefix = os.path.join(os.environ.get('MEGLADON_EPISODES', EPISODE_DIR), name)
+
+        if self.profiler.enabled:
+            print('step profile written to {}'.format(self.profiler.write_report(prefix)))
+
+        # No episode when the game ended before on_start
+        if self.episode is not None:
+            if str(game_result) in KEEP_RESULTS:
+                manifest = self.episode.finalize(str(game_result), map_name=self.game_info.map_name,
+                                                 game_loop=self.state.game_loop)
+                print('training data written to {}'.format(manifest))
+            else:
+                self.episode.discard()
+
+    def _prepare_first_step(self):
+
+        """
+
+        BotAI searches the map for ramps here, and computes expansion locations on first use. Both come from the map
+        cache instead, together with ground distances between the bases, so on a known map this is a file read.
+
+        """
+        if self.townhalls:
+            self._game_info.player_start_location = self.townhalls.first.position
+
+        start = time.perf_counter()
+        self.map_analysis, cached = load_map(self, os.environ.get('MEGLADON_MAPCACHE', MAPCACHE_DIR))
+        print('map analysis {} in {:.3f}s'.format('loaded' if cached else 'computed', time.perf_counter() - start))
+
+        self._game_info.map_ramps = self.map_analysis.ramps
+        self._game_info.vision_blockers = self.map_analysis.vision_blockers
+        # Fill the property_cache_forever slot of BotAI.expansion_locations
+        self._cache_expansion_locations = self.map_analysis.expansion_locations(self.state.resources)
+        main_ramp = self.map_analysis.main_ramp(self.start_location)
+        if main_ramp is not None:
+            self.cached_main_base_ramp = main_ramp
+
+    async def get_next_expansion(self):
+
+        """
+
+        Closest free expansion by ground distance from the main, read from the map analysis instead of sending a
+        pathing query per expansion like BotAI does.
+
+        """
+        for location in self.map_analysis.expansion_order(self._game_info.player_start_location):
+            if not self.townhalls.closer_than(self.EXPANSION_GAP_THRESHOLD, location).exists:
+                return location
+        return None
 
     # On step will be the base function of what occurs at every event
     async def on_step(self, iteration):
@@ -65,34 +284,144 @@ class Megladon(sc2.BotAI):
 
         """
         self.iteration = iteration
+        step_start = time.perf_counter()
+
+        # Recorded before any routine spends from the bank
+        if self.trace is not None:
+            self.trace.record(self)
+
+        # Bucket every unit once, routines query the index instead of re-filtering self.units
+        self.index = UnitIndex(self.units, self.known_enemy_units)
+
+        # What changed since the last step, routines that watch a state only look at the units in it
+        self.delta.update(self.units, self.state.game_loop)
+
+        # Proximity queries around nexuses and assimilators go through grids updated in place every step
+        self.worker_grid.update(self.workers)
+        self.mineral_grid.update(self.state.mineral_field)
+
+        # Enemy threat for defense, rallying and targeting, only units that moved or changed are re-stamped
+        if self.influence is None:
+            self.influence = InfluenceMap(self.game_info.map_size)
+        self.influence.update(self.known_enemy_units)
+
+        # One batched ability query for every unit a routine needs abilities of this step
+        await self.abilities.refresh(self, self.ability_query_units(), self.state.game_loop)
+
         if iteration == 0:
             await self.chat_send("glhf")
-
-        # We might have multiple bases, so distribute workers between them (not every game step)
-        if self.iteration % 10 == 0:
-            await self.distribute_workers()
+            if self.started is not None:
+                print('first step {:.3f}s after start'.format(time.perf_counter() - self.started))
 
         # # If game time is greater than 2 min, make sure to always scout with one worker
         # if self.time > 120:
         #     await self.scout()
 
-        # what we plan to do at each step
-        await self.distribute_workers()
-        await self.chronoboost_nexus()
-        await self.scout()
-        await self.build_workers()
-        await self.gather_minerals()
-        await self.gather_vespene_gas()
-        await self.build_pylons()
-        await self.build_assimilators()
-        await self.build_twilight_council()
-        await self.research_twilight_research(ability='blink')
-        await self.research_warpgate()
-        await self.expand()
-        await self.build_gateway_and_cybernetic_core()
-        await self.build_stalkers()
-        await self.intel()
-        await self.attack_with_stalkers()
+        # what we plan to do at each step, low priority routines give way when the step runs long (the budget
+        # counts from the start of the step, the updates above and the ability round trip included)
+        await self.scheduler.run(self, self.state.game_loop, step_start)
+
+        # Production the routines asked for is granted in one batch against the bank and supply
+        allocation_start = time.perf_counter()
+        granted = await self.production.allocate(self)
+        if self.profiler.enabled:
+            self.profiler.record(PRODUCTION, time.perf_counter() - allocation_start, granted)
+
+        # Everything the routines issued goes out in a single request
+        sent = await self.actions.flush(super().do_actions)
+
+        self.scheduler.last_step_time = time.perf_counter() - step_start
+        if self.profiler.enabled:
+            self.profiler.record(STEP, self.scheduler.last_step_time, len(sent))
+
+    def issue(self, command):
+
+        """
+
+        Add a command to this step's action batch.
+
+        The cost is taken off minerals/vespene straight away (like BotAI.do does) so can_afford checks later in
+        the same step stay accurate, and given back when a later order for the unit replaces the command.
+
+        Arguments:
+            command (SC2 UnitCommand): command to send at the end of the step
+
+        Returns:
+            result (ActionResult): None when the command was accepted, ActionResult.Error when unaffordable
+
+        """
+        if not self.can_afford(command.ability):
+            return ActionResult.Error
+
+        # A command this one replaces is no longer paid for
+        cost = self._game_data.calculate_ability_cost(command.ability)
+        minerals, vespene = self.actions.add(command, (cost.minerals, cost.vespene))
+        self.minerals += minerals - cost.minerals
+        self.vespene += vespene - cost.vespene
+
+    async def do(self, action):
+
+        """
+
+        BotAI helpers such as build and expand_now call this, route them into the step's action batch.
+
+        """
+        return self.issue(action)
+
+    async def do_actions(self, actions, prevent_double=True):
+
+        """
+
+        BotAI helpers such as distribute_workers call this, route them into the step's action batch.
+
+        """
+        for action in actions:
+            minerals, vespene = self.actions.add(action)
+            self.minerals += minerals
+            self.vespene += vespene
+
+    async def place(self, unit_type, near):
+
+        """
+
+        Build a structure near a position, with the spot looked up on the local placement grid.
+
+        BotAI.build asks the client ring by ring (one can_place and up to ten placement queries). The placement grid
+        answers from the map and the footprints it tracks, the client is only asked to confirm a spot that touches
+        a footprint it had to guess, and does the whole search for town halls and gas buildings.
+
+        Arguments:
+            unit_type (UnitTypeId): structure to build
+            near (Point2): preferred position
+
+        Returns:
+            result (ActionResult): None when the build was issued, like BotAI.build
+
+        """
+
+        loop = self.state.game_loop
+        if self.placement is None:
+            self.placement = PlacementGrid(self.game_info.placement_grid)
+        if self.placement_loop != loop:
+            self.placement.update(self.state.units, loop)
+            self.placement_loop = loop
+
+        position, certain = self.placement.find(unit_type, near)
+        if position is None:
+            if certain:
+                return ActionResult.CantFindPlacementLocation
+            return await self.build(unit_type, near=near)
+        if not certain and not await self.can_place(unit_type, position):
+            return await self.build(unit_type, near=near)
+
+        worker = self.select_build_worker(position)
+        if worker is None:
+            return ActionResult.Error
+
+        result = self.issue(worker.build(unit_type, position))
+        if result is None:
+            self.placement.reserve(unit_type, position, loop)
+        return result
 
     def _find_target(self, state):
 
@@ -101,10 +430,11 @@ class Megladon(sc2.BotAI):
         Used to find arbitrary targets depending on whether we see enemy buildings or enemey units.
 
         """
-        if len(self.known_enemy_units) > 0:
-            return random.choice(self.known_enemy_units)
-        elif len(self.known_enemy_structures) > 0:
-            return random.choice(self.known_enemy_structures)
+        target = self.influence.strongest_hotspot()
+        if target is not None:
+            return target
+        elif len(self.index.enemy_structures) > 0:
+            return random.choice(self.index.enemy_structures)
         else:
             return self.enemy_start_locations[0]
 
@@ -115,11 +445,11 @@ class Megladon(sc2.BotAI):
         Rally the troops to the nearest location.
 
         Returns:
-            rally_location (Object): Closest pylon to the center.
+            rally_location (Object): Least threatened pylon, the closest one to the center among equals.
 
 
         """
-        rally_location = self.units(PYLON).ready.closest_to(self.game_info.map_center).position
+        rally_location = self.influence.safest(self.index.ready(PYLON), self.game_info.map_center).position
         return rally_location
 
     def get_game_center_random(self, offset_x=50, offset_y=50):
@@ -180,6 +510,21 @@ class Megladon(sc2.BotAI):
         """
         return base.position.towards(self.get_game_center_random(), random.randrange(min_distance, max_distance))
 
+    def ability_query_units(self):
+
+        """
+
+        Units whose abilities are read this step, queried together in one request.
+
+        Returns:
+            units (List): nexuses that can chronoboost, ready gateways and ready warpgates
+
+        """
+        units = [nexus for nexus in self.index.of(NEXUS) if nexus.energy >= 50]
+        units.extend(self.index.ready(GATEWAY))
+        units.extend(self.index.ready(WARPGATE))
+        return units
+
 
     async def chronoboost_nexus(self):
 
@@ -192,25 +537,24 @@ class Megladon(sc2.BotAI):
 
         """
 
-        for nexus in self.units(NEXUS):
+        for nexus in self.index.of(NEXUS):
             if nexus.energy >= 50:
-                abilities = await self.get_available_abilities(nexus)
+                abilities = self.abilities.get(nexus, self.state.game_loop)
                 if AbilityId.EFFECT_CHRONOBOOSTENERGYCOST in abilities:
 
-                    if self.units(CYBERNETICSCORE).ready.exists:
-                        cybernetics_core = self.units(CYBERNETICSCORE).ready.first
+                    if self.index.ready(CYBERNETICSCORE).exists:
+                        cybernetics_core = self.index.ready(CYBERNETICSCORE).first
                         if not cybernetics_core.has_buff(BuffId.CHRONOBOOSTENERGYCOST):
-                            await self.do(nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, cybernetics_core))
+                            self.issue(nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, cybernetics_core))
 
-                    # Next, prioritize CB on gates
-                    for gateway in (self.units(GATEWAY).ready | self.units(WARPGATE).ready):
-                        if not gateway.has_buff(BuffId.CHRONOBOOSTENERGYCOST):
-                            await self.do(nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, gateway))
-                            return # Don't CB anything else this step
+                    # Next, prioritize CB on gates (ready ones without chrono, kept up to date from buff changes)
+                    for gateway in self.delta.watched('chrono_gateways'):
+                        self.issue(nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, gateway))
+                        return # Don't CB anything else this step
 
                     # Otherwise CB nexus
                     if not nexus.has_buff(BuffId.CHRONOBOOSTENERGYCOST):
-                        await self.do(nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, nexus))
+                        self.issue(nexus(AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, nexus))
 
     async def build_workers(self):
 
@@ -225,39 +569,42 @@ class Megladon(sc2.BotAI):
 
         """
 
-        nexus = self.units(NEXUS).ready.random
+        nexus = self.index.ready(NEXUS).random
 
-        if self.workers.amount < self.units(NEXUS).amount * 15 and nexus.is_idle:
-            if self.can_afford(PROBE):
-                await self.do(nexus.train(PROBE))
-
-                for nexus in self.units(NEXUS).ready:
-                    # Train workers until at nexus max (+4)
-                    if self.workers.amount < self.max_worker_count and nexus.noqueue and nexus.assigned_harvesters < nexus.ideal_harvesters + 2 :
-                        if self.can_afford(PROBE) and self.supply_used < 198:
-                            await self.do(nexus.train(PROBE))
+        if self.workers.amount < self.index.of(NEXUS).amount * 15:
+            wanted = self.max_worker_count - self.workers.amount
+            for townhall in self.index.ready(NEXUS):
+                # Train workers until at nexus max (+2), the production allocator decides what the bank allows
+                if wanted > 0 and townhall.is_idle and townhall.assigned_harvesters < townhall.ideal_harvesters + 2:
+                    self.production.request(townhall.train(PROBE), CRITICAL, PROBE)
+                    wanted -= 1
 
             # Idle workers near nexus should always be mining (we want to allow idle workers near cannons in enemy base)
-            if self.workers.idle.closer_than(50, nexus).exists:
-                worker = self.workers.idle.closer_than(50, nexus).first
-                await self.do(worker.gather(self.state.mineral_field.closest_to(nexus)))
+            idle_workers = [worker for worker in self.delta.watched('idle_workers') if worker.distance_to(nexus) < 50]
+            if idle_workers:
+                worker = idle_workers[0]
+                self.issue(worker.gather(self.mineral_grid.closest_to(nexus)))
 
             # Worker defense: If enemy unit is near nexus, attack with a nearby workers
-            nearby_enemies = self.known_enemy_units.not_structure.filter(lambda unit: not unit.is_flying).closer_than(30, nexus).prefer_close_to(nexus)
+            # No ground threat in the box around the nexus means no enemy in range, skip the unit scan
+            if self.influence.threat_within(nexus.position, 30, GROUND):
+                nearby_enemies = self.index.enemy_ground_units.closer_than(30, nexus).prefer_close_to(nexus)
+            else:
+                nearby_enemies = self.units.subgroup([])
             if nearby_enemies.amount >= 1 and nearby_enemies.amount <= 10 and self.workers.exists:
 
                 # We have nearby enemies, so attack them with a worker
-                workers = self.workers.sorted_by_distance_to(nearby_enemies.first).take(nearby_enemies.amount * 2, False)
+                workers = self.worker_grid.nearest(nearby_enemies.first, nearby_enemies.amount * 2)
 
                 for worker in workers:
                     #if not self.has_order(ATTACK, worker):
-                    await self.do(worker.attack(nearby_enemies.closer_than(30, nexus).closest_to(worker)))
+                    self.issue(worker.attack(nearby_enemies.closer_than(30, nexus).closest_to(worker)))
 
             else:
                 # No nearby enemies, so make sure to return all workers to base
-                for worker in self.workers.closer_than(50, nexus):
-                    if len(worker.orders) == 1 and worker.orders[0].ability.id in [ATTACK]:
-                        await self.do(worker.gather(self.state.mineral_field.closest_to(nexus)))
+                for worker in self.delta.watched('attacking_workers'):
+                    if worker.distance_to(nexus) < 50:
+                        self.issue(worker.gather(self.mineral_grid.closest_to(nexus)))
 
     async def gather_minerals(self):
 
@@ -272,10 +619,18 @@ class Megladon(sc2.BotAI):
 
         """
 
-        for nexus in self.units(NEXUS).ready:
-            for worker in self.workers.closer_than(50, nexus):
-                if len(worker.orders) == 1 and worker.orders[0].ability.id in [ATTACK]:
-                    await self.do(worker.gather(self.state.mineral_field.closest_to(nexus)))
+        nexuses = self.index.ready(NEXUS)
+        mineral_fields = {}
+        for worker in self.delta.watched('attacking_workers'):
+            # Of the nexuses within 50, the last one sends it (its order replaces the others in the step's batch)
+            nexus = None
+            for candidate in nexuses:
+                if worker.distance_to(candidate) < 50:
+                    nexus = candidate
+            if nexus is not None:
+                if nexus.tag not in mineral_fields:
+                    mineral_fields[nexus.tag] = self.mineral_grid.closest_to(nexus)
+                self.issue(worker.gather(mineral_fields[nexus.tag]))
 
     async def gather_vespene_gas(self):
 
@@ -291,11 +646,11 @@ class Megladon(sc2.BotAI):
 
         """
 
-        for assimlator in self.units(ASSIMILATOR):
+        for assimlator in self.index.of(ASSIMILATOR):
             if assimlator.assigned_harvesters < assimlator.ideal_harvesters:
-                worker = self.workers.closer_than(20, assimlator)
+                worker = self.worker_grid.closer_than(20, assimlator)
                 if worker.exists:
-                    await self.do(worker.random.gather(assimlator))
+                    self.issue(worker.random.gather(assimlator))
 
     async def build_pylons(self):
 
@@ -310,12 +665,11 @@ class Megladon(sc2.BotAI):
 
         """
 
-        nexus = self.units(NEXUS).ready.random
+        nexus = self.index.ready(NEXUS).random
 
-        if self.supply_left < 5 and not self.already_pending(PYLON):
-            if self.can_afford(PYLON):
-                await self.build(PYLON, near=nexus.position.towards(self.game_info.map_center, 5))
-            return
+        if self.supply_left < self.build_order.supply_buffer and not self.already_pending(PYLON):
+            near = nexus.position.towards(self.game_info.map_center, 5)
+            self.production.request_structure(PYLON, CRITICAL, lambda: self.place(PYLON, near))
 
 
     async def build_assimilators(self):
@@ -329,66 +683,58 @@ class Megladon(sc2.BotAI):
             - Always allocate probes to the gas and adjust as such.
 
         """
-        for nexus in self.units(NEXUS).ready:
+        for nexus in self.index.ready(NEXUS):
 
             vespene_geysers = self.state.vespene_geyser.closer_than(20.0, nexus)
 
             for vespene_geyser in vespene_geysers:
-                if not self.can_afford(ASSIMILATOR):
-                    break
+                if self.index.of(ASSIMILATOR).closer_than(1.0, vespene_geyser).exists:
+                    continue
 
                 worker = self.select_build_worker(vespene_geyser.position)
                 if worker is None:
                     break
 
-                if not self.units(ASSIMILATOR).closer_than(1.0, vespene_geyser).exists:
-                    await self.do(worker.build(ASSIMILATOR, vespene_geyser))
+                self.production.request(worker.build(ASSIMILATOR, vespene_geyser), NORMAL, ASSIMILATOR)
 
 
-    async def expand(self):
+    async def follow_build_order(self):
 
         """
 
-        Expand the nexus under full saturation of mineral lines and if you can afford. For now if the game exceeds a
-        certain time marker we can head into MACRO (expansions change)
-
-        Characteristics:
+        Place the structures of the build order (expansions, gateways, tech) that are due.
 
-            - Early to Mid Game keep expansions set towards under 3
-            - Macro game adjust the expansion with variation of attacks.
+        The build is compiled into a timeline keyed on supply, time and tech, so only the few items whose triggers
+        were met are looked at. Swap builds with MEGLADON_BUILD or Megladon(build=...).
 
         """
-        if self.units(NEXUS).amount < 4 and not self.already_pending(NEXUS):
-            if self.can_afford(NEXUS):
-                await self.expand_now()
 
-    async def build_gateway_and_cybernetic_core(self):
-
-        """
-
-        Build Initial Gateway and Cybernetics Core facility
-
-        Characteristics:
-
-            - Build one gateway and one cybernetics core, may vary depending on build.
-
-        """
-        if self.units(PYLON).ready.exists:
-            pylon = self.units(PYLON).ready.random
-
-            if self.units(GATEWAY).ready.exists and not self.units(CYBERNETICSCORE):
-                if self.can_afford(CYBERNETICSCORE) and not self.already_pending(CYBERNETICSCORE):
-                    await self.build(CYBERNETICSCORE, near=pylon)
-
-            elif len(self.units(GATEWAY)) < ((self.iteration / self.ITERATIONS_PER_MINUTE)/2):
-                if self.can_afford(GATEWAY) and not self.already_pending(GATEWAY):
-                    await self.build(GATEWAY, near=pylon)
+        loop = self.state.game_loop
+        due = self.build_order.due(self.time, self.supply_used, loop, lambda unit: self.index.of(unit).amount,
+                                   lambda unit: self.index.ready(unit).exists)
+
+        for item in due:
+            if item.placement == EXPANSION:
+                location = await self.get_next_expansion()
+                if location is None:
+                    continue
+                # What expand_now does, but its result is kept
+                build = functools.partial(self.build, item.unit, near=location, max_distance=10,
+                                          random_alternative=False, placement_step=1)
+            elif item.placement == NEAR_MAIN:
+                build = functools.partial(self.place, item.unit,
+                                          self.get_base_build_location(self.index.of(NEXUS).first))
+            elif self.index.ready(PYLON).exists:
+                build = functools.partial(self.place, item.unit, self.index.ready(PYLON).random.position)
+            else:
+                continue
 
-            if self.units(CYBERNETICSCORE).ready.exists:
-                if len(self.units(ROBOTICSFACILITY)) < 1:
-                    if self.can_afford(ROBOTICSFACILITY) and not self.already_pending(ROBOTICSFACILITY):
-                        await self.build(ROBOTICSFACILITY, near=pylon)
+            # Placed once the production allocator grants it, only an issued build moves the build order on
+            def issued(result, item=item, amount=self.index.of(item.unit).amount):
+                if result is None:
+                    self.build_order.issued(item, amount, loop)
 
+            self.production.request_structure(item.unit, HIGH, build, issued)
 
     async def build_stalkers(self):
 
@@ -402,23 +748,19 @@ class Megladon(sc2.BotAI):
 
         """
 
-        # Train at Gateways
-        for gateway in self.units(GATEWAY).ready:
-            abilities = await self.get_available_abilities(gateway)
-            if gateway:
-                if MORPH_WARPGATE in abilities:
-                    await self.do(gateway(MORPH_WARPGATE))
-                    return
-                elif self.supply_used < 198 and self.supply_left >= 2:
-                    if self.can_afford(STALKER):
-                        await self.do(gateway.train(STALKER))
+        # Train at Gateways, every gateway that can morph into a warpgate does (the morph is free)
+        for gateway in self.index.ready(GATEWAY):
+            abilities = self.abilities.get(gateway, self.state.game_loop)
+            if MORPH_WARPGATE in abilities:
+                self.production.request(gateway(MORPH_WARPGATE), HIGH)
+            elif gateway.is_idle:
+                self.production.request(gateway.train(STALKER), NORMAL, STALKER)
 
         # Warp-in from Warpgates
-        for warpgate in self.units(WARPGATE).ready:
-            abilities = await self.get_available_abilities(warpgate)
-            if AbilityId.WARPGATETRAIN_STALKER in abilities and self.supply_used < 198 and self.supply_left >= 2:
-                if self.can_afford(STALKER):
-                    self.do(warpgate.warp_in(STALKER, self.get_rally_location()))
+        for warpgate in self.index.ready(WARPGATE):
+            abilities = self.abilities.get(warpgate, self.state.game_loop)
+            if AbilityId.WARPGATETRAIN_STALKER in abilities:
+                self.production.request(warpgate.warp_in(STALKER, self.get_rally_location()), NORMAL, STALKER)
 
     async def attack_with_stalkers(self):
 
@@ -434,10 +776,17 @@ class Megladon(sc2.BotAI):
         """
 
         # Defaults
-        if len(self.units(STALKER).idle) > 0:
-            choice = random.randrange(0, 4)
+        if len(self.index.idle(STALKER)) > 0:
             target = False
             if self.iteration > self.do_something_after:
+                # The policy answers on the frame the episodes record, a random choice when it is late or unset
+                if self.policy is not None:
+                    choice, _ = await self.policy.decide(self.frame_outputs.get(self.record_frame))
+                else:
+                    choice = random_decision()
+                if self.trace is not None:
+                    self.trace.decision(choice)
+
                 if choice == 0:
                     # no attack
                     wait = random.randrange(20, 165)
@@ -446,71 +795,84 @@ class Megladon(sc2.BotAI):
                 elif choice == 1:
                     #attack_unit_closest_nexus
                     if len(self.known_enemy_units) > 0:
-                        target = self.known_enemy_units.closest_to(random.choice(self.units(NEXUS)))
+                        nexus = random.choice(self.index.of(NEXUS))
+                        target = self.influence.nearest_hotspot(nexus.position)
+                        if target is None:
+                            # No armed unit stands at a hotspot, e.g. only unarmed structures are known
+                            target = self.known_enemy_units.closest_to(nexus)
 
                 elif choice == 2:
                     #attack enemy structures
-                    if len(self.known_enemy_structures) > 0:
-                        target = random.choice(self.known_enemy_structures)
+                    if len(self.index.enemy_structures) > 0:
+                        target = random.choice(self.index.enemy_structures)
 
                 elif choice == 3:
                     #attack_enemy_start
                     target = self.enemy_start_locations[0]
 
                 if target:
-                    for vr in self.units(STALKER).idle:
-                        await self.do(vr.attack(target))
+                    for vr in self.index.idle(STALKER):
+                        self.issue(vr.attack(target))
                 y = np.zeros(4)
                 y[choice] = 1
                 print(y)
-                self.train_data.append([y,self.flipped])
+                # Streamed to disk in the background, the writer copies the reused intel frame buffer.
+                # Nothing to record until intel has rendered once (it is shed first on slow steps).
+                if self.record_frame in self.frame_outputs:
+                    self.episode.append(y, self.frame_outputs[self.record_frame], self.state.game_loop)
 
-    async def research_warpgate(self):
+    async def focus_fire(self):
 
         """
 
-        Research the warpgate uupgrade for warping in stalkers.
+        Stalkers near a fight focus their fire.
+
+        Targets for the whole army are assigned at once by the micro engine, which spreads the stalkers over the
+        enemies so every volley counts. Only stalkers whose target changed get a new order.
 
         """
 
-        if self.units(CYBERNETICSCORE).ready.exists and self.can_afford(RESEARCH_WARPGATE) and not self.warpgate_started:
-            cybernetics_core = self.units(CYBERNETICSCORE).ready.first
-            # await self.do(cybernetics_core(RESEARCH_WARPGATE))
-            self.warpgate_started = True
+        stalkers = self.index.ready(STALKER)
+        enemies = self.known_enemy_units.filter(lambda unit: not unit.is_snapshot)
+        if not stalkers.exists or not enemies.exists:
+            return
 
+        for stalker, target in self.micro.assign(stalkers, enemies):
+            if stalker.order_target != target.tag:
+                self.issue(stalker.attack(target))
 
-    async def build_protoss_natural_wall(self):
+    async def research_warpgate(self):
 
         """
 
-        Build the protoss wall
+        Research the warpgate uupgrade for warping in stalkers.
 
         """
 
-        if self.units(CYBERNETICSCORE).amount >= 1 and not self.proxy_built and self.can_afford(PYLON):
-            p = self.game_info.map_center.towards(self.main_base_ramp, 20)
-            await self.build(PYLON, near=p)
-            self.proxy_built = True
-
-    async def build_twilight_council(self):
+        if self.index.ready(CYBERNETICSCORE).exists and self.can_afford(RESEARCH_WARPGATE) and not self.warpgate_started:
+            cybernetics_core = self.index.ready(CYBERNETICSCORE).first
+            # await self.do(cybernetics_core(RESEARCH_WARPGATE))
+            self.warpgate_started = True
 
-        """
 
-        Build the Twilight Council
+    async def build_protoss_natural_wall(self):
 
-        Characteristics
+        """
 
-            - Research Blink
+        Build the protoss wall
 
         """
 
-        # Build Twilight Council (requires Cybernetics Core)
-        if not self.units(TWILIGHTCOUNCIL).exists and not self.already_pending(TWILIGHTCOUNCIL):
-            if self.can_afford(TWILIGHTCOUNCIL) and self.units(CYBERNETICSCORE).ready.exists:
-                await self.build(TWILIGHTCOUNCIL, near=self.get_base_build_location(self.units(NEXUS).first))
+        main_ramp = self.map_analysis.main_ramp(self.start_location)
+        if main_ramp is None:
             return
 
-    async def research_twilight_research(self, ability):
+        if self.index.of(CYBERNETICSCORE).amount >= 1 and not self.proxy_built and self.can_afford(PYLON):
+            p = self.game_info.map_center.towards(main_ramp.top_center, 20)
+            await self.place(PYLON, p)
+            self.proxy_built = True
+
+    async def research_twilight_research(self, ability='blink'):
 
         """
 
@@ -521,9 +883,9 @@ class Megladon(sc2.BotAI):
 
         """
 
-        if not self.units(TWILIGHTCOUNCIL).ready.exists:
+        if not self.index.ready(TWILIGHTCOUNCIL).exists:
             return
-        twilight = self.units(TWILIGHTCOUNCIL).first
+        twilight = self.index.of(TWILIGHTCOUNCIL).first
 
         # Research Blink and Charge at Twilight
         # Temporary bug workaround: Don't go further unless we can afford blink
@@ -551,17 +913,18 @@ class Megladon(sc2.BotAI):
         Scout using the observer
 
         """
-        if len(self.units(OBSERVER)) > 0:
-            scout = self.units(OBSERVER)[0]
+        if len(self.index.of(OBSERVER)) > 0:
+            scout = self.index.of(OBSERVER)[0]
             if scout.is_idle:
                 enemy_location = self.enemy_start_locations[0]
                 move_to = self._random_location_variance(enemy_location)
-                await self.do(scout.move(move_to))
+                self.issue(scout.move(move_to))
 
-        else:
-            for rf in self.units(ROBOTICSFACILITY).ready.noqueue:
-                if self.can_afford(OBSERVER) and self.supply_left > 0:
-                    await self.do(rf.train(OBSERVER))
+        elif not self.already_pending(OBSERVER):
+            # One observer is enough to scout with
+            robotics_facilities = self.index.ready_idle(ROBOTICSFACILITY)
+            if robotics_facilities.exists:
+                self.production.request(robotics_facilities.first.train(OBSERVER), LOW, OBSERVER)
 
     async def intel(self):
 
@@ -571,36 +934,30 @@ class Megladon(sc2.BotAI):
 
         """
 
-        draw_dict = {
-            NEXUS: [15, (0, 255, 0)],
-            PYLON: [3, (20, 235, 0)],
-            PROBE: [1, (55, 200, 0)],
-            ASSIMILATOR: [2, (55, 200, 0)],
-            GATEWAY: [3, (200, 100, 0)],
-            CYBERNETICSCORE: [3, (150, 150, 0)],
-            STALKER: [5, (255, 0, 0)],
-            ROBOTICSFACILITY: [5, (215, 155, 0)],
-            OBSERVER: [2, (255, 0, 0)]
-        }
-
-        # flip around. It's y, x when you're dealing with an array.
-        game_data = np.zeros((self.game_info.map_size[1], self.game_info.map_size[0], 3), np.uint8)
-
-        for unit_type in draw_dict:
-            for unit in self.units(unit_type):
-                pos = unit.position
-                cv2.circle(game_data, (int(pos[0]), int(pos[1])), draw_dict[unit_type][0], draw_dict[unit_type][1], -1)
-
-        main_base_names = ["nexus", "commandcenter", "hatchery"]
-        for enemy_building in self.known_enemy_structures:
-            pos = enemy_building.position
-            if enemy_building.name.lower() not in main_base_names:
-                cv2.circle(game_data, (int(pos[0]), int(pos[1])), 5, (200, 50, 212), -1)
+        if self.renderer is None:
+            self.renderer = IntelRenderer(self.game_info.map_size, dict(DRAW_DICT, **ENEMY_DRAW_DICT))
+            if self.viewer:
+                # Shared memory is only needed with a viewer attached
+                from frame_ring import FrameRing
+                self.ring = FrameRing(self.viewer, self.renderer.canvas.shape, PADDING)
+
+        # Viewer mode: draw straight into the next shared memory slot, the viewer process does the display
+        if self.ring is not None:
+            self.renderer.use_canvas(self.ring.acquire())
+
+        layers = [(unit_type, self.index.of(unit_type)) for unit_type in DRAW_DICT]
+
+        # Split enemy structures in one pass, main bases are drawn on top.
+        enemy_structures = []
+        enemy_bases = []
+        for enemy_building in self.index.enemy_structures:
+            if enemy_building.name.lower() in MAIN_BASE_NAMES:
+                enemy_bases.append(enemy_building)
+            else:
+                enemy_structures.append(enemy_building)
 
-        for enemy_building in self.known_enemy_structures:
-            pos = enemy_building.position
-            if enemy_building.name.lower() in main_base_names:
-                cv2.circle(game_data, (int(pos[0]), int(pos[1])), 15, (0, 0, 255), -1)
+        layers.append((ENEMY_STRUCTURE, enemy_structures))
+        layers.append((ENEMY_BASE, enemy_bases))
 
         line_max = 50
         mineral_ratio = self.minerals / 1500
@@ -618,20 +975,34 @@ class Megladon(sc2.BotAI):
 
         plausible_supply = self.supply_cap / 200.0
 
-        military_weight = len(self.units(STALKER)) / (self.supply_cap - self.supply_left)
+        military_weight = len(self.index.of(STALKER)) / (self.supply_cap - self.supply_left)
         if military_weight > 1.0:
             military_weight = 1.0
 
-
-        cv2.line(game_data, (0, 19), (int(line_max*military_weight), 19), (250, 250, 200), 3)  # worker/supply ratio
-        cv2.line(game_data, (0, 15), (int(line_max*plausible_supply), 15), (220, 200, 200), 3)  # plausible supply (supply/200.0)
-        cv2.line(game_data, (0, 11), (int(line_max*population_ratio), 11), (150, 150, 150), 3)  # population ratio (supply_left/supply)
-        cv2.line(game_data, (0, 7), (int(line_max*vespene_ratio), 7), (210, 200, 0), 3)  # gas / 1500
-        cv2.line(game_data, (0, 3), (int(line_max*mineral_ratio), 3), (0, 255, 25), 3)  # minerals minerals/1500
-
-        self.flipped = cv2.flip(game_data, 0)
-
-        if not HEADLESS:
+        bars = [
+            (19, int(line_max*military_weight), (250, 250, 200)),  # worker/supply ratio
+            (15, int(line_max*plausible_supply), (220, 200, 200)),  # plausible supply (supply/200.0)
+            (11, int(line_max*population_ratio), (150, 150, 150)),  # population ratio (supply_left/supply)
+            (7, int(line_max*vespene_ratio), (210, 200, 0)),  # gas / 1500
+            (3, int(line_max*mineral_ratio), (0, 255, 25)),  # minerals minerals/1500
+        ]
+
+        # Rendered straight into flipped (image) orientation, the buffer is reused every step.
+        self.flipped = self.renderer.render(layers, bars)
+
+        # Every representation the model and the recorder read (downsampled, deltas) comes out of this one pass
+        if self.frames is None:
+            outputs = os.environ.get('MEGLADON_FRAMES', ','.join(FRAME_OUTPUTS)).split(',')
+            if self.record_frame not in outputs:
+                outputs.append(self.record_frame)
+            self.frames = FramePipeline(self.flipped.shape, outputs)
+        self.frame_outputs = self.frames.process(self.flipped, self.state.game_loop)
+
+        if self.ring is not None:
+            self.ring.publish(self.state.game_loop)
+        elif not HEADLESS:
+            # OpenCV is only loaded to show the window, headless games render with NumPy alone
+            import cv2
             resized = cv2.resize(self.flipped, dsize=None, fx=2, fy=2)
             cv2.imshow('Intel', resized)
             cv2.waitKey(1)
@@ -640,6 +1011,8 @@ class Megladon(sc2.BotAI):
 
 def main():
 
+    os.environ.setdefault("SC2PATH", SC2PATH)
+
     player_config = [
         Bot(Race.Protoss, Megladon()),
         Computer(Race.Terran, Difficulty.Easy)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+#
+# Megladon Micro
+#
+# --------------
+
+# Main Modules
+# ------------
+import time
+import numpy as np
+
+# SC2 Submodules
+# --------------
+from sc2.data import TargetType
+
+# Micro Constants
+# ---------------
+ENGAGE_RANGE = 15.0     # units further than this from every enemy are left to the strategic orders
+TIME_BUDGET = 0.004     # seconds per step, units not assigned by then move onto the nearest enemy
+UNASSIGNED = -1
+GROUND_TARGETS = (TargetType.Ground.value, TargetType.Any.value)
+AIR_TARGETS = (TargetType.Air.value, TargetType.Any.value)
+
+
+def weapons(unit):
+
+    """
+
+    Weapons of a unit's type as in the game data (type, damage, attacks, range), empty when the type has none.
+
+    python-sc2 keeps them on the type data proto only, this is the one place that reaches for it.
+
+    """
+
+    return unit._type_data._proto.weapons
+
+
+class FocusFire(object):
+
+    """
+
+    Focus-fire target assignment for an army, computed on unit x enemy matrices.
+
+    Every step the distances between the army and the enemies are computed in one NumPy pass, together with
+    which unit can hit which enemy (ground/air weapon, ranges and radii) and how much one volley does. Enemies
+    are ranked by priority (damage per second they deal per hit point they have left, raised for the ones that
+    are shooting at the army right now).
+
+    Assignment runs in rounds over the whole army at once: every free unit picks the best enemy it has in range,
+    each enemy keeps just enough of its closest shooters to kill it so no volley is wasted on a unit that is
+    already dead, and the units it let go pick again among the enemies that still need damage. Units that are
+    left over move onto the nearest enemy they can hit that still needs damage.
+
+    """
+
+    def __init__(self, engage_range=ENGAGE_RANGE, budget=TIME_BUDGET):
+
+        """
+
+        Arguments:
+            engage_range (float): units further than this from every enemy get no target
+            budget (float): seconds of wall clock the greedy assignment may take
+
+        """
+
+        self.engage_range = engage_range
+        self.budget = budget
+        self.profiles = {}
+        self.last_duration = 0.0
+        self.truncated = 0
+
+    def profile(self, unit):
+
+        """
+
+        (ground damage, ground range, air damage, air range, dps) of a unit type, damage is one volley.
+
+        """
+
+        profile = self.profiles.get(unit.type_id)
+        if profile is None:
+            unit_weapons = weapons(unit)
+            ground = next((weapon for weapon in unit_weapons if weapon.type in GROUND_TARGETS), None)
+            air = next((weapon for weapon in unit_weapons if weapon.type in AIR_TARGETS), None)
+            profile = (
+                ground.damage * ground.attacks if ground else 0.0,
+                ground.range if ground else 0.0,
+                air.damage * air.attacks if air else 0.0,
+                air.range if air else 0.0,
+                max(unit.ground_dps, unit.air_dps),
+            )
+            self.profiles[unit.type_id] = profile
+        return profile
+
+    def arrays(self, units):
+
+        """
+
+        Positions, radii, weapon profiles, hit points and flying flags of a group as arrays.
+
+        """
+
+        # One pass over the units: x, y, radius, hit points, flying, then the weapon profile
+        rows = np.array([(*unit.position, unit.radius, unit.health + unit.shield, unit.is_flying, *self.profile(unit))
+                         for unit in units], float).reshape(-1, 10)
+        return rows[:, 0:2], rows[:, 2], rows[:, 5:10], rows[:, 3], rows[:, 4] > 0
+
+    def matrices(self, army, enemies):
+
+        """
+
+        Unit x enemy matrices.
+
+        Returns:
+            distance (Numpy Array): center distance
+            damage (Numpy Array): volley damage of the unit against the enemy, 0 when it cannot hit it
+            in_range (Numpy Array): the unit can shoot the enemy from where it stands
+            threat (Numpy Array): dps of the enemy on the unit when the unit is inside the enemy's range
+            health (Numpy Array): hit points + shield of every enemy
+            dps (Numpy Array): damage per second of every enemy
+
+        """
+
+        own, own_radius, own_profile, _, _ = self.arrays(army)
+        enemy, enemy_radius, enemy_profile, health, flying = self.arrays(enemies)
+
+        distance = np.hypot(own[:, None, 0] - enemy[None, :, 0], own[:, None, 1] - enemy[None, :, 1])
+        gap = distance - own_radius[:, None] - enemy_radius[None, :]
+
+        damage = np.where(flying[None, :], own_profile[:, None, 2], own_profile[:, None, 0])
+        reach = np.where(flying[None, :], own_profile[:, None, 3], own_profile[:, None, 1])
+        in_range = (damage > 0) & (gap <= reach)
+
+        # Own units are all treated as ground targets, the army is stalkers
+        threat = np.where(gap <= enemy_profile[None, :, 1], enemy_profile[None, :, 4], 0.0)
+        return distance, damage, in_range, threat, health, enemy_profile[:, 4]
+
+    def assign(self, army, enemies):
+
+        """
+
+        Pick a target for every unit of the army that is near a fight.
+
+        Arguments:
+            army (SC2 Units): own units to command
+            enemies (SC2 Units): visible enemy units
+
+        Returns:
+            targets (List): (unit, enemy unit) pairs, units away from the fight are left out
+
+        """
+
+        start = time.perf_counter()
+        if not army or not enemies:
+            return []
+
+        distance, damage, in_range, threat, health, dps = self.matrices(army, enemies)
+        engaged = distance.min(axis=1) <= self.engage_range
+        assignment = np.full(len(army), UNASSIGNED)
+
+        # Damage per second per hit point, scaled up by how many of our units an enemy has in its range.
+        # Unarmed enemies (structures, workers without targets) come last but still get picked off.
+        shooting = (threat > 0).sum(axis=0)
+        priority = (dps + 1e-3) * (1 + shooting) / np.maximum(health, 1.0)
+
+        # The rounds only look at units that can shoot something and at enemies somebody can shoot
+        shooters = np.flatnonzero(engaged & in_range.any(axis=1))
+        columns = np.flatnonzero(in_range[shooters].any(axis=0))
+        block = np.ix_(shooters, columns)
+        preference = np.where(in_range[block], priority[columns][None, :], -np.inf)
+        block_distance = distance[block]
+        block_damage = damage[block]
+        needed = health[columns].copy()
+        pending = np.arange(len(shooters))
+
+        while len(pending):
+            if time.perf_counter() - start > self.budget:
+                self.truncated += 1
+                break
+
+            scores = np.where(needed > 0, preference[pending], -np.inf)
+            targets = scores.argmax(axis=1)
+            alive = scores[np.arange(len(pending)), targets] > -np.inf
+            pending, targets = pending[alive], targets[alive]
+            if not len(pending):
+                break
+
+            # Group the shooters by target, closest first, and keep them while the target still needs damage
+            order = np.lexsort((block_distance[pending, targets], targets))
+            pending, targets = pending[order], targets[order]
+            volley = block_damage[pending, targets]
+            total = np.cumsum(volley)
+            first = np.flatnonzero(np.concatenate(([True], targets[1:] != targets[:-1])))
+            before = total - volley - np.repeat(total[first] - volley[first], np.diff(np.append(first, len(targets))))
+            keep = before < needed[targets]
+
+            assignment[shooters[pending[keep]]] = columns[targets[keep]]
+            needed -= np.bincount(targets[keep], volley[keep], len(columns))
+            pending = pending[~keep]
+
+        dealt = np.zeros(len(enemies))
+        dealt[columns] = health[columns] - needed
+
+        # Everyone else near the fight moves onto the nearest enemy it can hit that is not already dealt with
+        rest = engaged & (assignment == UNASSIGNED)
+        if rest.any():
+            hittable = damage[rest] > 0
+            uncovered = hittable & (dealt < health)[None, :]
+            hittable = np.where(uncovered.any(axis=1)[:, None], uncovered, hittable)
+            reachable = np.where(hittable, distance[rest], np.inf)
+            nearest = reachable.argmin(axis=1)
+            assignment[rest] = np.where(np.isfinite(reachable.min(axis=1)), nearest, UNASSIGNED)
+
+        self.last_duration = time.perf_counter() - start
+        return [(unit, enemies[target]) for unit, target in zip(army, assignment.tolist()) if target != UNASSIGNED]
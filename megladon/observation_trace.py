@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+#
+# Megladon Observation Trace
+#
+# --------------------------
+
+# Main Modules
+# ------------
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+# SC2 Submodules
+# --------------
+from s2clientprotocol import sc2api_pb2 as sc_pb, common_pb2 as common_pb
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+from sc2.unit import UnitGameData
+
+# Megladon Submodules
+# -------------------
+from episode_writer import episode_name
+
+# Trace Constants
+# ---------------
+VERSION = 1
+MANIFEST = 'trace.json'
+GAME_INFO = 'game_info.pb'
+GAME_DATA = 'game_data.pb'
+COLUMN = '{}.{}.bin'    # one append-only file per table column
+
+# Table -> columns. Units, orders, buffs and upgrades are rows of all steps one after the other, the steps table has
+# one row per step with the row counts to find them.
+UNIT_FIELDS = [
+    ('tag', '<u8'), ('unit_type', '<u4'), ('alliance', 'u1'), ('owner', 'u1'), ('display_type', 'u1'),
+    ('cloak', 'u1'), ('facing', '<f4'), ('radius', '<f4'), ('build_progress', '<f4'), ('health', '<f4'),
+    ('health_max', '<f4'), ('shield', '<f4'), ('shield_max', '<f4'), ('energy', '<f4'), ('energy_max', '<f4'),
+    ('mineral_contents', '<i4'), ('vespene_contents', '<i4'), ('is_flying', 'u1'), ('is_burrowed', 'u1'),
+    ('is_powered', 'u1'), ('assigned_harvesters', '<i2'), ('ideal_harvesters', '<i2'), ('weapon_cooldown', '<f4'),
+    ('add_on_tag', '<u8'), ('is_blip', 'u1'),
+]
+POSITION_FIELDS = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+COMMON_FIELDS = [
+    ('minerals', '<i4'), ('vespene', '<i4'), ('food_cap', '<i2'), ('food_used', '<i2'), ('food_army', '<i2'),
+    ('food_workers', '<i2'), ('idle_worker_count', '<i2'), ('army_count', '<i2'), ('warp_gate_count', '<i2'),
+]
+TABLES = {
+    'units': UNIT_FIELDS + POSITION_FIELDS,
+    'orders': [('unit', '<u4'), ('ability_id', '<u4'), ('target_unit_tag', '<u8'), ('x', '<f4'), ('y', '<f4'),
+               ('progress', '<f4')],
+    'buffs': [('unit', '<u4'), ('buff_id', '<u4')],
+    'upgrades': [('upgrade_id', '<u4')],
+    'steps': [('game_loop', '<u4'), ('units', '<u4'), ('orders', '<u4'), ('buffs', '<u4'), ('upgrades', '<u4')]
+             + COMMON_FIELDS,
+    'decisions': [('step', '<u4'), ('choice', 'u1')],
+}
+UNIT_NAMES = [name for name, _ in UNIT_FIELDS]
+COMMON_NAMES = [name for name, _ in COMMON_FIELDS]
+
+
+def game_data_proto(game_data):
+
+    """
+
+    ResponseData rebuilt from a GameData, which only keeps the protos of its abilities, units and upgrades.
+
+    """
+
+    data = sc_pb.ResponseData()
+    data.abilities.extend(ability._proto for ability in game_data.abilities.values())
+    data.units.extend(unit._proto for unit in game_data.units.values())
+    data.upgrades.extend(upgrade._proto for upgrade in game_data.upgrades.values())
+    return data
+
+
+class TraceWriter(object):
+
+    """
+
+    Records the raw observation of every step of a game into columnar, append-only files.
+
+    Every column of every table is its own file that each step appends to, so a step is a handful of buffered
+    writes and a trace cut short by a crash stays readable up to the last whole step. Only the observation fields
+    the bot reads are kept (units with their orders and buffs, upgrades, the player's bank and supply) plus the
+    attack decisions, which is what intel() needs to render a frame again and what the routines need to run again.
+
+    """
+
+    def __init__(self, directory, name=None):
+
+        """
+
+        Arguments:
+            directory (String): directory holding one sub directory per trace
+            name (String): trace name, defaults to episode_name()
+
+        """
+
+        self.name = name or episode_name()
+        self.path = os.path.join(directory, self.name)
+        self.steps = 0
+        self.rows = dict.fromkeys(TABLES, 0)
+        self.closed = False
+        self._files = None
+
+    def _start(self, bot):
+
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, GAME_INFO), 'wb') as handle:
+            handle.write(sc_pb.Response(game_info=bot._game_info._proto).SerializeToString())
+        with open(os.path.join(self.path, GAME_DATA), 'wb') as handle:
+            handle.write(game_data_proto(bot._game_data).SerializeToString())
+
+        self._files = {(table, name): open(os.path.join(self.path, COLUMN.format(table, name)), 'ab')
+                       for table, fields in TABLES.items() for name, _ in fields}
+        self.metadata = dict(map_name=bot._game_info.map_name, player_id=bot.player_id)
+        self._write_manifest(None)
+
+    def _append(self, table, rows):
+
+        if not rows:
+            return
+        array = np.array(rows, dtype=TABLES[table])
+        for name, _ in TABLES[table]:
+            self._files[(table, name)].write(array[name].tobytes())
+        self.rows[table] += len(rows)
+
+    def record(self, bot):
+
+        """
+
+        Append the observation of the bot's current step.
+
+        Arguments:
+            bot (SC2 BotAI): bot after _prepare_step, before its routines ran
+
+        """
+
+        if self.closed:
+            raise RuntimeError('Trace {} is already closed'.format(self.name))
+        if self._files is None:
+            self._start(bot)
+
+        raw = bot.state.observation.raw_data
+        units, orders, buffs = [], [], []
+        for row, unit in enumerate(raw.units):
+            pos = unit.pos
+            units.append(tuple(getattr(unit, name) for name in UNIT_NAMES) + (pos.x, pos.y, pos.z))
+            for order in unit.orders:
+                # NaN marks orders without a target point, python-sc2 tells them apart with HasField
+                if order.HasField('target_world_space_pos'):
+                    x, y = order.target_world_space_pos.x, order.target_world_space_pos.y
+                else:
+                    x = y = np.nan
+                orders.append((row, order.ability_id, order.target_unit_tag, x, y, order.progress))
+            for buff in unit.buff_ids:
+                buffs.append((row, buff))
+        upgrades = [(upgrade,) for upgrade in raw.player.upgrade_ids]
+
+        common = bot.state.observation.player_common
+        self._append('units', units)
+        self._append('orders', orders)
+        self._append('buffs', buffs)
+        self._append('upgrades', upgrades)
+        self._append('steps', [(bot.state.game_loop, len(units), len(orders), len(buffs), len(upgrades)) +
+                               tuple(getattr(common, name) for name in COMMON_NAMES)])
+        self.steps += 1
+
+    def decision(self, choice):
+
+        """
+
+        Record the attack decision taken on the step recorded last.
+
+        """
+
+        if self.steps:
+            self._append('decisions', [(self.steps - 1, choice)])
+
+    def _write_manifest(self, result):
+
+        manifest = dict(self.metadata, version=VERSION, name=self.name, result=result, steps=self.steps,
+                        rows=self.rows, tables=TABLES,
+                        created=time.time())
+        path = os.path.join(self.path, MANIFEST)
+        with open(path + '.partial', 'w') as handle:
+            json.dump(manifest, handle, indent=2)
+        os.replace(path + '.partial', path)
+
+    def finalize(self, result):
+
+        """
+
+        Close the column files and write the manifest with the game result.
+
+        Returns:
+            path (String): the trace directory, None when no step was recorded
+
+        """
+
+        if self.closed or self._files is None:
+            self.closed = True
+            return None
+        for handle in self._files.values():
+            handle.close()
+        self.closed = True
+        self._write_manifest(result)
+        return self.path
+
+
+class TraceReader(object):
+
+    """
+
+    Reads a trace back and rebuilds the raw observation of any step.
+
+    Columns are memory-mapped, row counts come from the file sizes so a trace that was never finalized can be read
+    up to its last whole step.
+
+    """
+
+    def __init__(self, path):
+
+        """
+
+        Arguments:
+            path (String): trace directory
+
+        """
+
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as handle:
+            self.manifest = json.load(handle)
+
+        self.tables = {}
+        for table, fields in self.manifest['tables'].items():
+            columns = {}
+            for name, dtype in fields:
+                column = os.path.join(path, COLUMN.format(table, name))
+                size = os.path.getsize(column) // np.dtype(dtype).itemsize
+                columns[name] = np.memmap(column, dtype=dtype, mode='r', shape=(size,)) if size else \
+                    np.zeros(0, dtype)
+            self.tables[table] = columns
+
+        steps = self.tables['steps']
+        length = min(len(column) for column in steps.values())
+        # Offsets of every step's first row, a step is only whole when all its rows made it to disk
+        self.offsets = {}
+        for table in ('units', 'orders', 'buffs', 'upgrades'):
+            offsets = np.zeros(length + 1, np.int64)
+            offsets[1:] = np.cumsum(steps[table][:length])
+            self.offsets[table] = offsets
+            available = min(len(column) for column in self.tables[table].values())
+            length = min(length, int(np.searchsorted(offsets, available, side='right')) - 1)
+        self.length = length
+
+        decisions = self.tables['decisions']
+        self.decisions = dict(zip(decisions['step'].tolist(), decisions['choice'].tolist()))
+
+    def __len__(self):
+
+        return self.length
+
+    def _rows(self, table, index, names=None):
+
+        start, end = self.offsets[table][index], self.offsets[table][index + 1]
+        columns = self.tables[table]
+        return zip(*[columns[name][start:end].tolist() for name in (names or list(columns))])
+
+    def game_info(self):
+
+        response = sc_pb.Response()
+        with open(os.path.join(self.path, GAME_INFO), 'rb') as handle:
+            response.ParseFromString(handle.read())
+        return response
+
+    def game_data(self):
+
+        data = sc_pb.ResponseData()
+        with open(os.path.join(self.path, GAME_DATA), 'rb') as handle:
+            data.ParseFromString(handle.read())
+        return GameData(data)
+
+    def observation(self, index, map_size=None):
+
+        """
+
+        Raw observation of a step.
+
+        Arguments:
+            index (int): step number
+            map_size (SC2 Size): fills the map state layers (everything visible, no creep) when given
+
+        Returns:
+            observation (ResponseObservation): the recorded fields set, everything else at its default
+
+        """
+
+        response = sc_pb.ResponseObservation()
+        observation = response.observation
+        step = {name: column[index].item() for name, column in self.tables['steps'].items()}
+        observation.game_loop = step['game_loop']
+        for name in COMMON_NAMES:
+            setattr(observation.player_common, name, step[name])
+        observation.player_common.player_id = self.manifest.get('player_id', 1)
+
+        raw = observation.raw_data
+        units = []
+        for values in self._rows('units', index, UNIT_NAMES + ['x', 'y', 'z']):
+            unit = raw.units.add(pos=common_pb.Point(x=values[-3], y=values[-2], z=values[-1]),
+                                 **dict(zip(UNIT_NAMES, values)))
+            units.append(unit)
+        for row, ability_id, target_unit_tag, x, y, progress in self._rows('orders', index):
+            order = units[row].orders.add(ability_id=ability_id, progress=progress)
+            if target_unit_tag:
+                order.target_unit_tag = target_unit_tag
+            if not np.isnan(x):
+                order.target_world_space_pos.x, order.target_world_space_pos.y = x, y
+        for row, buff in self._rows('buffs', index):
+            units[row].buff_ids.append(buff)
+        raw.player.upgrade_ids.extend(upgrade for upgrade, in self._rows('upgrades', index))
+
+        if map_size is not None:
+            width, height = map_size
+            for layer, data, bits_per_pixel in ((raw.map_state.visibility, b'\x02' * (width * height), 8),
+                                                (raw.map_state.creep, bytes((width * height + 7) // 8), 1)):
+                layer.bits_per_pixel = bits_per_pixel
+                layer.size.x, layer.size.y = width, height
+                layer.data = data
+        return response
+
+
+class ReplayGame(object):
+
+    """
+
+    Drives a bot through a recorded trace without a StarCraft II client, like SyntheticGame does through generated
+    states. Queries the bot sends are answered by the synthetic client.
+
+    """
+
+    def __init__(self, bot, path):
+
+        """
+
+        Arguments:
+            bot (SC2 BotAI): the bot to drive
+            path (String): trace directory
+
+        """
+
+        from synthetic import SyntheticClient
+
+        self.bot = bot
+        self.trace = TraceReader(path)
+        self.game_info = self.trace.game_info()
+        self.game_data = self.trace.game_data()
+        self.map_size = GameInfo(self.game_info.game_info).map_size
+        self.index = 0
+        self.observation = self.trace.observation(0, self.map_size)
+        self.client = SyntheticClient(self)
+        self.iteration = 0
+
+        UnitGameData._game_data = self.game_data
+        UnitGameData._bot_object = bot
+
+        bot._prepare_start(self.client, self.trace.manifest.get('player_id', 1), GameInfo(self.game_info.game_info),
+                           self.game_data)
+        bot._prepare_step(GameState(self.observation), self.game_info)
+        bot._prepare_first_step()
+        bot.on_start()
+
+    def __len__(self):
+
+        return len(self.trace)
+
+    def prepare_step(self, index=None):
+
+        """
+
+        Hand the bot the state of the next step (or of step 'index'), without running on_step.
+
+        """
+
+        self.index = self.index + 1 if index is None else index
+        self.observation = self.trace.observation(self.index, self.map_size)
+        self.bot._prepare_step(GameState(self.observation), self.game_info)
+
+    async def step(self):
+
+        """
+
+        Run on_step on the next recorded step.
+
+        """
+
+        self.prepare_step()
+        await self.bot.on_step(self.iteration)
+        self.iteration += 1
+
+
+async def regenerate(bot, path, writer):
+
+    """
+
+    Render the intel frame of every recorded decision again and write it with its label to an episode.
+
+    Only the state intel() reads is rebuilt (the step's units and the unit index), the routines do not run, so the
+    bars show the bank as it was at the start of the step.
+
+    Arguments:
+        bot (Megladon): bot whose intel() renders the frames
+        path (String): trace directory
+        writer (EpisodeWriter): episode the samples go to
+
+    Returns:
+        samples (int): samples written
+
+    """
+
+    from unit_index import UnitIndex
+
+    game = ReplayGame(bot, path)
+    for step, choice in sorted(game.trace.decisions.items()):
+        if step >= len(game):
+            break
+        game.prepare_step(step)
+        bot.index = UnitIndex(bot.units, bot.known_enemy_units)
+        await bot.intel()
+        label = np.zeros(writer.label_size)
+        label[choice] = 1
+        writer.append(label, bot.frame_outputs[bot.record_frame], bot.state.game_loop)
+    return writer.frames
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Inspect recorded Megladon traces and re-render their episodes. '
+                                                 'benchmark.py --trace replays them through on_step.')
+    parser.add_argument('command', choices=['info', 'regenerate'])
+    parser.add_argument('trace', help='trace directory')
+    parser.add_argument('--output', default='episodes', help='regenerate: episode directory')
+    parser.add_argument('--encoding', help='regenerate: frame encoding, defaults to MEGLADON_ENCODING or raw')
+    args = parser.parse_args()
+
+    reader = TraceReader(args.trace)
+    manifest = reader.manifest
+    if args.command == 'info':
+        print('{name}: {map_name}, {result}'.format(**manifest))
+        print('{} steps, {} decisions, rows {}'.format(len(reader), len(reader.decisions), manifest['rows']))
+        return
+
+    import megladon
+    from episode_writer import EpisodeWriter
+
+    megladon.HEADLESS = True
+    bot = megladon.Megladon()
+    bot.trace_dir = None
+
+    encoding = args.encoding or os.environ.get('MEGLADON_ENCODING', megladon.ENCODING)
+    writer = EpisodeWriter(args.output, encoding=encoding)
+    samples = asyncio.run(regenerate(bot, args.trace, writer))
+    path = writer.finalize(manifest['result'], map_name=manifest['map_name'], trace=args.trace)
+    print('{} samples written to {}'.format(samples, path))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+#
+# Megladon Placement Grid
+#
+# -----------------------
+
+# Main Modules
+# ------------
+import math
+import random
+import numpy as np
+
+# SC2 Submodules
+# --------------
+from sc2.constants import *
+from sc2.position import Point2
+
+# Placement Constants
+# -------------------
+POWER_RADIUS = 6.5      # a ready pylon powers structures whose center is this close
+MAX_DISTANCE = 20       # same search area as BotAI.find_placement
+PLACEMENT_STEP = 2
+RESERVE_LOOPS = 448     # a spot handed out stays reserved for 20 seconds until the structure shows up
+
+# structure -> footprint side in cells
+FOOTPRINTS = {
+    NEXUS: 5, PYLON: 2, ASSIMILATOR: 3, GATEWAY: 3, WARPGATE: 3, FORGE: 3, CYBERNETICSCORE: 3, PHOTONCANNON: 2,
+    SHIELDBATTERY: 2, TWILIGHTCOUNCIL: 3, ROBOTICSFACILITY: 3, ROBOTICSBAY: 3, STARGATE: 3, FLEETBEACON: 3,
+    TEMPLARARCHIVE: 3, DARKSHRINE: 2,
+    COMMANDCENTER: 5, ORBITALCOMMAND: 5, PLANETARYFORTRESS: 5, SUPPLYDEPOT: 2, SUPPLYDEPOTLOWERED: 2, BARRACKS: 3,
+    FACTORY: 3, STARPORT: 3, ENGINEERINGBAY: 3, REFINERY: 3, BUNKER: 3, MISSILETURRET: 2, ARMORY: 3,
+    GHOSTACADEMY: 3, FUSIONCORE: 3, SENSORTOWER: 1,
+    HATCHERY: 5, LAIR: 5, HIVE: 5, EXTRACTOR: 3, SPAWNINGPOOL: 3, EVOLUTIONCHAMBER: 3, ROACHWARREN: 3,
+    BANELINGNEST: 3, HYDRALISKDEN: 3, SPIRE: 2, GREATERSPIRE: 2, INFESTATIONPIT: 3, ULTRALISKCAVERN: 3,
+    SPINECRAWLER: 2, SPORECRAWLER: 2,
+}
+
+# Structures that only work inside a power field
+NEEDS_POWER = {
+    GATEWAY, FORGE, CYBERNETICSCORE, PHOTONCANNON, SHIELDBATTERY, TWILIGHTCOUNCIL, ROBOTICSFACILITY, ROBOTICSBAY,
+    STARGATE, FLEETBEACON, TEMPLARARCHIVE, DARKSHRINE,
+}
+
+# Placed by the client only: town halls keep a distance to resources, gas buildings go onto geysers
+CLIENT_ONLY = {NEXUS, COMMANDCENTER, HATCHERY, ASSIMILATOR, REFINERY, EXTRACTOR}
+
+
+def footprint(center, width, height=None, certain=True):
+
+    """
+
+    (column, row, width, height, certain) footprint centered on 'center', square unless 'height' is given.
+
+    """
+
+    height = width if height is None else height
+    return (math.floor(center[0] - width / 2.0 + 0.5), math.floor(center[1] - height / 2.0 + 0.5),
+            width, height, certain)
+
+
+class PlacementGrid(object):
+
+    """
+
+    Local building placement: the map's placement grid minus every footprint that stands on it.
+
+    The placement grid is read once from game_info. Structures (own, enemy, minerals, geysers, rocks) stamp their
+    footprint into a count grid by tag, so a step only re-stamps what appeared, moved (lifted buildings) or died.
+    Footprints of unknown types are approximated from the unit radius and stamped into a separate uncertain grid,
+    a spot touching them is confirmed with the client before it is used. Ready pylons are kept for the power check.
+
+    For every footprint size a 'fits' map (every cell of the footprint placeable and free) is derived with an
+    integral image when the footprints changed. A search then walks the same candidate rings as
+    BotAI.find_placement, precomputed as offsets, and reads the fits map instead of querying the client per ring.
+
+    """
+
+    def __init__(self, placement_grid, max_distance=MAX_DISTANCE, step=PLACEMENT_STEP):
+
+        """
+
+        Arguments:
+            placement_grid (SC2 PixelMap): game_info.placement_grid
+            max_distance (int): half side of the searched square
+            step (int): distance between two candidate rings
+
+        """
+
+        self.placeable = np.asarray(placement_grid.data_numpy, bool).copy()
+        self.shape = self.placeable.shape
+        self.blocked = np.zeros(self.shape, np.int16)
+        self.uncertain = np.zeros(self.shape, np.int16)
+        self.stamps = {}
+        self.reservations = {}
+        self.pylons = {}
+        self.max_distance = max_distance
+        self.step = step
+        self._fits = {}
+        self._power = np.empty((0, 2))
+        self._reservation = 0
+
+        # Candidate offsets ring by ring, in the order find_placement tries them
+        offsets = [(0, 0, 0)]
+        for ring, distance in enumerate(range(step, max_distance, step), 1):
+            span = range(-distance, distance + 1, step)
+            ring_offsets = ([(dx, -distance) for dx in span] + [(dx, distance) for dx in span] +
+                            [(-distance, dy) for dy in span] + [(distance, dy) for dy in span])
+            offsets.extend((dx, dy, ring) for dx, dy in ring_offsets)
+        self.offsets = np.array(offsets, np.int32)
+
+    def _stamp(self, stamp, sign):
+
+        column, row, width, height, certain = stamp
+        grid = self.blocked if certain else self.uncertain
+        grid[max(row, 0):max(row + height, 0), max(column, 0):max(column + width, 0)] += sign
+        self._fits.clear()
+
+    def stamp_of(self, unit):
+
+        """
+
+        Footprint of a unit (see footprint()), None for units that do not block placement.
+
+        """
+
+        if unit.is_mineral_field:
+            return footprint(unit.position, 2, 1)
+        if unit.is_vespene_geyser:
+            return footprint(unit.position, 3)
+        if not unit.is_structure or unit.is_flying:
+            return None
+
+        size = FOOTPRINTS.get(unit.type_id)
+        if size is not None:
+            return footprint(unit.position, size)
+        return footprint(unit.position, max(int(round(unit.radius * 2)), 1), certain=False)
+
+    def update(self, units, game_loop=0):
+
+        """
+
+        Bring the footprints and the pylon power fields up to date.
+
+        Arguments:
+            units (SC2 Units): every unit on the map that can block placement (own, enemy and neutral)
+            game_loop (int): current game loop, expires reservations
+
+        """
+
+        stamps = self.stamps
+        seen = set()
+        pylons = {}
+
+        for unit in units:
+            stamp = self.stamp_of(unit)
+            if stamp is None:
+                continue
+
+            tag = unit.tag
+            seen.add(tag)
+            previous = stamps.get(tag)
+            if previous != stamp:
+                if previous is not None:
+                    self._stamp(previous, -1)
+                self._stamp(stamp, 1)
+                stamps[tag] = stamp
+
+            if unit.type_id == PYLON and unit.is_mine and unit.is_ready:
+                pylons[tag] = unit.position
+
+        for tag in [tag for tag in stamps if tag not in seen]:
+            self._stamp(stamps.pop(tag), -1)
+
+        # Spots handed out whose structure had its chance to show up
+        for key in [key for key, (expiry, stamp) in self.reservations.items() if expiry <= game_loop]:
+            self._stamp(self.reservations.pop(key)[1], -1)
+
+        if pylons.keys() != self.pylons.keys():
+            self.pylons = pylons
+            self._power = np.array(list(pylons.values()), float).reshape(-1, 2)
+
+    def reserve(self, unit_type, position, game_loop):
+
+        """
+
+        Keep a spot that was handed out to a worker free for RESERVE_LOOPS.
+
+        """
+
+        stamp = footprint(position, FOOTPRINTS[unit_type])
+        self._reservation += 1
+        self.reservations[self._reservation] = (game_loop + RESERVE_LOOPS, stamp)
+        self._stamp(stamp, 1)
+
+    def fits(self, size):
+
+        """
+
+        (fits, uncertain) maps over bottom left cells: the footprint is placeable and free / touches an
+        approximated footprint.
+
+        """
+
+        maps = self._fits.get(size)
+        if maps is None:
+            maps = (self._window(self.placeable & (self.blocked == 0), size) == size * size,
+                    self._window(self.uncertain > 0, size) > 0)
+            self._fits[size] = maps
+        return maps
+
+    def _window(self, grid, size):
+
+        """
+
+        Sum of 'grid' over every size x size window, indexed by the window's bottom left cell.
+
+        """
+
+        integral = np.zeros((self.shape[0] + 1, self.shape[1] + 1), np.int32)
+        integral[1:, 1:] = grid.cumsum(0).cumsum(1)
+        sums = np.zeros(self.shape, np.int32)
+        height, width = self.shape[0] - size + 1, self.shape[1] - size + 1
+        if height > 0 and width > 0:
+            sums[:height, :width] = (integral[size:, size:] - integral[:height, size:] -
+                                     integral[size:, :width] + integral[:height, :width])
+        return sums
+
+    def find(self, unit_type, near, random_alternative=True):
+
+        """
+
+        A spot for a structure around 'near', looked up locally.
+
+        Arguments:
+            unit_type (UnitTypeId): structure to place
+            near (Point2): preferred position
+            random_alternative (bool): pick at random among the spots of the closest ring, like find_placement
+
+        Returns:
+            position (Point2): center of the spot, None when there is none
+            certain (bool): False when the answer has to be confirmed with the client: the spot touches an
+                approximated footprint, or no spot was found but approximated footprints were in the way
+
+        """
+
+        size = FOOTPRINTS.get(unit_type)
+        if size is None or unit_type in CLIENT_ONLY:
+            return None, False
+
+        fits, uncertain = self.fits(size)
+
+        # Candidate centers: whole cells for even footprints, cell centers for odd ones
+        origin = np.rint([near[0], near[1]])
+        centers = origin[None, :] + self.offsets[:, :2] + (0.5 if size % 2 else 0.0)
+        corners = np.floor(centers - size / 2.0 + 0.5).astype(np.int32)
+
+        inside = ((corners[:, 0] >= 0) & (corners[:, 1] >= 0) &
+                  (corners[:, 0] + size <= self.shape[1]) & (corners[:, 1] + size <= self.shape[0]))
+        valid = np.zeros(len(centers), bool)
+        valid[inside] = fits[corners[inside, 1], corners[inside, 0]]
+
+        if unit_type in NEEDS_POWER:
+            if not len(self._power):
+                return None, True
+            distance = np.sqrt(np.square(centers[:, None, :] - self._power[None, :, :]).sum(axis=2))
+            valid &= (distance <= POWER_RADIUS).any(axis=1)
+
+        found = np.flatnonzero(valid)
+        if not len(found):
+            return None, not uncertain[corners[inside, 1], corners[inside, 0]].any()
+
+        ring = self.offsets[found[0], 2]
+        closest = found[self.offsets[found, 2] == ring]
+        index = random.choice(closest) if random_alternative else closest[0]
+        certain = not uncertain[corners[index, 1], corners[index, 0]]
+        return Point2((float(centers[index, 0]), float(centers[index, 1]))), certain
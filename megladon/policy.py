@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+#
+# Megladon Policy Service
+#
+# -----------------------
+
+# Main Modules
+# ------------
+import time
+import random
+import asyncio
+import importlib
+import collections
+import concurrent.futures
+import numpy as np
+
+# Policy Constants
+# ----------------
+ACTIONS = 4             # attack decisions: wait, nearest threat, enemy structure, enemy start
+DEADLINE = 0.002        # seconds a step waits for a decision before falling back, the event loop keeps running
+WORKERS = 1
+CACHE_SIZE = 16         # decisions kept for frames that barely change
+THUMBNAIL_STRIDE = 4    # frames are compared on every 4th pixel in both directions
+SIMILARITY = 0.01       # a frame with at most this share of changed thumbnail pixels reuses a cached decision
+
+# Where a decision came from
+POLICY = 'policy'
+CACHE = 'cache'
+FALLBACK = 'fallback'
+
+
+def load_policy(spec):
+
+    """
+
+    Load a policy from a 'module:attribute' spec, e.g. MEGLADON_POLICY=models.stalkers:predict.
+
+    A policy is a plain function (CPU only, it runs in a worker) that takes an intel frame and returns a score per
+    action, the highest score is the decision.
+
+    """
+
+    module, _, attribute = spec.partition(':')
+    return getattr(importlib.import_module(module), attribute or 'policy')
+
+
+def random_decision():
+
+    return random.randrange(0, ACTIONS)
+
+
+def decision(policy, frame):
+
+    """
+
+    Run the policy on one frame in a worker.
+
+    """
+
+    return int(np.argmax(policy(frame)))
+
+
+class PolicyService(object):
+
+    """
+
+    Asynchronous policy inference for the attack decisions.
+
+    A frame is copied and handed to a thread (or process) pool, and the step awaits the answer for at most the
+    deadline without blocking the event loop. When the answer is late the fallback decides and the answer is not
+    thrown away: it is kept with the frame it was computed for, like every answer, and a later frame that barely
+    differs from one of the kept frames reuses its decision without running the policy at all.
+
+    """
+
+    def __init__(self, policy, workers=WORKERS, deadline=DEADLINE, processes=False, fallback=random_decision,
+                 cache_size=CACHE_SIZE, similarity=SIMILARITY):
+
+        """
+
+        Arguments:
+            policy (Function): frame -> score per action, has to be picklable with processes=True
+            workers (int): inference workers
+            deadline (float): seconds a decision may take before the fallback is used
+            processes (bool): run the policy in a process pool instead of threads
+            fallback (Function): decision when the policy is late
+            cache_size (int): decisions kept for similar frames
+            similarity (float): share of changed thumbnail pixels up to which a frame counts as the same
+
+        """
+
+        self.policy = policy
+        self.workers = workers
+        self.deadline = deadline
+        self.fallback = fallback
+        self.similarity = similarity
+        executor = concurrent.futures.ProcessPoolExecutor if processes else concurrent.futures.ThreadPoolExecutor
+        self.executor = executor(max_workers=workers)
+        self.cache = collections.deque(maxlen=cache_size)
+        self.in_flight = []
+        self.sources = collections.Counter()
+        self.latency = []
+
+    def _harvest(self):
+
+        """
+
+        Move finished answers into the cache.
+
+        """
+
+        for entry in [entry for entry in self.in_flight if entry[0].done()]:
+            self.in_flight.remove(entry)
+            future, thumbnail, submitted = entry
+            if future.cancelled() or future.exception() is not None:
+                continue
+            self.latency.append(time.perf_counter() - submitted)
+            self.cache.append((thumbnail, future.result()))
+
+    def cached(self, thumbnail):
+
+        """
+
+        Decision of the most recent kept frame similar to 'thumbnail', None when there is none.
+
+        """
+
+        for kept, choice in reversed(self.cache):
+            if kept.shape == thumbnail.shape and \
+                    np.count_nonzero((kept != thumbnail).any(axis=-1)) <= self.similarity * thumbnail[..., 0].size:
+                return choice
+        return None
+
+    async def decide(self, frame):
+
+        """
+
+        Decide on an intel frame.
+
+        Arguments:
+            frame (Numpy Array): intel frame, the buffer may be reused after this returns
+
+        Returns:
+            choice (int): action index
+            source (String): POLICY, CACHE or FALLBACK
+
+        """
+
+        self._harvest()
+        if frame is None:
+            return self._count(self.fallback(), FALLBACK)
+
+        thumbnail = frame[::THUMBNAIL_STRIDE, ::THUMBNAIL_STRIDE].copy()
+        choice = self.cached(thumbnail)
+        if choice is not None:
+            return self._count(choice, CACHE)
+
+        # Workers busy with frames that are already late: do not queue up behind them
+        if len(self.in_flight) >= self.workers:
+            return self._count(self.fallback(), FALLBACK)
+
+        future = self.executor.submit(decision, self.policy, np.array(frame))
+        entry = (future, thumbnail, time.perf_counter())
+        self.in_flight.append(entry)
+
+        done, _ = await asyncio.wait({asyncio.wrap_future(future)}, timeout=self.deadline)
+        if not done:
+            return self._count(self.fallback(), FALLBACK)
+
+        self._harvest()
+        if future.exception() is not None:
+            return self._count(self.fallback(), FALLBACK)
+        return self._count(future.result(), POLICY)
+
+    def _count(self, choice, source):
+
+        self.sources[source] += 1
+        return choice, source
+
+    def summary(self):
+
+        """
+
+        Decisions per source and the median inference latency in milliseconds.
+
+        """
+
+        latency = float(np.median(self.latency)) * 1000 if self.latency else None
+        return dict(self.sources, latency_ms=latency)
+
+    def close(self):
+
+        for future, _, _ in self.in_flight:
+            future.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+#
+# Megladon Production Allocator
+#
+# -----------------------------
+
+# Main Modules
+# ------------
+import collections
+
+# Megladon Submodules
+# -------------------
+from scheduler import HIGH
+
+# Production Constants
+# --------------------
+RESERVE_PRIORITY = HIGH     # an unaffordable request at this priority or above holds the bank for the next step
+PRODUCTION = 'allocate_production'  # profiler entry of the allocation, granted requests count as its actions
+
+
+class ProductionRequest(object):
+
+    """
+
+    Something a routine wants produced this step: a unit command (train, warp in, morph, gas building) or a structure
+    that still has to be placed.
+
+    """
+
+    __slots__ = ['priority', 'order', 'unit_type', 'command', 'build', 'done', 'routine']
+
+    def __init__(self, priority, order, unit_type, command=None, build=None, done=None, routine=None):
+
+        """
+
+        Arguments:
+            priority (int): CRITICAL, HIGH, NORMAL or LOW, lower is allocated first
+            order (int): position among the requests of the step, breaks priority ties
+            unit_type (UnitTypeId): what gets produced, priced by its type, None for morphs and research
+            command (SC2 UnitCommand): command to send when the request is granted
+            build (Coroutine Function): places a structure when the request is granted, returns an ActionResult
+                or None like BotAI.build
+            done (Function): called with the result of 'build'
+            routine (String): routine that asked, its actions are counted for it
+
+        """
+
+        self.priority = priority
+        self.order = order
+        self.unit_type = unit_type
+        self.command = command
+        self.build = build
+        self.done = done
+        self.routine = routine
+
+
+class ProductionAllocator(object):
+
+    """
+
+    Grants the production requests of a step in one batch against the minerals, vespene and supply left.
+
+    Routines only say what they want and how badly, instead of checking can_afford and issuing on their own, so the
+    resources no longer go to whichever routine happens to run first. Requests are granted by priority (and in the
+    order they came in on a tie): one that fits is issued and paid for, one that does not is skipped, and when it is
+    important enough (RESERVE_PRIORITY) its cost is held back from the requests after it, so cheaper, less important
+    requests cannot keep starving it. Being short of supply reserves nothing, the money can still go elsewhere.
+
+    Costs are looked up once per unit type and kept, calculate_ability_cost walks every unit type on each call.
+
+    """
+
+    def __init__(self, actions, reserve_priority=RESERVE_PRIORITY):
+
+        """
+
+        Arguments:
+            actions (ActionCollector): the step's action batch, granted commands go there
+            reserve_priority (int): requests at this priority or above reserve the bank when unaffordable
+
+        """
+
+        self.actions = actions
+        self.reserve_priority = reserve_priority
+        self.requests = []
+        self.granted = collections.Counter()
+        self.deferred = collections.Counter()
+        self._costs = {}
+
+    def request(self, command, priority, unit_type=None):
+
+        """
+
+        Ask for a unit command that costs resources (train, warp in, research, build on a target).
+
+        Arguments:
+            command (SC2 UnitCommand): the command
+            priority (int): CRITICAL, HIGH, NORMAL or LOW
+            unit_type (UnitTypeId): unit or structure it produces, None to price the command's ability
+
+        """
+
+        self.requests.append(ProductionRequest(priority, len(self.requests), unit_type, command=command,
+                                               routine=self.actions.routine))
+
+    def request_structure(self, unit_type, priority, build, done=None):
+
+        """
+
+        Ask for a structure whose spot is only looked up when the request is granted.
+
+        Arguments:
+            unit_type (UnitTypeId): the structure
+            priority (int): CRITICAL, HIGH, NORMAL or LOW
+            build (Coroutine Function): places it, returns None when the build was issued
+            done (Function): result -> None, called once 'build' ran
+
+        """
+
+        self.requests.append(ProductionRequest(priority, len(self.requests), unit_type, build=build, done=done,
+                                               routine=self.actions.routine))
+
+    def cost(self, game_data, request):
+
+        """
+
+        (minerals, vespene, supply) a request takes.
+
+        The cost of a unit comes from the ability that creates it, so warping in costs what training does (python-sc2
+        prices WARPGATETRAIN abilities at nothing).
+
+        """
+
+        key = request.unit_type if request.unit_type is not None else request.command.ability
+        if key not in self._costs:
+            if request.unit_type is not None:
+                unit = game_data.units[key.value]
+                cost = game_data.calculate_ability_cost(unit.creation_ability)
+                supply = unit._proto.food_required
+            else:
+                cost = game_data.calculate_ability_cost(key)
+                supply = 0
+            self._costs[key] = (cost.minerals, cost.vespene, supply)
+        return self._costs[key]
+
+    async def allocate(self, bot):
+
+        """
+
+        Grant this step's requests and issue the granted ones into the step's action batch.
+
+        Arguments:
+            bot (Megladon): the bot, its minerals and vespene are taken off like issue() does
+
+        Returns:
+            granted (int): requests that were issued
+
+        """
+
+        requests, self.requests = self.requests, []
+        if not requests:
+            return 0
+
+        requests.sort(key=lambda request: (request.priority, request.order))
+        reserved_minerals = reserved_vespene = 0
+        supply_left = bot.supply_left
+        granted = 0
+
+        for request in requests:
+            minerals, vespene, supply = self.cost(bot._game_data, request)
+            name = request.unit_type.name if request.unit_type is not None else request.command.ability.name
+            affordable = minerals <= bot.minerals - reserved_minerals and vespene <= bot.vespene - reserved_vespene
+
+            if not affordable or supply > supply_left:
+                self.deferred[name] += 1
+                if not affordable and supply <= supply_left and request.priority <= self.reserve_priority:
+                    reserved_minerals += minerals
+                    reserved_vespene += vespene
+                continue
+
+            # Actions are counted for the routine that asked
+            routine, self.actions.routine = self.actions.routine, request.routine
+            if request.command is not None:
+                refund_minerals, refund_vespene = self.actions.add(request.command, (minerals, vespene))
+                bot.minerals -= minerals - refund_minerals
+                bot.vespene -= vespene - refund_vespene
+                result = None
+            else:
+                # Placing pays through bot.issue, nothing is spent when no spot or worker is found
+                result = await request.build()
+                if request.done is not None:
+                    request.done(result)
+            self.actions.routine = routine
+
+            if result is None:
+                supply_left -= supply
+                granted += 1
+                self.granted[name] += 1
+            else:
+                self.deferred[name] += 1
+
+        return granted
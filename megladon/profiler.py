@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+#
+# Megladon Step Profiler
+#
+# ----------------------
+
+# Main Modules
+# ------------
+import os
+import sys
+import csv
+import json
+import time
+import collections
+import numpy as np
+
+# Profiler Constants
+# ------------------
+WINDOW = 2000
+STEP = 'on_step'
+CSV_FIELDS = ['routine', 'calls', 'p50_ms', 'p95_ms', 'max_ms', 'total_ms', 'actions', 'actions_per_call',
+              'net_blocks_per_call']
+
+
+def allocated_blocks():
+
+    """
+
+    Number of memory blocks currently allocated by the interpreter, cheap enough to read around every routine.
+
+    The difference around a routine is what it left allocated (net blocks), not how much it allocated: blocks it
+    freed again cancel out.
+
+    """
+
+    return sys.getallocatedblocks()
+
+
+class RoutineStats(object):
+
+    """
+
+    Rolling timing window plus running totals for one routine.
+
+    """
+
+    def __init__(self, window=WINDOW):
+
+        self.durations = collections.deque(maxlen=window)
+        self.net_blocks = collections.deque(maxlen=window)
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.actions = 0
+
+    def add(self, duration, actions, net_blocks):
+
+        self.durations.append(duration)
+        self.net_blocks.append(net_blocks)
+        self.calls += 1
+        self.total += duration
+        self.actions += actions
+        if duration > self.max:
+            self.max = duration
+
+    def summary(self):
+
+        durations = np.array(self.durations) * 1000.0
+        return {
+            'calls': self.calls,
+            'p50_ms': float(np.percentile(durations, 50)) if len(durations) else 0.0,
+            'p95_ms': float(np.percentile(durations, 95)) if len(durations) else 0.0,
+            'max_ms': self.max * 1000.0,
+            'total_ms': self.total * 1000.0,
+            'actions': self.actions,
+            'actions_per_call': self.actions / float(self.calls) if self.calls else 0.0,
+            'net_blocks_per_call': float(np.mean(self.net_blocks)) if self.net_blocks else 0.0,
+        }
+
+
+class StepProfiler(object):
+
+    """
+
+    Per-routine wall time, action count and net memory blocks for every step.
+
+    Off by default (or set MEGLADON_PROFILE=1). While disabled the scheduler skips it entirely, so the only cost is
+    one attribute check per routine. It can be switched on and off at any point of a game through 'enabled'.
+
+    """
+
+    def __init__(self, enabled=None, window=WINDOW):
+
+        if enabled is None:
+            enabled = os.environ.get('MEGLADON_PROFILE', '0') not in ('', '0')
+
+        self.enabled = enabled
+        self.window = window
+        self.stats = {}
+        self.started = time.time()
+
+    def reset(self):
+
+        """
+
+        Forget the samples of the last game, the report of a game only covers its own steps.
+
+        """
+
+        self.stats = {}
+        self.started = time.time()
+
+    def record(self, routine, duration, actions=0, net_blocks=0):
+
+        """
+
+        Record one run of 'routine'.
+
+        Arguments:
+            routine (String): routine name
+            duration (float): wall time in seconds
+            actions (int): commands the routine issued
+            net_blocks (int): memory blocks the routine left allocated (allocated minus freed)
+
+        """
+
+        stats = self.stats.get(routine)
+        if stats is None:
+            stats = self.stats[routine] = RoutineStats(self.window)
+        stats.add(duration, actions, net_blocks)
+
+    def summary(self):
+
+        """
+
+        Summary per routine, slowest (p95) first.
+
+        """
+
+        rows = [dict(routine=routine, **stats.summary()) for routine, stats in self.stats.items()]
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def write_report(self, prefix):
+
+        """
+
+        Write the per-game report as '<prefix>.profile.json' and '<prefix>.profile.csv'.
+
+        Arguments:
+            prefix (String): path prefix, its directory is created when missing
+
+        Returns:
+            paths (List): the files that were written
+
+        """
+
+        rows = self.summary()
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        json_path = '{}.profile.json'.format(prefix)
+        with open(json_path, 'w') as report:
+            json.dump({'started': self.started, 'window': self.window, 'routines': rows}, report, indent=2)
+
+        csv_path = '{}.profile.csv'.format(prefix)
+        with open(csv_path, 'w', newline='') as report:
+            writer = csv.DictWriter(report, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+
+        return [json_path, csv_path]
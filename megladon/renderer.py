@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+#
+# Megladon Intel Renderer
+#
+# -----------------------
+
+# Main Modules
+# ------------
+import time
+import collections
+import numpy as np
+
+# Renderer Constants
+# ------------------
+TIMING_WINDOW = 1000
+
+# Border around the visible frame. A disc of radius <= PADDING / 2 centered anywhere it can still be
+# seen lands fully inside the canvas, so stamping never needs per-pixel bounds checks.
+PADDING = 32
+
+# Row offset -> how far past the end of the bar the row extends. This is the footprint of a
+# 3 pixel thick cv2.line with round caps, so the bars match what intel() used to draw.
+BAR_PROFILE = ((-2, 0), (-1, 1), (0, 2), (1, 1), (2, 0))
+
+# A whole (b, g, r) pixel as one element, so a stamp is a single fancy-index write.
+PIXEL = np.dtype('V3')
+
+
+def pixel(color):
+
+    """
+
+    Pack a (b, g, r) color into a single PIXEL scalar.
+
+    """
+
+    return np.array(color, np.uint8).view(PIXEL)[0]
+
+
+def disc_offsets(radius):
+
+    """
+
+    Pixel offsets covered by a filled disc (same footprint as cv2.circle with thickness -1).
+
+    Arguments:
+        radius (int): radius of the disc in pixels
+
+    Returns:
+        offsets (Tuple): row offsets and column offsets as two int arrays
+
+    """
+
+    span = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(span, span, indexing='ij')
+    inside = (dx * dx + dy * dy) <= radius * radius
+    return dy[inside], dx[inside]
+
+
+class IntelRenderer(object):
+
+    """
+
+    Batched renderer for the intel frame.
+
+    The canvas is allocated once and every layer is stamped with a precomputed disc mask for all units of
+    that layer in a single fancy-indexing write. Rows are written in flipped order (row 0 is the top of the
+    map) so no flip copy is needed afterwards, and 'frame' is a view of the visible part of the canvas.
+
+    """
+
+    def __init__(self, map_size, draw_dict):
+
+        """
+
+        Arguments:
+            map_size (Tuple): (width, height) of the map in cells
+            draw_dict (Dict): layer key -> [radius, (b, g, r)]
+
+        """
+
+        self.width = int(map_size[0])
+        self.height = int(map_size[1])
+        self.stride = self.width + 2 * PADDING
+
+        self.canvas = np.zeros((self.height + 2 * PADDING, self.stride, 3), np.uint8)
+        self.frame = self.canvas[PADDING:PADDING + self.height, PADDING:PADDING + self.width]
+        self.pixels = self.canvas.view(PIXEL).reshape(-1)
+
+        self.stamps = {}
+        self.render_times = collections.deque(maxlen=TIMING_WINDOW)
+
+        for key, (radius, color) in draw_dict.items():
+            self.add_layer(key, radius, color)
+
+    def use_canvas(self, canvas):
+
+        """
+
+        Render into 'canvas' from now on, e.g. a slot of a shared memory frame ring.
+
+        Arguments:
+            canvas (Numpy Array): C-contiguous uint8 array with the same shape as the current canvas
+
+        """
+
+        if canvas.shape != self.canvas.shape or not canvas.flags['C_CONTIGUOUS']:
+            raise ValueError('Canvas must be C-contiguous with shape {}'.format(self.canvas.shape))
+
+        self.canvas = canvas
+        self.frame = canvas[PADDING:PADDING + self.height, PADDING:PADDING + self.width]
+        self.pixels = canvas.view(PIXEL).reshape(-1)
+
+    def add_layer(self, key, radius, color):
+
+        """
+
+        Register a layer with its disc mask and color.
+
+        """
+
+        if radius > PADDING // 2:
+            raise ValueError('Radius {} is larger than the renderer supports ({})'.format(radius, PADDING // 2))
+
+        dy, dx = disc_offsets(radius)
+        self.stamps[key] = (dx - dy * self.stride, pixel(color))
+
+    def positions(self, units):
+
+        """
+
+        Collect unit positions into a single (N, 2) int array, truncated the same way as int(pos).
+
+        """
+
+        if not units:
+            return np.empty((0, 2), np.intp)
+        return np.array([unit.position for unit in units], np.float64).astype(np.intp)
+
+    def stamp(self, key, positions):
+
+        """
+
+        Stamp the disc of layer 'key' at every position.
+
+        Arguments:
+            key (Object): layer key registered in draw_dict
+            positions (Numpy Array): (N, 2) map coordinates (x, y)
+
+        """
+
+        if not len(positions):
+            return
+
+        offsets, color = self.stamps[key]
+
+        rows = (self.height - 1 + PADDING) - positions[:, 1]
+        cols = positions[:, 0] + PADDING
+
+        # Anything this far outside the map is invisible anyway.
+        low = PADDING // 2
+        high_row = self.height + PADDING + low
+        high_col = self.width + PADDING + low
+        if rows.min() < low or cols.min() < low or rows.max() >= high_row or cols.max() >= high_col:
+            keep = (rows >= low) & (rows < high_row) & (cols >= low) & (cols < high_col)
+            rows = rows[keep]
+            cols = cols[keep]
+
+        self.pixels[((rows * self.stride + cols)[:, None] + offsets[None, :]).ravel()] = color
+
+    def bar(self, y, length, color):
+
+        """
+
+        Draw a resource bar starting at the left edge, in map row 'y'.
+
+        """
+
+        color = pixel(color)
+        pixels = self.frame.view(PIXEL)[:, :, 0]
+        end = max(int(length), 0)
+        for offset, extra in BAR_PROFILE:
+            row = (self.height - 1) - (y + offset)
+            if 0 <= row < self.height:
+                pixels[row, 0:min(end + extra + 1, self.width)] = color
+
+    def render(self, layers, bars=()):
+
+        """
+
+        Render a full intel frame.
+
+        Arguments:
+            layers (List): ordered (key, units or (N, 2) positions) pairs, later layers draw over earlier ones
+            bars (List): ordered (y, length, color) resource bars
+
+        Returns:
+            frame (Numpy Array): the rendered frame, already in flipped (image) orientation
+
+        """
+
+        start = time.perf_counter()
+
+        self.canvas.fill(0)
+
+        for key, positions in layers:
+            if not isinstance(positions, np.ndarray):
+                positions = self.positions(positions)
+            self.stamp(key, positions)
+
+        for y, length, color in bars:
+            self.bar(y, length, color)
+
+        self.render_times.append(time.perf_counter() - start)
+        return self.frame
+
+    def timing_summary(self):
+
+        """
+
+        Summarise recent render times in milliseconds.
+
+        """
+
+        if not self.render_times:
+            return {'frames': 0, 'mean_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+
+        times = np.array(self.render_times) * 1000.0
+        return {
+            'frames': len(times),
+            'mean_ms': float(times.mean()),
+            'p95_ms': float(np.percentile(times, 95)),
+            'max_ms': float(times.max()),
+        }
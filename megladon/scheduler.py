@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+#
+# Megladon Routine Scheduler
+#
+# --------------------------
+
+# Main Modules
+# ------------
+import time
+import collections
+
+# Megladon Submodules
+# -------------------
+from profiler import allocated_blocks
+
+# Priorities (lower runs no matter what, higher is shed first)
+# -------------------------------------------------------------
+CRITICAL = 0
+HIGH = 1
+NORMAL = 2
+LOW = 3
+
+# Scheduler Constants
+# -------------------
+STEP_BUDGET = 0.035     # seconds of wall clock per step, realtime gives ~44ms per game step
+SHED_PRIORITY = NORMAL  # routines at this priority or lower can be postponed
+MAX_POSTPONE = 10       # a postponed routine runs anyway after this many skipped steps
+
+
+class Routine(object):
+
+    """
+
+    A bot coroutine registered with the scheduler.
+
+    """
+
+    def __init__(self, name, priority=NORMAL, cadence=1, budget=None):
+
+        """
+
+        Arguments:
+            name (String): name of the bot method to run
+            priority (int): CRITICAL, HIGH, NORMAL or LOW
+            cadence (int): minimum number of game loops between two runs
+            budget (float): expected wall time in seconds, used when deciding whether it fits this step
+
+        """
+
+        self.name = name
+        self.priority = priority
+        self.cadence = cadence
+        self.budget = budget
+
+        self.last_run = None
+        self.last_duration = 0.0
+        self.postponed = 0
+
+    def due(self, game_loop):
+
+        return self.last_run is None or game_loop - self.last_run >= self.cadence
+
+    def expected_duration(self):
+
+        return self.budget if self.budget is not None else self.last_duration
+
+
+class RoutineScheduler(object):
+
+    """
+
+    Runs the bot routines in registration order, each at its own cadence.
+
+    When a step is running out of its wall clock budget, due routines at SHED_PRIORITY or lower are postponed
+    to a later step, while time is kept aside for the higher priority routines that still have to run.
+
+    """
+
+    def __init__(self, step_budget=STEP_BUDGET):
+
+        self.step_budget = step_budget
+        self.routines = []
+        self.profiler = None
+
+        self.postponed = collections.Counter()
+        self.overruns = collections.Counter()
+        self.last_step_time = 0.0      # wall time of the last step, on_step sets it again once the actions went out
+
+    def register(self, name, priority=NORMAL, cadence=1, budget=None):
+
+        """
+
+        Register a routine, routines run in the order they are registered.
+
+        """
+
+        routine = Routine(name, priority, cadence, budget)
+        self.routines.append(routine)
+        return routine
+
+    def reset(self):
+
+        """
+
+        Forget when routines last ran, for a new game whose game loop starts at 0 again. Durations are kept, they
+        still tell how long a routine takes.
+
+        """
+
+        for routine in self.routines:
+            routine.last_run = None
+            routine.postponed = 0
+        self.postponed = collections.Counter()
+        self.overruns = collections.Counter()
+
+    async def run(self, bot, game_loop, step_start=None):
+
+        """
+
+        Run every routine that is due on 'game_loop'.
+
+        Arguments:
+            bot (Megladon): bot owning the routines
+            game_loop (int): current game loop
+            step_start (float): perf_counter() when the step began, what the step did before the routines counts
+                against the budget too, defaults to now
+
+        Returns:
+            ran (List): names of the routines that ran this step
+
+        """
+
+        start = time.perf_counter() if step_start is None else step_start
+        profiler = self.profiler if self.profiler is not None and self.profiler.enabled else None
+        due = [routine for routine in self.routines if routine.due(game_loop)]
+
+        # Time the remaining high priority routines are expected to need
+        reserved = sum(routine.expected_duration() for routine in due if routine.priority < SHED_PRIORITY)
+
+        ran = []
+        for routine in due:
+
+            if routine.priority < SHED_PRIORITY:
+                reserved -= routine.expected_duration()
+
+            elif routine.postponed < MAX_POSTPONE:
+                elapsed = time.perf_counter() - start
+                if elapsed + reserved + routine.expected_duration() > self.step_budget:
+                    routine.postponed += 1
+                    self.postponed[routine.name] += 1
+                    continue
+
+            bot.actions.routine = routine.name
+
+            if profiler is not None:
+                actions_before = bot.actions.issued[routine.name]
+                blocks_before = allocated_blocks()
+
+            routine_start = time.perf_counter()
+            await getattr(bot, routine.name)()
+            routine.last_duration = time.perf_counter() - routine_start
+
+            if profiler is not None:
+                profiler.record(routine.name, routine.last_duration,
+                                bot.actions.issued[routine.name] - actions_before,
+                                allocated_blocks() - blocks_before)
+
+            if routine.budget is not None and routine.last_duration > routine.budget:
+                self.overruns[routine.name] += 1
+
+            routine.last_run = game_loop
+            routine.postponed = 0
+            ran.append(routine.name)
+
+        bot.actions.routine = None
+        self.last_step_time = time.perf_counter() - start
+        return ran
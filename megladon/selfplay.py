@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+#
+# Megladon Self-Play Runner
+#
+# -------------------------
+
+# Main Modules
+# ------------
+import os
+import io
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+import numpy as np
+
+# SC2 Submodules
+# --------------
+from sc2 import Race, Difficulty, Result
+
+# Self-Play Constants
+# -------------------
+MAPS = ['AcropolisLE']
+RACES = ['Terran']
+DIFFICULTIES = ['Easy']
+OUTPUT_DIR = 'episodes'
+SUMMARY = 'selfplay.json'
+WORKER_SUMMARY = 'summary.json'
+SYNTHETIC_STEPS = 600   # on_step calls per synthetic episode
+
+# Set in every pool process by init_worker
+_worker = {}
+
+
+def sc2_host(bot, task):
+
+    """
+
+    Play one real game against the built-in AI.
+
+    Arguments:
+        bot (Megladon): bot to play with
+        task (Dict): the episode task, see plan()
+
+    Returns:
+        result (SC2 Result): outcome of the game
+
+    """
+
+    import sc2
+    from sc2.player import Bot, Computer
+
+    return sc2.run_game(
+        sc2.maps.get(task['map']),
+        [Bot(Race.Protoss, bot), Computer(Race[task['race']], Difficulty[task['difficulty']])],
+        realtime=False,
+        random_seed=task['seed'],
+    )
+
+
+def synthetic_host(bot, task):
+
+    """
+
+    Stand-in for sc2_host that plays the bot against synthetic states, no StarCraft II needed.
+
+    The game phase and the result are drawn from the task seed, so a run is reproducible.
+
+    """
+
+    from synthetic import SyntheticGame, PHASES
+
+    rng = random.Random(task['seed'])
+    game = SyntheticGame(bot, rng.choice(sorted(PHASES)), seed=task['seed'])
+
+    async def play():
+        for step in range(task.get('steps', SYNTHETIC_STEPS)):
+            await game.step()
+
+    asyncio.run(play())
+
+    result = rng.choice([Result.Victory, Result.Defeat])
+    bot.on_end(result)
+    return result
+
+
+HOSTS = {
+    'sc2': sc2_host,
+    'synthetic': synthetic_host,
+}
+
+
+def plan(episodes, maps=MAPS, races=RACES, difficulties=DIFFICULTIES, seed=0, **extra):
+
+    """
+
+    Episode tasks cycling through every (map, race, difficulty) combination.
+
+    Arguments:
+        episodes (int): number of episodes
+        maps (List): map names
+        races (List): opponent race names (Race enum members, e.g. 'Terran')
+        difficulties (List): opponent difficulty names (Difficulty enum members, e.g. 'Easy')
+        seed (int): base seed, every episode gets its own seed from it
+
+    Returns:
+        tasks (List): one dict per episode
+
+    """
+
+    for race in races:
+        Race[race]
+    for difficulty in difficulties:
+        Difficulty[difficulty]
+
+    matchups = itertools.cycle(itertools.product(maps, races, difficulties))
+    return [dict(extra, episode=episode, map=game_map, race=race, difficulty=difficulty, seed=seed + episode)
+            for episode, (game_map, race, difficulty) in zip(range(episodes), matchups)]
+
+
+def init_worker(output, host):
+
+    """
+
+    Pool initializer: every worker process writes its episodes and its summary into its own directory.
+
+    """
+
+    import megladon
+
+    # Nobody is watching a pool of games
+    megladon.HEADLESS = True
+    os.environ.setdefault('SC2PATH', megladon.SC2PATH)
+
+    directory = os.path.join(output, 'worker-{}'.format(os.getpid()))
+    os.makedirs(directory, exist_ok=True)
+    os.environ['MEGLADON_EPISODES'] = directory
+
+    _worker.update(directory=directory, host=HOSTS[host], episodes=[])
+
+
+def run_episode(task):
+
+    """
+
+    Play one episode in a worker process.
+
+    Returns:
+        record (Dict): the task plus result, wall time, frame count and manifest path (None when discarded)
+
+    """
+
+    import megladon
+
+    random.seed(task['seed'])
+    np.random.seed(task['seed'] % 2 ** 32)
+
+    bot = megladon.Megladon(build=task.get('build'))
+    start = time.time()
+
+    # Keep the per-step prints of a whole pool out of the terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = _worker['host'](bot, task)
+
+    manifest = os.path.join(bot.episode.path, 'manifest.json')
+    record = dict(task, result=str(result), seconds=time.time() - start, frames=bot.episode.frames,
+                  worker=os.getpid(), manifest=manifest if os.path.exists(manifest) else None)
+
+    # Rewritten after every episode so a crashed worker still leaves its summary behind
+    _worker['episodes'].append(record)
+    summary = os.path.join(_worker['directory'], WORKER_SUMMARY)
+    with open(summary + '.partial', 'w') as handle:
+        json.dump({'worker': os.getpid(), 'episodes': _worker['episodes']}, handle, indent=2)
+    os.replace(summary + '.partial', summary)
+
+    return record
+
+
+def run(tasks, workers=None, output=OUTPUT_DIR, host='sc2'):
+
+    """
+
+    Play every task across a process pool and write the run summary.
+
+    Arguments:
+        tasks (List): episode tasks, see plan()
+        workers (int): pool size, defaults to the number of cores
+        output (String): directory receiving one sub directory per worker
+        host (String): 'sc2' for real games, 'synthetic' for the stand-in host
+
+    Returns:
+        summary (Dict): run totals and every episode record
+
+    """
+
+    if host not in HOSTS:
+        raise ValueError('Unknown host {}, expected one of {}'.format(host, sorted(HOSTS)))
+
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    os.makedirs(output, exist_ok=True)
+    start = time.time()
+
+    # spawn: every worker starts from a clean interpreter instead of a copy of this one
+    context = multiprocessing.get_context('spawn')
+    records = []
+    with context.Pool(workers, initializer=init_worker, initargs=(output, host), maxtasksperchild=None) as pool:
+        for record in pool.imap_unordered(run_episode, tasks):
+            records.append(record)
+            print('episode {episode} {map} vs {race} {difficulty}: {result} ({frames} frames, {seconds:.1f}s)'.format(
+                **record))
+
+    elapsed = time.time() - start
+    summary = {
+        'host': host,
+        'workers': workers,
+        'episodes': len(records),
+        'seconds': elapsed,
+        'episodes_per_hour': len(records) / elapsed * 3600.0 if elapsed else 0.0,
+        'results': {result: sum(1 for record in records if record['result'] == result)
+                    for result in sorted(set(record['result'] for record in records))},
+        'kept': sum(1 for record in records if record['manifest']),
+        'records': sorted(records, key=lambda record: record['episode']),
+    }
+
+    with open(os.path.join(output, SUMMARY), 'w') as handle:
+        json.dump(summary, handle, indent=2)
+    return summary
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Generate Megladon training episodes in parallel.')
+    parser.add_argument('--episodes', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=None, help='defaults to the number of cores')
+    parser.add_argument('--maps', nargs='+', default=MAPS)
+    parser.add_argument('--races', nargs='+', default=RACES, choices=[race.name for race in Race])
+    parser.add_argument('--difficulties', nargs='+', default=DIFFICULTIES,
+                        choices=[difficulty.name for difficulty in Difficulty])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=OUTPUT_DIR)
+    parser.add_argument('--host', default='sc2', choices=sorted(HOSTS))
+    parser.add_argument('--steps', type=int, default=SYNTHETIC_STEPS, help='steps per synthetic episode')
+    parser.add_argument('--build', help='build from the builds package, defaults to MEGLADON_BUILD or standard')
+    args = parser.parse_args()
+
+    tasks = plan(args.episodes, args.maps, args.races, args.difficulties, args.seed, steps=args.steps,
+                 build=args.build)
+    summary = run(tasks, args.workers, args.output, args.host)
+    print('{episodes} episodes on {workers} workers in {seconds:.1f}s ({episodes_per_hour:.0f}/h), '
+          'kept {kept}: {results}'.format(**summary))
+
+
+if __name__ == '__main__':
+
+    main()
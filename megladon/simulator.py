@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+#
+# Megladon Economy Simulator
+#
+# --------------------------
+
+# Main Modules
+# ------------
+import time
+import argparse
+import numpy as np
+
+# Simulator Constants
+# -------------------
+TICK = 1.0                  # simulated game seconds per step
+HORIZON = 600.0             # game seconds to simulate, 10 minutes
+CANDIDATES = 4096
+
+# Income per worker and game second
+MINERAL_RATE = 0.93         # first two workers on a patch
+MINERAL_RATE_THIRD = 0.33   # third worker on a patch
+PATCHES = 8                 # mineral patches per base
+GAS_RATE = 0.89             # per worker, three per assimilator
+WORKERS_PER_GAS = 3
+
+# structure / unit -> (minerals, vespene, build time in game seconds)
+COSTS = {
+    'probe': (50, 0, 12.0),
+    'pylon': (100, 0, 18.0),
+    'nexus': (400, 0, 71.0),
+    'assimilator': (75, 0, 21.0),
+    'gateway': (150, 0, 46.0),
+    'cyberneticscore': (150, 0, 36.0),
+    'stalker': (125, 50, 27.0),
+}
+PYLON_SUPPLY = 8
+NEXUS_SUPPLY = 15
+MAX_SUPPLY = 200
+STALKER_SUPPLY = 2
+
+# Chronoboost: 50 nexus energy for 20 seconds of +50% production speed
+NEXUS_ENERGY_RATE = 0.7875
+CHRONO_COST = 50
+CHRONO_DURATION = 20.0
+CHRONO_SPEEDUP = 0.5
+
+# Start of a game
+START_WORKERS = 12
+START_MINERALS = 50
+START_ENERGY = 50
+
+# Most structures of one type a candidate can have
+LIMITS = {'pylon': 32, 'nexus': 8, 'gateway': 16, 'assimilator': 16}
+
+# Tunable parameters with the bot's current values and the range searched
+PARAMETERS = {
+    'max_workers': (70, 20, 90),            # Megladon.max_worker_count
+    'workers_per_nexus': (15, 12, 24),      # build_workers trains while workers < nexuses * this
+    'expansions': (4, 1, 8),                # nexuses in the build
+    'gateway_interval': (120, 20, 300),     # game seconds between two gateways
+    'gateways': (12, 1, 16),
+    'supply_buffer': (5, 2, 16),            # build a pylon when less supply than this is left
+    'assimilators_per_nexus': (2, 0, 2),
+    'chrono': (1, 0, 1),                    # chronoboost probes
+}
+
+
+def defaults(count=1):
+
+    """
+
+    Parameter arrays of 'count' candidates that all play like the bot does today.
+
+    """
+
+    return {name: np.full(count, value, float) for name, (value, low, high) in PARAMETERS.items()}
+
+
+def sample(count, seed=0):
+
+    """
+
+    Random candidates drawn uniformly from the PARAMETERS ranges (integers for integer parameters).
+
+    """
+
+    rng = np.random.RandomState(seed)
+    return {name: rng.randint(low, high + 1, count).astype(float) for name, (value, low, high) in PARAMETERS.items()}
+
+
+def from_build(name, count=1):
+
+    """
+
+    Parameters of a build from the builds package: its nexus count, gateway cadence and supply buffer.
+
+    """
+
+    from sc2.constants import NEXUS, GATEWAY
+    from builds.engine import load
+
+    build = load(name)
+    parameters = defaults(count)
+    gateways = build.tracks.get(GATEWAY, [])
+    if gateways:
+        parameters['gateways'][:] = max(item.count for item in gateways)
+        if len(gateways) > 1:
+            parameters['gateway_interval'][:] = gateways[1].time - gateways[0].time
+    parameters['expansions'][:] = max([item.count for item in build.tracks.get(NEXUS, [])] + [1])
+    parameters['supply_buffer'][:] = build.supply_buffer
+    return parameters
+
+
+class Structures(object):
+
+    """
+
+    Structures of one type for every candidate: completion time of the k-th one, inf until it is started.
+
+    """
+
+    def __init__(self, count, limit, start=0):
+
+        self.done = np.full((count, limit), np.inf)
+        self.done[:, :start] = 0.0
+        self.started = np.full(count, start)
+        self.limit = limit
+
+    def ready(self, now):
+
+        return (self.done <= now).sum(axis=1)
+
+    def pending(self, now):
+
+        return self.started - self.ready(now)
+
+    def start(self, mask, now, build_time):
+
+        """
+
+        Start one more structure for the candidates in 'mask'.
+
+        """
+
+        mask = mask & (self.started < self.limit)
+        rows = np.flatnonzero(mask)
+        self.done[rows, self.started[rows]] = now + build_time
+        self.started[rows] += 1
+        return mask
+
+
+def simulate(parameters, horizon=HORIZON, tick=TICK):
+
+    """
+
+    Play the economy of every candidate forward in lockstep.
+
+    Every tick, in the bot's priority order: pylons when supply runs low, probes from every nexus (sped up by
+    chronoboost), the next expansion, gateways on their cadence, the cybernetics core, assimilators, then stalkers
+    from every ready gateway. Like in the production allocator, a pylon or build order structure the bank cannot
+    pay for yet holds its cost back from the stalkers. Income comes from the workers on minerals (two per patch at
+    full rate, a third at a lower one) and on gas. All candidates advance together as NumPy arrays, so a batch
+    costs about as much as a single game.
+
+    Arguments:
+        parameters (Dict): parameter name -> (B,) array, see PARAMETERS
+        horizon (float): game seconds to simulate
+        tick (float): game seconds per step
+
+    Returns:
+        results (Dict): result name -> (B,) array
+
+    """
+
+    count = len(next(iter(parameters.values())))
+    p = {name: np.asarray(values, float) for name, values in parameters.items()}
+
+    minerals = np.full(count, float(START_MINERALS))
+    gas = np.zeros(count)
+    workers = np.full(count, float(START_WORKERS))
+    stalkers = np.zeros(count)
+    energy = np.full(count, float(START_ENERGY))
+    chrono = np.zeros(count)                # boosted nexus-seconds left
+    mined = np.zeros(count)
+    harvested = np.zeros(count)
+    blocked = np.zeros(count)               # seconds spent supply blocked
+
+    pylons = Structures(count, LIMITS['pylon'])
+    nexuses = Structures(count, LIMITS['nexus'], start=1)
+    gateways = Structures(count, LIMITS['gateway'])
+    assimilators = Structures(count, LIMITS['assimilator'])
+    core = Structures(count, 1)
+
+    probe_minerals, _, probe_time = COSTS['probe']
+    stalker_minerals, stalker_gas, stalker_time = COSTS['stalker']
+
+    now = 0.0
+    while now < horizon:
+        nexus_ready = nexuses.ready(now)
+        gateway_ready = gateways.ready(now)
+        supply_cap = np.minimum(NEXUS_SUPPLY * nexus_ready + PYLON_SUPPLY * pylons.ready(now), MAX_SUPPLY)
+        supply_used = workers + STALKER_SUPPLY * stalkers
+
+        # Pylons (CRITICAL): supply is running out and none is on its way
+        wanted = (supply_cap - supply_used < p['supply_buffer']) & (pylons.pending(now) == 0)
+        wanted &= (supply_cap < MAX_SUPPLY) & (pylons.started < pylons.limit)
+        started = pylons.start(wanted & (minerals >= COSTS['pylon'][0]), now, COSTS['pylon'][2])
+        minerals -= COSTS['pylon'][0] * started
+        short = COSTS['pylon'][0] * (wanted & ~started)
+
+        # Probes, chronoboost spent as soon as a nexus has the energy
+        energy += NEXUS_ENERGY_RATE * nexus_ready * tick
+        casts = np.where(p['chrono'] > 0, np.floor(energy / CHRONO_COST), 0)
+        energy -= casts * CHRONO_COST
+        chrono += casts * CHRONO_DURATION
+
+        target = np.minimum(p['max_workers'], nexus_ready * p['workers_per_nexus'])
+        producing = np.where(workers < target, nexus_ready, 0)
+        boosted = np.minimum(chrono, producing * tick)
+        chrono -= boosted
+        progress = (producing * tick + CHRONO_SPEEDUP * boosted) / probe_time
+        progress = np.minimum(progress, np.maximum(target - workers, 0))
+        progress = np.minimum(progress, np.maximum(supply_cap - supply_used, 0))
+        progress = np.minimum(progress, minerals / probe_minerals)
+        workers += progress
+        minerals -= progress * probe_minerals
+
+        # Expansions, one at a time
+        wanted = (nexuses.started < p['expansions']) & (nexuses.pending(now) == 0) & (nexuses.started < nexuses.limit)
+        started = nexuses.start(wanted & (minerals >= COSTS['nexus'][0]), now, COSTS['nexus'][2])
+        minerals -= COSTS['nexus'][0] * started
+        short += COSTS['nexus'][0] * (wanted & ~started)
+
+        # Gateways on their cadence once a pylon is up, the core after the first gateway
+        wanted = (gateways.started < p['gateways']) & (now >= p['gateway_interval'] * gateways.started)
+        wanted &= (pylons.ready(now) > 0) & (gateways.started < gateways.limit)
+        started = gateways.start(wanted & (minerals >= COSTS['gateway'][0]), now, COSTS['gateway'][2])
+        minerals -= COSTS['gateway'][0] * started
+        short += COSTS['gateway'][0] * (wanted & ~started)
+        wanted = (gateway_ready > 0) & (core.started == 0)
+        started = core.start(wanted & (minerals >= COSTS['cyberneticscore'][0]), now, COSTS['cyberneticscore'][2])
+        minerals -= COSTS['cyberneticscore'][0] * started
+        short += COSTS['cyberneticscore'][0] * (wanted & ~started)
+
+        # Assimilators on every finished base
+        wanted = assimilators.started < nexus_ready * p['assimilators_per_nexus']
+        minerals -= COSTS['assimilator'][0] * assimilators.start(wanted & (minerals >= COSTS['assimilator'][0]),
+                                                                  now, COSTS['assimilator'][2])
+
+        # Stalkers from every gateway once the core is done, out of what the structures above that could not be paid
+        # for leave over (the production allocator's RESERVE_PRIORITY, probes are CRITICAL and asked for first)
+        supply_used = workers + STALKER_SUPPLY * stalkers
+        progress = np.where(core.ready(now) > 0, gateway_ready * tick / stalker_time, 0)
+        progress = np.minimum(progress, np.maximum(supply_cap - supply_used, 0) / STALKER_SUPPLY)
+        progress = np.minimum(progress, np.maximum(minerals - short, 0) / stalker_minerals)
+        progress = np.minimum(progress, gas / stalker_gas)
+        stalkers += progress
+        minerals -= progress * stalker_minerals
+        gas -= progress * stalker_gas
+        blocked += np.where((supply_cap - supply_used < 1) & (supply_cap < MAX_SUPPLY), tick, 0)
+
+        # Income
+        gas_workers = np.minimum(workers, WORKERS_PER_GAS * assimilators.ready(now))
+        mineral_workers = workers - gas_workers
+        full = np.minimum(mineral_workers, 2 * PATCHES * nexus_ready)
+        third = np.minimum(mineral_workers - full, PATCHES * nexus_ready)
+        income = (MINERAL_RATE * full + MINERAL_RATE_THIRD * third) * tick
+        gas_income = GAS_RATE * gas_workers * tick
+        minerals += income
+        gas += gas_income
+        mined += income
+        harvested += gas_income
+
+        now += tick
+
+    return {
+        'minerals_mined': mined,
+        'gas_mined': harvested,
+        'workers': workers,
+        'stalkers': stalkers,
+        'army_value': stalkers * (stalker_minerals + stalker_gas),
+        'bank': minerals + gas,
+        'nexuses': nexuses.ready(now).astype(float),
+        'gateways': gateways.ready(now).astype(float),
+        'supply_blocked': blocked,
+    }
+
+
+def search(count=CANDIDATES, horizon=HORIZON, seed=0, score='army_value', top=10, build=None):
+
+    """
+
+    Random search over the parameter space, the bot's current parameters (or a build) included as candidate 0.
+
+    Returns:
+        best (List): (score, parameters, results) of the 'top' best candidates
+        rate (float): candidates simulated per wall clock second
+        current (Dict): results of candidate 0
+
+    """
+
+    parameters = sample(count, seed)
+    current = from_build(build) if build else defaults()
+    for name in parameters:
+        parameters[name][0] = current[name][0]
+
+    start = time.perf_counter()
+    results = simulate(parameters, horizon)
+    rate = count / (time.perf_counter() - start)
+
+    order = np.argsort(-results[score], kind='stable')[:top]
+    best = [(float(results[score][index]),
+             {name: float(values[index]) for name, values in parameters.items()},
+             {name: float(values[index]) for name, values in results.items()}) for index in order]
+    return best, rate, {name: float(values[0]) for name, values in results.items()}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Search build parameters with the economy simulator.')
+    parser.add_argument('--candidates', type=int, default=CANDIDATES)
+    parser.add_argument('--horizon', type=float, default=HORIZON, help='game seconds to simulate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--score', default='army_value', help='result to maximize, e.g. minerals_mined')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--build', help='start from a build of the builds package instead of the bot defaults')
+    args = parser.parse_args()
+
+    best, rate, current = search(args.candidates, args.horizon, args.seed, args.score, args.top, args.build)
+    print('{:.0f} candidates per second'.format(rate))
+    print('current: {} = {:.1f}'.format(args.score, current[args.score]))
+    for score, parameters, results in best:
+        values = ' '.join('{}={:g}'.format(name, value) for name, value in parameters.items())
+        print('{:10.1f} {}'.format(score, values))
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+#
+# Megladon Spatial Grid
+#
+# ---------------------
+
+# Main Modules
+# ------------
+import math
+
+# Spatial Grid Constants
+# ----------------------
+CELL_SIZE = 8.0  # a mineral line (or a nexus and its probes) spans a handful of cells
+
+
+class SpatialGrid(object):
+
+    """
+
+    Uniform grid over unit positions for radius and nearest-neighbour queries.
+
+    Units are bucketed by the cell they stand in and the grid is updated in place every step: a unit that stays
+    in its cell (workers mining, minerals never moving) only has its entry refreshed, a unit that left is moved
+    to its new cell and units that are gone are dropped. A query only looks at the cells its radius touches.
+
+    Results keep the order of the Units the grid was last updated with, so they match what
+    Units.closer_than / closest_to / sorted_by_distance_to return on the same group.
+
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+
+        """
+
+        Arguments:
+            cell_size (float): width of a grid cell in map units
+
+        """
+
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.where = {}
+        self.moved = 0
+        self._subgroup = None
+
+    def __len__(self):
+
+        return len(self.where)
+
+    def cell(self, x, y):
+
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def update(self, units):
+
+        """
+
+        Bring the grid up to date with this step's units.
+
+        Arguments:
+            units (SC2 Units): every unit the grid should hold, in the order results are returned
+
+        """
+
+        self._subgroup = units.subgroup
+        cells = self.cells
+        where = self.where
+        seen = set()
+
+        for order, unit in enumerate(units):
+            tag = unit.tag
+            position = unit.position
+            cell = self.cell(position[0], position[1])
+            seen.add(tag)
+
+            previous = where.get(tag)
+            if previous != cell:
+                if previous is not None:
+                    self._discard(previous, tag)
+                    self.moved += 1
+                where[tag] = cell
+                bucket = cells.get(cell)
+                if bucket is None:
+                    bucket = cells[cell] = {}
+            else:
+                bucket = cells[cell]
+
+            bucket[tag] = (position[0], position[1], order, unit)
+
+        if len(seen) != len(where):
+            for tag in [tag for tag in where if tag not in seen]:
+                self._discard(where.pop(tag), tag)
+
+    def _discard(self, cell, tag):
+
+        bucket = self.cells[cell]
+        del bucket[tag]
+        if not bucket:
+            del self.cells[cell]
+
+    def _within(self, x, y, distance):
+
+        """
+
+        Entries of every cell overlapping the square around (x, y), as (distance squared, order, unit).
+
+        """
+
+        low_x, low_y = self.cell(x - distance, y - distance)
+        high_x, high_y = self.cell(x + distance, y + distance)
+
+        found = []
+        cells = self.cells
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > len(cells):
+            # Radius covers more cells than are occupied, walk the occupied ones instead
+            keys = [key for key in cells if low_x <= key[0] <= high_x and low_y <= key[1] <= high_y]
+        else:
+            keys = [(cx, cy) for cx in range(low_x, high_x + 1) for cy in range(low_y, high_y + 1) if (cx, cy) in cells]
+
+        for key in keys:
+            for unit_x, unit_y, order, unit in cells[key].values():
+                dx = unit_x - x
+                dy = unit_y - y
+                found.append((dx * dx + dy * dy, order, unit))
+        return found
+
+    def closer_than(self, distance, position):
+
+        """
+
+        Units strictly closer than 'distance' to position.
+
+        Arguments:
+            distance (float): radius in map units
+            position (SC2 Unit or Point2): center of the query
+
+        Returns:
+            units (SC2 Units): matching units in update order
+
+        """
+
+        position = position.position
+        limit = distance * distance
+        found = [entry for entry in self._within(position[0], position[1], distance) if entry[0] < limit]
+        found.sort(key=lambda entry: entry[1])
+        return self._subgroup([entry[2] for entry in found])
+
+    def nearest(self, position, k=1):
+
+        """
+
+        The k units closest to position, nearest first (ties keep update order).
+
+        Searches outwards ring by ring and stops once no unseen cell can hold anything closer than the k-th
+        match found so far.
+
+        Arguments:
+            position (SC2 Unit or Point2): center of the query
+            k (int): number of units to return
+
+        Returns:
+            units (SC2 Units): up to k units sorted by distance
+
+        """
+
+        position = position.position
+        x, y = position[0], position[1]
+        if not self.where or k <= 0:
+            return self._subgroup([])
+
+        center_x, center_y = self.cell(x, y)
+        low_x, low_y = min(self.cells)[0], min(key[1] for key in self.cells)
+        high_x, high_y = max(self.cells)[0], max(key[1] for key in self.cells)
+        rings = max(center_x - low_x, high_x - center_x, center_y - low_y, high_y - center_y)
+
+        found = []
+        for ring in range(rings + 1):
+            for key in self._ring(center_x, center_y, ring):
+                bucket = self.cells.get(key)
+                if bucket is None:
+                    continue
+                for unit_x, unit_y, order, unit in bucket.values():
+                    dx = unit_x - x
+                    dy = unit_y - y
+                    found.append((dx * dx + dy * dy, order, unit))
+
+            # Everything outside the rings searched so far is at least this far away
+            if len(found) >= k:
+                reach = ring * self.cell_size + min(x - center_x * self.cell_size,
+                                                    (center_x + 1) * self.cell_size - x,
+                                                    y - center_y * self.cell_size,
+                                                    (center_y + 1) * self.cell_size - y)
+                found.sort(key=lambda entry: (entry[0], entry[1]))
+                if math.sqrt(found[k - 1][0]) < reach:
+                    break
+
+        found.sort(key=lambda entry: (entry[0], entry[1]))
+        return self._subgroup([entry[2] for entry in found[:k]])
+
+    def closest_to(self, position):
+
+        """
+
+        The unit closest to position.
+
+        """
+
+        nearest = self.nearest(position, 1)
+        assert nearest, 'SpatialGrid is empty'
+        return nearest[0]
+
+    @staticmethod
+    def _ring(center_x, center_y, ring):
+
+        """
+
+        Cells on the square ring at Chebyshev distance 'ring' from the center cell.
+
+        """
+
+        if ring == 0:
+            return [(center_x, center_y)]
+
+        low_x, high_x = center_x - ring, center_x + ring
+        low_y, high_y = center_y - ring, center_y + ring
+        cells = [(cx, low_y) for cx in range(low_x, high_x + 1)]
+        cells.extend((cx, high_y) for cx in range(low_x, high_x + 1))
+        cells.extend((low_x, cy) for cy in range(low_y + 1, high_y))
+        cells.extend((high_x, cy) for cy in range(low_y + 1, high_y))
+        return cells
@@ -0,0 +1,656 @@
+#!/usr/bin/env python3
+#
+# Megladon Synthetic Game
+#
+# -----------------------
+
+# Main Modules
+# ------------
+import math
+import random
+
+# SC2 Submodules
+# --------------
+from s2clientprotocol import common_pb2 as common_pb
+from s2clientprotocol import data_pb2 as data_pb
+from s2clientprotocol import sc2api_pb2 as sc_pb
+from sc2.data import ActionResult, Difficulty
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+from sc2.unit import UnitGameData
+
+# SC2 Building Constants
+# ----------------------
+from sc2.constants import *
+
+# Synthetic Map Constants
+# -----------------------
+# Same size as AcropolisLE, the map main() plays on.
+MAP_SIZE = (176, 172)
+PLAYABLE_AREA = ((16, 16), (160, 156))
+GAME_STEP = 8
+
+# Own bases in expansion order, the enemy bases are the same spots mirrored through the map center.
+BASES = [(38.5, 125.5), (38.5, 96.5), (66.5, 136.5), (30.5, 66.5), (94.5, 132.5), (60.5, 98.5)]
+MINERAL_FIELDS = 8
+MINERAL_DISTANCE = 6.5
+GEYSER_DISTANCE = 7.5
+
+ALLIANCE_SELF = 1
+ALLIANCE_NEUTRAL = 3
+ALLIANCE_ENEMY = 4
+DISPLAY_VISIBLE = 1
+
+RACE_TERRAN = 1
+RACE_PROTOSS = 3
+PLAYER_PARTICIPANT = 1
+PLAYER_COMPUTER = 2
+
+STRUCTURE = data_pb.Attribute.Value('Structure')
+GROUND = data_pb.Weapon.TargetType.Value('Ground')
+ANY = data_pb.Weapon.TargetType.Value('Any')
+
+# Unit Data
+# ---------
+# unit type -> (race, minerals, vespene, supply, creation ability, structure, health + shield, weapon)
+# weapon is (target, damage, range, cooldown) or None
+UNIT_DATA = {
+    NEXUS: (RACE_PROTOSS, 400, 0, 0, AbilityId.PROTOSSBUILD_NEXUS, True, 2000, None),
+    PYLON: (RACE_PROTOSS, 100, 0, 0, AbilityId.PROTOSSBUILD_PYLON, True, 400, None),
+    ASSIMILATOR: (RACE_PROTOSS, 75, 0, 0, AbilityId.PROTOSSBUILD_ASSIMILATOR, True, 900, None),
+    GATEWAY: (RACE_PROTOSS, 150, 0, 0, AbilityId.PROTOSSBUILD_GATEWAY, True, 1000, None),
+    WARPGATE: (RACE_PROTOSS, 150, 0, 0, None, True, 1000, None),
+    CYBERNETICSCORE: (RACE_PROTOSS, 150, 0, 0, AbilityId.PROTOSSBUILD_CYBERNETICSCORE, True, 1100, None),
+    TWILIGHTCOUNCIL: (RACE_PROTOSS, 150, 100, 0, AbilityId.PROTOSSBUILD_TWILIGHTCOUNCIL, True, 1000, None),
+    ROBOTICSFACILITY: (RACE_PROTOSS, 150, 100, 0, AbilityId.PROTOSSBUILD_ROBOTICSFACILITY, True, 900, None),
+    PROBE: (RACE_PROTOSS, 50, 0, 1, AbilityId.NEXUSTRAIN_PROBE, False, 40, (GROUND, 5, 0.1, 1.07)),
+    STALKER: (RACE_PROTOSS, 125, 50, 2, AbilityId.GATEWAYTRAIN_STALKER, False, 160, (ANY, 13, 6, 1.34)),
+    OBSERVER: (RACE_PROTOSS, 25, 75, 1, AbilityId.ROBOTICSFACILITYTRAIN_OBSERVER, False, 70, None),
+    COMMANDCENTER: (RACE_TERRAN, 400, 0, 0, None, True, 1500, None),
+    SUPPLYDEPOT: (RACE_TERRAN, 100, 0, 0, None, True, 400, None),
+    BARRACKS: (RACE_TERRAN, 150, 0, 0, None, True, 1000, None),
+    SCV: (RACE_TERRAN, 50, 0, 1, None, False, 45, (GROUND, 5, 0.1, 1.07)),
+    MARINE: (RACE_TERRAN, 50, 0, 1, None, False, 45, (ANY, 6, 5, 0.61)),
+    MARAUDER: (RACE_TERRAN, 100, 25, 2, None, False, 125, (GROUND, 10, 6, 1.07)),
+    MEDIVAC: (RACE_TERRAN, 100, 100, 2, None, False, 150, None),
+    MINERALFIELD: (None, 0, 0, 0, None, True, 0, None),
+    VESPENEGEYSER: (None, 0, 0, 0, None, True, 0, None),
+}
+
+# Abilities that are not a creation ability above but are issued by the routines or by BotAI helpers
+COMMAND_ABILITIES = [
+    AbilityId.ATTACK, AbilityId.MOVE, AbilityId.SMART, AbilityId.HARVEST_GATHER, AbilityId.HARVEST_RETURN,
+    AbilityId.EFFECT_CHRONOBOOSTENERGYCOST, AbilityId.MORPH_WARPGATE, AbilityId.WARPGATETRAIN_STALKER,
+]
+
+# upgrade -> (research ability, minerals, vespene)
+UPGRADE_DATA = {
+    UpgradeId.WARPGATERESEARCH: (AbilityId.RESEARCH_WARPGATE, 50, 50),
+    UpgradeId.BLINKTECH: (AbilityId.RESEARCH_BLINK, 150, 150),
+    UpgradeId.CHARGE: (AbilityId.RESEARCH_CHARGE, 100, 100),
+}
+
+# Game Phases
+# -----------
+# phase -> (game loop, minerals, vespene, own unit counts, enemy unit counts)
+PHASES = {
+    'early': (2700, 150, 25, {
+        NEXUS: 1, PYLON: 2, PROBE: 20, ASSIMILATOR: 1, GATEWAY: 1,
+    }, {
+        SCV: 1,
+    }),
+    'mid': (9400, 450, 200, {
+        NEXUS: 2, PYLON: 8, PROBE: 44, ASSIMILATOR: 4, GATEWAY: 4, CYBERNETICSCORE: 1, TWILIGHTCOUNCIL: 1,
+        ROBOTICSFACILITY: 1, STALKER: 16, OBSERVER: 1,
+    }, {
+        COMMANDCENTER: 1, SUPPLYDEPOT: 4, BARRACKS: 3, SCV: 4, MARINE: 12, MARAUDER: 4,
+    }),
+    'late': (20200, 1200, 600, {
+        NEXUS: 4, PYLON: 20, PROBE: 70, ASSIMILATOR: 8, GATEWAY: 2, WARPGATE: 10, CYBERNETICSCORE: 1,
+        TWILIGHTCOUNCIL: 1, ROBOTICSFACILITY: 2, STALKER: 50, OBSERVER: 2,
+    }, {
+        COMMANDCENTER: 3, SUPPLYDEPOT: 14, BARRACKS: 6, SCV: 20, MARINE: 50, MARAUDER: 16, MEDIVAC: 6,
+    }),
+}
+
+
+def link_name(ability):
+
+    """
+
+    CamelCase link name of an ability (e.g. 'ProtossBuildPylon'), BotAI uses it to spot free abilities.
+
+    """
+
+    return ''.join(part.capitalize() for part in ability.name.split('_'))
+
+
+def game_data():
+
+    """
+
+    Game data with the costs of every unit, ability and upgrade the synthetic game contains.
+
+    Returns:
+        game_data (SC2 GameData): same object BotAI gets from the client at game start
+
+    """
+
+    abilities = set(COMMAND_ABILITIES)
+    abilities.update(entry[4] for entry in UNIT_DATA.values() if entry[4] is not None)
+    abilities.update(entry[0] for entry in UPGRADE_DATA.values())
+
+    data = sc_pb.ResponseData()
+    for ability in sorted(abilities, key=lambda ability: ability.value):
+        data.abilities.add(ability_id=ability.value, link_name=link_name(ability), button_name=ability.name,
+                           available=True)
+
+    for unit_type, (race, minerals, vespene, supply, ability, structure, health, weapon) in UNIT_DATA.items():
+        unit = data.units.add(unit_id=unit_type.value, name=unit_type.name.capitalize(), available=True,
+                              mineral_cost=minerals, vespene_cost=vespene, food_required=supply,
+                              ability_id=ability.value if ability is not None else 0,
+                              has_minerals=unit_type == MINERALFIELD, has_vespene=unit_type == VESPENEGEYSER)
+        if race is not None:
+            unit.race = race
+        if structure:
+            unit.attributes.append(STRUCTURE)
+        if weapon is not None:
+            target, damage, weapon_range, cooldown = weapon
+            unit.weapons.add(type=target, damage=damage, attacks=1, range=weapon_range, speed=cooldown)
+
+    for upgrade, (ability, minerals, vespene) in UPGRADE_DATA.items():
+        data.upgrades.add(upgrade_id=upgrade.value, name=upgrade.name, mineral_cost=minerals, vespene_cost=vespene,
+                          ability_id=ability.value)
+
+    return GameData(data)
+
+
+def game_info(map_size=MAP_SIZE):
+
+    """
+
+    Game info for an open map, every cell inside the playable area is pathable and placeable.
+
+    Returns:
+        game_info (SC2 ResponseGameInfo): raw response, BotAI also reads the pathing grid from it every step
+
+    """
+
+    width, height = map_size
+    (left, bottom), (right, top) = PLAYABLE_AREA
+
+    grid = bytearray(width * height)
+    for y in range(bottom, top):
+        grid[y * width + left:y * width + right] = b'\x01' * (right - left)
+    bits = pack_bits(grid)
+
+    info = sc_pb.ResponseGameInfo(map_name='Synthetic')
+    info.player_info.add(player_id=1, type=PLAYER_PARTICIPANT, race_requested=RACE_PROTOSS)
+    info.player_info.add(player_id=2, type=PLAYER_COMPUTER, race_requested=RACE_TERRAN,
+                          difficulty=Difficulty.Easy.value)
+
+    start_raw = info.start_raw
+    start_raw.map_size.x = width
+    start_raw.map_size.y = height
+    for layer, data, bits_per_pixel in ((start_raw.pathing_grid, bits, 1), (start_raw.placement_grid, bits, 1),
+                                        (start_raw.terrain_height, bytes(bytearray([128]) * (width * height)), 8)):
+        layer.bits_per_pixel = bits_per_pixel
+        layer.size.x = width
+        layer.size.y = height
+        layer.data = data
+    start_raw.playable_area.p0.x, start_raw.playable_area.p0.y = PLAYABLE_AREA[0]
+    start_raw.playable_area.p1.x, start_raw.playable_area.p1.y = PLAYABLE_AREA[1]
+    start_raw.start_locations.add(x=mirror(BASES[0])[0], y=mirror(BASES[0])[1])
+
+    return sc_pb.Response(game_info=info)
+
+
+def pack_bits(cells):
+
+    """
+
+    Pack one byte per cell into the one bit per cell layout of the pathing and placement grids.
+
+    """
+
+    packed = bytearray((len(cells) + 7) // 8)
+    for index, cell in enumerate(cells):
+        if cell:
+            packed[index >> 3] |= 0x80 >> (index & 7)
+    return bytes(packed)
+
+
+def mirror(position):
+
+    """
+
+    Position mirrored through the map center, where the enemy has its copy of the same base.
+
+    """
+
+    return MAP_SIZE[0] - position[0], MAP_SIZE[1] - position[1]
+
+
+def towards(origin, target, distance):
+
+    """
+
+    Point 'distance' away from origin in the direction of target.
+
+    """
+
+    dx = target[0] - origin[0]
+    dy = target[1] - origin[1]
+    length = math.hypot(dx, dy) or 1.0
+    return origin[0] + dx / length * distance, origin[1] + dy / length * distance
+
+
+class SyntheticState(object):
+
+    """
+
+    A generated raw observation for one game phase.
+
+    Units are laid out the way a real game looks: nexuses on the first bases with probes mining their mineral line,
+    tech structures around the main, the army between the natural and the map center, and the enemy mirrored on the
+    other side with its army pushing towards us. Every step the mobile units drift a little so distance queries and
+    the intel frame see a new picture.
+
+    """
+
+    def __init__(self, phase='mid', counts=None, enemy_counts=None, seed=0):
+
+        """
+
+        Arguments:
+            phase (String): 'early', 'mid' or 'late', picks the default unit counts and bank
+            counts (Dict): own unit type -> amount, overrides the phase defaults
+            enemy_counts (Dict): enemy unit type -> amount, overrides the phase defaults
+            seed (int): seed for positions, orders and drift
+
+        """
+
+        if phase not in PHASES:
+            raise ValueError('Unknown phase {}, expected one of {}'.format(phase, sorted(PHASES)))
+
+        game_loop, minerals, vespene, own, enemy = PHASES[phase]
+
+        self.phase = phase
+        self.random = random.Random(seed)
+        self.counts = dict(own)
+        self.counts.update(counts or {})
+        self.enemy_counts = dict(enemy)
+        self.enemy_counts.update(enemy_counts or {})
+        self.minerals = minerals
+        self.vespene = vespene
+        self.next_tag = 1
+        self.mobile = []
+
+        self.observation = sc_pb.ResponseObservation()
+        self.observation.observation.game_loop = game_loop
+        self.add_map_state()
+        self.add_resources()
+        self.add_own_units()
+        self.add_enemy_units()
+        self.update_player()
+
+    @property
+    def game_loop(self):
+
+        return self.observation.observation.game_loop
+
+    def add_map_state(self):
+
+        width, height = MAP_SIZE
+        map_state = self.observation.observation.raw_data.map_state
+        for layer, data, bits_per_pixel in ((map_state.visibility, b'\x02' * (width * height), 8),
+                                            (map_state.creep, bytes((width * height + 7) // 8), 1)):
+            layer.bits_per_pixel = bits_per_pixel
+            layer.size.x = width
+            layer.size.y = height
+            layer.data = data
+
+    def add_unit(self, unit_type, alliance, position, **fields):
+
+        """
+
+        Append a unit to the observation.
+
+        Arguments:
+            unit_type (UnitTypeId): type of the unit
+            alliance (int): ALLIANCE_SELF, ALLIANCE_NEUTRAL or ALLIANCE_ENEMY
+            position (Tuple): (x, y) map position
+
+        Returns:
+            unit (SC2 raw Unit): the proto, for further changes
+
+        """
+
+        health = UNIT_DATA[unit_type][6]
+        fields.setdefault('build_progress', 1.0)
+        unit = self.observation.observation.raw_data.units.add(
+            display_type=DISPLAY_VISIBLE, alliance=alliance, tag=self.next_tag, unit_type=unit_type.value,
+            owner={ALLIANCE_SELF: 1, ALLIANCE_ENEMY: 2}.get(alliance, 16), health=health, health_max=health,
+            **fields)
+        unit.pos.x, unit.pos.y = position
+        unit.pos.z = 10.0
+        self.next_tag += 1
+
+        if not UNIT_DATA[unit_type][5]:
+            self.mobile.append(unit)
+        return unit
+
+    def add_resources(self):
+
+        """
+
+        Mineral line and two geysers on every base, facing away from the map center.
+
+        """
+
+        center = (MAP_SIZE[0] / 2.0, MAP_SIZE[1] / 2.0)
+        self.mineral_lines = {}
+
+        for base in BASES + [mirror(base) for base in BASES]:
+            away = math.atan2(base[1] - center[1], base[0] - center[0])
+            fields = []
+            for index in range(MINERAL_FIELDS):
+                angle = away + (index - (MINERAL_FIELDS - 1) / 2.0) * 0.24
+                position = (base[0] + math.cos(angle) * MINERAL_DISTANCE, base[1] + math.sin(angle) * MINERAL_DISTANCE)
+                fields.append(self.add_unit(MINERALFIELD, ALLIANCE_NEUTRAL, position, mineral_contents=1800))
+            for side in (-1, 1):
+                angle = away + side * 1.45
+                position = (base[0] + math.cos(angle) * GEYSER_DISTANCE, base[1] + math.sin(angle) * GEYSER_DISTANCE)
+                self.add_unit(VESPENEGEYSER, ALLIANCE_NEUTRAL, position, vespene_contents=2250)
+            self.mineral_lines[base] = fields
+
+    def near(self, origin, low, high):
+
+        """
+
+        Random point between low and high away from origin.
+
+        """
+
+        angle = self.random.uniform(0, 2 * math.pi)
+        distance = self.random.uniform(low, high)
+        return origin[0] + math.cos(angle) * distance, origin[1] + math.sin(angle) * distance
+
+    def add_own_units(self):
+
+        counts = self.counts
+        bases = BASES[:max(counts.get(NEXUS, 0), 1)]
+        center = (MAP_SIZE[0] / 2.0, MAP_SIZE[1] / 2.0)
+        rally = towards(bases[-1], center, 12)
+
+        for index, base in enumerate(bases[:counts.get(NEXUS, 0)]):
+            self.add_unit(NEXUS, ALLIANCE_SELF, base, energy=self.random.uniform(0, 120), energy_max=200,
+                          assigned_harvesters=min(counts.get(PROBE, 0) // len(bases), 16), ideal_harvesters=16,
+                          build_progress=1.0 if index < 2 else self.random.choice([0.6, 1.0]))
+
+        geysers = [unit for unit in self.observation.observation.raw_data.units if unit.unit_type == VESPENEGEYSER.value
+                   and any(math.hypot(unit.pos.x - base[0], unit.pos.y - base[1]) < 10 for base in bases)]
+        for geyser in geysers[:counts.get(ASSIMILATOR, 0)]:
+            self.add_unit(ASSIMILATOR, ALLIANCE_SELF, (geyser.pos.x, geyser.pos.y), assigned_harvesters=2,
+                          ideal_harvesters=3, vespene_contents=2000)
+
+        for index in range(counts.get(PROBE, 0)):
+            base = bases[index % len(bases)]
+            roll = self.random.random()
+            if roll < 0.05:
+                self.add_unit(PROBE, ALLIANCE_SELF, self.near(base, 3, 8))
+            elif roll < 0.08:
+                probe = self.add_unit(PROBE, ALLIANCE_SELF, self.near(base, 3, 8))
+                probe.orders.add(ability_id=AbilityId.ATTACK.value, target_world_space_pos=common_pb.Point(
+                    x=center[0], y=center[1]))
+            else:
+                field = self.random.choice(self.mineral_lines[base])
+                probe = self.add_unit(PROBE, ALLIANCE_SELF, towards(base, (field.pos.x, field.pos.y),
+                                                                   self.random.uniform(3, 6)))
+                probe.orders.add(ability_id=AbilityId.HARVEST_GATHER.value, target_unit_tag=field.tag)
+
+        main = bases[0]
+        production = [PYLON, GATEWAY, WARPGATE, CYBERNETICSCORE, TWILIGHTCOUNCIL, ROBOTICSFACILITY]
+        for unit_type in production:
+            for index in range(counts.get(unit_type, 0)):
+                base = main if index < 6 or len(bases) == 1 else self.random.choice(bases)
+                structure = self.add_unit(unit_type, ALLIANCE_SELF, self.near(towards(base, center, 10), 0, 8),
+                                          build_progress=1.0 if index else self.random.choice([0.5, 1.0, 1.0]))
+                if unit_type in (GATEWAY, ROBOTICSFACILITY) and self.random.random() < 0.3:
+                    structure.buff_ids.append(BuffId.CHRONOBOOSTENERGYCOST.value)
+
+        for index in range(counts.get(STALKER, 0)):
+            stalker = self.add_unit(STALKER, ALLIANCE_SELF, self.near(rally, 0, 6), shield=80, shield_max=80)
+            if self.random.random() < 0.5:
+                target = mirror(BASES[0])
+                stalker.orders.add(ability_id=AbilityId.ATTACK.value, target_world_space_pos=common_pb.Point(
+                    x=target[0], y=target[1]))
+
+        for index in range(counts.get(OBSERVER, 0)):
+            self.add_unit(OBSERVER, ALLIANCE_SELF, self.near(mirror(BASES[0]), 10, 20), is_flying=True)
+
+    def add_enemy_units(self):
+
+        counts = self.enemy_counts
+        bases = [mirror(base) for base in BASES[:max(counts.get(COMMANDCENTER, 0), 1)]]
+        center = (MAP_SIZE[0] / 2.0, MAP_SIZE[1] / 2.0)
+
+        for base in bases[:counts.get(COMMANDCENTER, 0)]:
+            self.add_unit(COMMANDCENTER, ALLIANCE_ENEMY, base)
+
+        for unit_type in (SUPPLYDEPOT, BARRACKS):
+            for index in range(counts.get(unit_type, 0)):
+                self.add_unit(unit_type, ALLIANCE_ENEMY, self.near(towards(bases[0], center, 10), 0, 10))
+
+        for index in range(counts.get(SCV, 0)):
+            # The first SCV is a scout sitting in our main
+            origin = BASES[0] if index == 0 else self.random.choice(bases)
+            self.add_unit(SCV, ALLIANCE_ENEMY, self.near(origin, 3, 8))
+
+        # Most of the army sits in the middle of the map, a small raid is at our last base
+        raid_base = BASES[max(self.counts.get(NEXUS, 1), 1) - 1]
+        for unit_type in (MARINE, MARAUDER, MEDIVAC):
+            for index in range(counts.get(unit_type, 0)):
+                origin = raid_base if index < 3 else center
+                self.add_unit(unit_type, ALLIANCE_ENEMY, self.near(origin, 4, 12), is_flying=unit_type == MEDIVAC)
+
+    def update_player(self):
+
+        """
+
+        Bank, supply and upgrades in player_common, derived from the units on the map.
+
+        """
+
+        food_used = 0
+        food_army = 0
+        food_cap = 0
+        for unit_type, count in self.counts.items():
+            supply = UNIT_DATA[unit_type][3]
+            food_used += supply * count
+            if unit_type != PROBE:
+                food_army += supply * count
+            food_cap += {NEXUS: 15, PYLON: 8}.get(unit_type, 0) * count
+
+        common = self.observation.observation.player_common
+        common.player_id = 1
+        common.minerals = self.minerals
+        common.vespene = self.vespene
+        common.food_cap = min(food_cap, 200)
+        common.food_used = food_used
+        common.food_army = food_army
+        common.food_workers = self.counts.get(PROBE, 0)
+        common.army_count = self.counts.get(STALKER, 0) + self.counts.get(OBSERVER, 0)
+        common.warp_gate_count = self.counts.get(WARPGATE, 0)
+
+        if self.counts.get(WARPGATE, 0):
+            self.observation.observation.raw_data.player.upgrade_ids.append(UpgradeId.WARPGATERESEARCH.value)
+
+    def advance(self, loops=GAME_STEP):
+
+        """
+
+        Move the game forward: the clock ticks, the bank changes and mobile units drift.
+
+        Arguments:
+            loops (int): game loops to advance
+
+        Returns:
+            state (SC2 GameState): a fresh state for the new game loop
+
+        """
+
+        observation = self.observation.observation
+        observation.game_loop += loops
+
+        common = observation.player_common
+        common.minerals = max(0, int(self.minerals + self.random.uniform(-1, 1) * self.minerals * 0.5))
+        common.vespene = max(0, int(self.vespene + self.random.uniform(-1, 1) * self.vespene * 0.5))
+
+        (left, bottom), (right, top) = PLAYABLE_AREA
+        drift = loops / 16.0
+        for unit in self.mobile:
+            unit.pos.x = min(max(unit.pos.x + self.random.uniform(-drift, drift), left), right - 1)
+            unit.pos.y = min(max(unit.pos.y + self.random.uniform(-drift, drift), bottom), top - 1)
+
+        return GameState(self.observation)
+
+
+class SyntheticClient(object):
+
+    """
+
+    Stand-in for sc2.client.Client, answering the few requests Megladon makes during a step.
+
+    Every placement succeeds, pathing distances are straight lines and commands are only counted.
+
+    """
+
+    def __init__(self, state):
+
+        """
+
+        Arguments:
+            state (SyntheticState): the game the client answers for
+
+        """
+
+        self.state = state
+        self.requests = 0
+        self.actions_sent = 0
+        self.chat = []
+
+    async def actions(self, actions, return_successes=False):
+
+        self.requests += 1
+        if not actions:
+            return None
+        if not isinstance(actions, list):
+            actions = [actions]
+        self.actions_sent += len(actions)
+        return [ActionResult.Success] * len(actions) if return_successes else []
+
+    async def query_available_abilities(self, units, ignore_resource_requirements=False):
+
+        self.requests += 1
+        upgrades = self.state.observation.observation.raw_data.player.upgrade_ids
+        abilities = []
+        for unit in units:
+            if unit.type_id == NEXUS:
+                available = [AbilityId.EFFECT_CHRONOBOOSTENERGYCOST] if unit.energy >= 50 else []
+            elif unit.type_id == GATEWAY:
+                available = [AbilityId.GATEWAYTRAIN_STALKER]
+                if UpgradeId.WARPGATERESEARCH.value in upgrades:
+                    available.append(AbilityId.MORPH_WARPGATE)
+            elif unit.type_id == WARPGATE:
+                available = [AbilityId.WARPGATETRAIN_STALKER]
+            else:
+                available = []
+            abilities.append(available)
+        return abilities
+
+    async def query_building_placement(self, ability, positions, ignore_resources=True):
+
+        self.requests += 1
+        return [ActionResult.Success for position in positions]
+
+    async def query_pathing(self, start, end):
+
+        self.requests += 1
+        start = start.position if hasattr(start, 'position') else start
+        return start.distance_to(end)
+
+    async def query_pathings(self, zipped_list):
+
+        self.requests += 1
+        return [(start.position if hasattr(start, 'position') else start).distance_to(end)
+                for start, end in zipped_list]
+
+    async def chat_send(self, message, team_only):
+
+        self.chat.append(message)
+
+
+class SyntheticGame(object):
+
+    """
+
+    Drives a bot through synthetic game states without a StarCraft II client.
+
+    The bot goes through the same preparation BotAI gets from sc2.main (_prepare_start, _prepare_step,
+    _prepare_first_step and on_start), so everything a routine reads (units, workers, known_enemy_units,
+    state.mineral_field, game_info.map_size, can_afford, ...) is the real python-sc2 implementation over generated
+    data.
+
+    """
+
+    def __init__(self, bot, phase='mid', counts=None, enemy_counts=None, seed=0):
+
+        """
+
+        Arguments:
+            bot (SC2 BotAI): the bot to drive
+            phase (String): 'early', 'mid' or 'late'
+            counts (Dict): own unit type -> amount, overrides the phase defaults
+            enemy_counts (Dict): enemy unit type -> amount, overrides the phase defaults
+            seed (int): seed for the generated state
+
+        """
+
+        self.bot = bot
+        self.state = SyntheticState(phase, counts, enemy_counts, seed)
+        self.client = SyntheticClient(self.state)
+        self.game_data = game_data()
+        self.game_info = game_info()
+        self.iteration = 0
+
+        UnitGameData._game_data = self.game_data
+        UnitGameData._bot_object = bot
+
+        bot._prepare_start(self.client, 1, GameInfo(self.game_info.game_info), self.game_data)
+        bot._prepare_step(self.state.advance(0), self.game_info)
+        bot._prepare_first_step()
+        bot.on_start()
+
+    def prepare_step(self, loops=GAME_STEP):
+
+        """
+
+        Advance the synthetic game and hand the new state to the bot, without running on_step.
+
+        """
+
+        self.bot._prepare_step(self.state.advance(loops), self.game_info)
+
+    async def step(self, loops=GAME_STEP):
+
+        """
+
+        Advance the synthetic game and run one on_step.
+
+        """
+
+        self.prepare_step(loops)
+        await self.bot.on_step(self.iteration)
+        self.iteration += 1
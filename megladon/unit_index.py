@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+#
+# Megladon Unit Index
+#
+# -------------------
+
+# Main Modules
+# ------------
+import collections
+
+
+class UnitIndex(object):
+
+    """
+
+    Snapshot of own and enemy units for one step, bucketed by type id and ready/idle state.
+
+    Built once at the start of on_step so every routine can look up 'all ready gateways' or 'idle
+    robotics facilities' with a dictionary lookup instead of filtering the full unit list again.
+
+    """
+
+    def __init__(self, units, enemy_units):
+
+        """
+
+        Arguments:
+            units (SC2 Units): own units of this step
+            enemy_units (SC2 Units): known enemy units of this step (including structures)
+
+        """
+
+        self._units = units
+        self._empty = units.subgroup([])
+
+        self._own = self._bucket(units)
+        self._enemy = self._bucket(enemy_units)
+
+        structures = []
+        ground_units = []
+        for unit in enemy_units:
+            if unit.is_structure:
+                structures.append(unit)
+            elif not unit.is_flying:
+                ground_units.append(unit)
+
+        self.enemy_structures = units.subgroup(structures)
+        self.enemy_ground_units = units.subgroup(ground_units)
+
+    def _bucket(self, units):
+
+        """
+
+        Walk the units once and split them per type id into all/ready/idle/ready-idle groups.
+
+        """
+
+        buckets = {
+            'all': collections.defaultdict(list),
+            'ready': collections.defaultdict(list),
+            'idle': collections.defaultdict(list),
+            'ready_idle': collections.defaultdict(list),
+        }
+
+        for unit in units:
+            type_id = unit.type_id
+            buckets['all'][type_id].append(unit)
+
+            is_ready = unit.is_ready
+            is_idle = unit.is_idle
+            if is_ready:
+                buckets['ready'][type_id].append(unit)
+            if is_idle:
+                buckets['idle'][type_id].append(unit)
+            if is_ready and is_idle:
+                buckets['ready_idle'][type_id].append(unit)
+
+        return {
+            state: {type_id: self._units.subgroup(group) for type_id, group in groups.items()}
+            for state, groups in buckets.items()
+        }
+
+    def _lookup(self, buckets, state, unit_types):
+
+        """
+
+        Return the bucket for one type id, or the union of the buckets for a group of type ids.
+
+        """
+
+        groups = buckets[state]
+        if not isinstance(unit_types, (set, list, tuple)):
+            return groups.get(unit_types, self._empty)
+
+        found = []
+        for unit_type in unit_types:
+            found.extend(groups.get(unit_type, ()))
+        return self._units.subgroup(found)
+
+    def of(self, unit_types):
+
+        """
+
+        All own units of the given type(s).
+
+        """
+
+        return self._lookup(self._own, 'all', unit_types)
+
+    def ready(self, unit_types):
+
+        """
+
+        Own units of the given type(s) that finished construction.
+
+        """
+
+        return self._lookup(self._own, 'ready', unit_types)
+
+    def idle(self, unit_types):
+
+        """
+
+        Own units of the given type(s) without orders.
+
+        """
+
+        return self._lookup(self._own, 'idle', unit_types)
+
+    def ready_idle(self, unit_types):
+
+        """
+
+        Own units of the given type(s) that are finished and have no orders (structures with an empty queue).
+
+        """
+
+        return self._lookup(self._own, 'ready_idle', unit_types)
+
+    def enemy(self, unit_types):
+
+        """
+
+        Known enemy units of the given type(s).
+
+        """
+
+        return self._lookup(self._enemy, 'all', unit_types)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#
+# Megladon Intel Viewer
+#
+# ---------------------
+
+# Main Modules
+# ------------
+import time
+import argparse
+import cv2
+
+# Megladon Submodules
+# -------------------
+from frame_ring import FrameRing
+
+# Viewer Constants
+# ----------------
+RING_NAME = 'megladon-intel'
+SCALE = 2
+POLL = 0.005        # seconds between checks for a new frame
+FPS = 22.4 / 8      # one frame per bot step at the default game step
+CODEC = 'MJPG'
+
+
+def attach(name, timeout):
+
+    """
+
+    Attach to the bot's ring, waiting for the game to start.
+
+    """
+
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return FrameRing(name)
+        except FileNotFoundError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.25)
+
+
+def view(name=RING_NAME, scale=SCALE, record=None, fps=FPS, window=True, timeout=60.0):
+
+    """
+
+    Show (and optionally record) intel frames until the game ends.
+
+    Arguments:
+        name (String): shared memory name the bot publishes to (MEGLADON_VIEWER)
+        scale (int): upscaling factor
+        record (String): video file to write, None to only display
+        fps (float): frame rate of the recorded video
+        window (bool): open a window, turn off to record without a display
+        timeout (float): seconds to wait for the bot
+
+    Returns:
+        frames (int): number of frames shown
+
+    """
+
+    ring = attach(name, timeout)
+    writer = None
+    shown = 0
+    last = 0
+
+    try:
+        while not ring.closed:
+            latest = ring.latest()
+            if latest is None or latest[0] == last:
+                time.sleep(POLL)
+                continue
+
+            last, game_loop, frame = latest
+            resized = cv2.resize(frame, dsize=None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+
+            if record is not None:
+                if writer is None:
+                    height, width = resized.shape[:2]
+                    writer = cv2.VideoWriter(record, cv2.VideoWriter_fourcc(*CODEC), fps, (width, height))
+                writer.write(resized)
+
+            if window:
+                cv2.imshow('Intel', resized)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            shown += 1
+    finally:
+        if writer is not None:
+            writer.release()
+        if window:
+            cv2.destroyAllWindows()
+        ring.close()
+
+    return shown
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Watch the Megladon intel frame from another process.')
+    parser.add_argument('--name', default=RING_NAME, help='shared memory name, same as MEGLADON_VIEWER')
+    parser.add_argument('--scale', type=int, default=SCALE)
+    parser.add_argument('--record', help='write the frames to this video file as well')
+    parser.add_argument('--fps', type=float, default=FPS)
+    parser.add_argument('--no-window', action='store_true', help='record only')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds to wait for the game to start')
+    args = parser.parse_args()
+
+    shown = view(args.name, args.scale, args.record, args.fps, not args.no_window, args.timeout)
+    print('{} frames shown'.format(shown))
+
+
+if __name__ == '__main__':
+
+    main()
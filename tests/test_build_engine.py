@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+#
+# Megladon Build Order Engine Tests
+#
+# ---------------------------------
+
+# Main Modules
+# ------------
+import os
+import sys
+
+# The bot runs from inside megladon/ with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'megladon'))
+
+# Megladon Submodules
+# -------------------
+from builds.engine import BuildOrder, NEAR_PYLON, EXPANSION
+
+# Structure types only need to be hashable, the engine never looks inside them
+PYLON, GATEWAY, CORE, NEXUS = 'pylon', 'gateway', 'core', 'nexus'
+
+ORDER = [
+    (GATEWAY, 1, 0, 0, [PYLON], NEAR_PYLON),
+    (NEXUS, 2, 16, 0, [], EXPANSION),
+    (CORE, 1, 0, 0, [GATEWAY], NEAR_PYLON),
+    (GATEWAY, 2, 0, 60, [PYLON], NEAR_PYLON),
+]
+
+
+class Game(object):
+
+    """
+
+    Structures on the map, what the bot hands to BuildOrder.due.
+
+    """
+
+    def __init__(self, **counts):
+
+        self.counts = dict(counts)
+        self.done = dict(counts)
+
+    def amount(self, unit):
+
+        return self.counts.get(unit, 0)
+
+    def ready(self, unit):
+
+        return self.done.get(unit, 0) > 0
+
+    def due(self, build, time=0, supply=0, game_loop=0):
+
+        return [(item.unit, item.count) for item in build.due(time, supply, game_loop, self.amount, self.ready)]
+
+
+def test_heads_wait_on_time_supply_and_tech():
+
+    build = BuildOrder('test', ORDER)
+    game = Game(nexus=1)
+
+    # No pylon yet, supply below the expansion's 16
+    assert game.due(build) == []
+
+    game.counts[PYLON] = game.done[PYLON] = 1
+    assert game.due(build) == [(GATEWAY, 1)]
+    assert game.due(build, supply=16) == [(GATEWAY, 1), (NEXUS, 2)]
+
+    # The core waits on a ready gateway, the second gateway on the clock
+    game.counts[GATEWAY] = game.done[GATEWAY] = 1
+    assert game.due(build, supply=16) == [(NEXUS, 2), (CORE, 1)]
+    assert game.due(build, time=60, supply=16) == [(NEXUS, 2), (CORE, 1), (GATEWAY, 2)]
+
+
+def test_issued_structures_are_in_flight_until_they_show_up():
+
+    build = BuildOrder('test', ORDER, pending_loops=100)
+    game = Game(nexus=1, pylon=1)
+
+    item = build.due(0, 0, 0, game.amount, game.ready)[0]
+    build.issued(item, game.amount(GATEWAY), 0)
+    assert build.in_flight(GATEWAY, 0, 10) == 1
+    assert game.due(build, game_loop=10) == []
+
+    # Never showed up: asked for again once it is no longer pending
+    assert game.due(build, game_loop=100) == [(GATEWAY, 1)]
+
+    build.issued(item, game.amount(GATEWAY), 100)
+    game.counts[GATEWAY] = 1
+    assert build.in_flight(GATEWAY, 1, 110) == 0
+
+
+def test_done_rows_rebuild_destroyed_structures():
+
+    build = BuildOrder('test', ORDER)
+    game = Game(nexus=2, pylon=1, gateway=2, core=1)
+
+    # The second step lets the second gateway row through the heaps
+    assert game.due(build, time=60, supply=16) == []
+    assert game.due(build, time=60, supply=16) == []
+    assert build.finished
+
+    # The only core is destroyed after its track ran out: its last row asks for it again
+    game.counts[CORE] = game.done[CORE] = 0
+    assert game.due(build, time=60, supply=16) == [(CORE, 1)]
+
+    # So are a nexus and a gateway
+    game.counts[NEXUS] = game.done[NEXUS] = 1
+    game.counts[GATEWAY] = 1
+    assert game.due(build, time=60, supply=16) == [(NEXUS, 2), (CORE, 1), (GATEWAY, 2)]
+
+    game.counts.update(nexus=2, core=1, gateway=2)
+    game.done.update(nexus=2, core=1, gateway=2)
+    assert game.due(build, time=60, supply=16) == []
+
+
+def test_done_rows_are_kept_while_the_next_row_waits():
+
+    build = BuildOrder('test', ORDER)
+    game = Game(nexus=2, pylon=1, gateway=1)
+
+    assert game.due(build, supply=16) == [(CORE, 1)]
+
+    # The second gateway waits for the clock, the first one is still replaced when it is lost (the core needs it)
+    game.counts[GATEWAY] = game.done[GATEWAY] = 0
+    assert game.due(build, supply=16) == [(GATEWAY, 1)]
+
+
+def test_lost_requirements_hold_items_back():
+
+    build = BuildOrder('test', ORDER)
+    game = Game(nexus=2, pylon=1, gateway=1)
+
+    assert game.due(build, supply=16) == [(CORE, 1)]
+
+    # Without a pylon the lost gateway cannot be rebuilt, and without a gateway the core waits
+    game.counts.update(pylon=0, gateway=0)
+    game.done.update(pylon=0, gateway=0)
+    assert game.due(build, supply=16) == []
+
+    game.counts[PYLON] = game.done[PYLON] = 1
+    assert game.due(build, supply=16) == [(GATEWAY, 1)]
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+#
+# Megladon Economy Simulator Tests
+#
+# --------------------------------
+
+# Main Modules
+# ------------
+import os
+import sys
+import numpy as np
+
+# The bot runs from inside megladon/ with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'megladon'))
+
+# Megladon Submodules
+# -------------------
+from simulator import simulate, sample, defaults, PARAMETERS
+
+
+def test_batch_matches_single_candidate_runs():
+
+    parameters = sample(16, seed=3)
+    batch = simulate(parameters, horizon=300)
+
+    for index in range(16):
+        single = simulate({name: values[index:index + 1] for name, values in parameters.items()}, horizon=300)
+        for name, values in batch.items():
+            assert np.allclose(values[index], single[name][0]), name
+
+
+def test_due_structures_hold_the_bank_back_from_stalkers():
+
+    # The bot's own parameters take every expansion they ask for within 10 minutes
+    results = simulate(defaults())
+    assert results['nexuses'][0] == PARAMETERS['expansions'][0]
+    assert results['stalkers'][0] > 0